@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import shutil
+import logging
+import sqlite3
+import threading
+import ipaddress
+from itertools import islice
+
+logger = logging.getLogger('k4enum.assets')
+
+DEFAULT_PATH = "~/.k4enum/assets.db"  # Local to the host running scan.py, see `assets:` in storage.yaml
+SPOOL_DIR = "asset_spool"  # Inside the shared state directory
+SPOOL_INTERVAL = 5  # Seconds between two drains of the spool while a scan runs
+STALE_CLAIM = 3600  # Seconds after which an entry claimed by a drainer that died is taken over
+BATCH_LINES = 50000  # Lines per write transaction, so concurrent ingests interleave
+CACHE_KIB = 256 * 1024  # Page cache per connection; index inserts thrash the 2 MB default on large stores
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+HOSTNAME = re.compile(r'^[a-z0-9_-]+(\.[a-z0-9_-]+)+$')
+IP_CHARACTERS = re.compile(r'^[0-9a-f.:]*[.:][0-9a-f.:]*$')  # Cheap filter before the full IP parse
+
+def reverse_labels(name):
+    """Get a hostname with its labels reversed, so a domain's hosts share an indexed prefix"""
+    return '.'.join(reversed(name.split('.')))
+
+def normalize_asset(value):
+    """Normalize a hostname or IP address and get it with its kind, or (None, None) if it's neither"""
+    value = value.strip('[](),').lower()
+    if IP_CHARACTERS.match(value):
+        try:
+            return str(ipaddress.ip_address(value)), 'ip'
+        except ValueError:
+            pass
+    value = value.replace('*.', '').rstrip('.')
+    # A numeric last label is a version number or a mangled IP, never a TLD
+    if HOSTNAME.match(value) and not value.rsplit('.', 1)[1].isdigit():
+        return value, 'host'
+    return None, None
+
+def parse_endpoint(token):
+    """Split a hostname, host:port or URL into its host, port and normalized URL"""
+    scheme = url = None
+    rest = token
+    if '://' in token:
+        scheme, rest = token.split('://', 1)
+        scheme = scheme.lower()
+    host_port, slash, path = rest.partition('/')
+    host_port = host_port.split('@')[-1].lower()
+    if host_port.startswith('['):
+        host, _, port = host_port[1:].partition(']')
+        port = port[1:]
+    elif host_port.count(':') == 1:
+        host, port = host_port.split(':')
+    else:
+        host, port = host_port, ''
+    port = int(port) if port.isdigit() and 0 < int(port) < 65536 else DEFAULT_PORTS.get(scheme)
+    if scheme:
+        url = f"{scheme}://{host_port}{slash}{path}"
+    return host, port, url
+
+def parse_line(line, tls=False):
+    """Get the assets on one line of tool output.
+
+    The first token is the asset: a hostname, IP, host:port or URL. Any other token that is an IP
+    is taken as an address it resolves to (dnsx, massdns, httpx -ip), or, for TLS tasks, any other
+    hostname as a name on its certificate (tlsx -san/-cn).
+    """
+    tokens = line.replace(',', ' ').split()
+    if not tokens:
+        return None
+    token = tokens[0][1:-1] if tokens[0].startswith('[') and tokens[0].endswith(']') else tokens[0]
+    host, port, url = parse_endpoint(token)
+    host, kind = normalize_asset(host)
+    if not host:
+        return None
+    ips, names = [], []
+    for token in tokens[1:]:
+        value, value_kind = normalize_asset(token)
+        if value_kind == 'ip' and value != host:
+            ips.append(value)
+        elif tls and value_kind == 'host':
+            names.append(value)
+    return host, kind, port, url, ips, names
+
+class AssetStore:
+    """Hosts, IPs, ports, URLs and TLS names found across all scans, with first and last sightings"""
+    def __init__(self, path, wal=True):
+        self.path = path
+        self.wal = wal
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # Luigi runs tasks in forked workers, which must not share a connection
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            # WAL needs shared memory between processes, which network filesystems don't provide
+            self._conn.execute(f"PRAGMA journal_mode={'WAL' if self.wal else 'DELETE'}")
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA temp_store=MEMORY')
+            self._conn.execute(f'PRAGMA cache_size=-{CACHE_KIB}')
+            self._create_schema()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _create_schema(self):
+        # Hostnames and IPs share one table so ports, URLs and sightings reference either.
+        # Link tables are clustered on their lookup key, reverse lookups get their own index.
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY,
+                workflow TEXT NOT NULL,
+                scan_id TEXT NOT NULL,
+                UNIQUE (workflow, scan_id)
+            );
+            CREATE TABLE IF NOT EXISTS hosts (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                rname TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS hosts_rname ON hosts (rname);
+            CREATE INDEX IF NOT EXISTS hosts_first_seen ON hosts (first_seen);
+            CREATE TABLE IF NOT EXISTS resolutions (
+                host_id INTEGER NOT NULL,
+                ip_id INTEGER NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (host_id, ip_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS resolutions_ip ON resolutions (ip_id);
+            CREATE TABLE IF NOT EXISTS ports (
+                host_id INTEGER NOT NULL,
+                port INTEGER NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (host_id, port)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ports_port ON ports (port);
+            CREATE TABLE IF NOT EXISTS urls (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                host_id INTEGER NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS urls_host ON urls (host_id);
+            CREATE TABLE IF NOT EXISTS tls_names (
+                host_id INTEGER NOT NULL,
+                port INTEGER NOT NULL,
+                name_id INTEGER NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (host_id, port, name_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS tls_names_name ON tls_names (name_id);
+            CREATE TABLE IF NOT EXISTS sightings (
+                host_id INTEGER NOT NULL,
+                port INTEGER NOT NULL,
+                scan INTEGER NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (host_id, port, scan)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS sightings_scan ON sightings (scan);
+        """)
+
+    def _get_scan(self, conn, workflow, scan_id):
+        conn.execute('INSERT OR IGNORE INTO scans (workflow, scan_id) VALUES (?, ?)', (workflow, scan_id))
+        return conn.execute('SELECT id FROM scans WHERE workflow = ? AND scan_id = ?', (workflow, scan_id)).fetchone()[0]
+
+    def ingest(self, path, workflow, scan_id, tls=False, seen_at=None):
+        """Add the assets in a task's output file, in batches, and get how many lines held one"""
+        seen_at = seen_at or time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            scan = self._get_scan(conn, workflow, scan_id)
+        count = 0
+        with open(path, errors='replace') as f:
+            while True:
+                lines = list(islice(f, BATCH_LINES))
+                if not lines:
+                    break
+                assets = [asset for asset in (parse_line(line, tls) for line in lines) if asset]
+                if assets:
+                    with conn:
+                        conn.execute('BEGIN IMMEDIATE')
+                        self._write_batch(conn, assets, scan, seen_at)
+                count += len(assets)
+        return count
+
+    def _write_batch(self, conn, assets, scan, seen_at):
+        names = {}
+        for host, kind, port, url, ips, tls_names in assets:
+            names[host] = kind
+            names.update((ip, 'ip') for ip in ips)
+            names.update((name, 'host') for name in tls_names)
+
+        # Upsert all names of the batch at once, then map them to their IDs through a join
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS batch_hosts (name TEXT PRIMARY KEY, rname TEXT, kind TEXT) WITHOUT ROWID')
+        conn.execute('DELETE FROM batch_hosts')
+        conn.executemany(
+            'INSERT INTO batch_hosts (name, rname, kind) VALUES (?, ?, ?)',
+            [(name, reverse_labels(name), kind) for name, kind in names.items()]
+        )
+        conn.execute(
+            'INSERT INTO hosts (name, rname, kind, first_seen, last_seen) '
+            'SELECT name, rname, kind, ?, ? FROM batch_hosts WHERE true '
+            'ON CONFLICT (name) DO UPDATE SET last_seen = max(last_seen, excluded.last_seen)',
+            (seen_at, seen_at)
+        )
+        ids = dict(conn.execute('SELECT b.name, h.id FROM batch_hosts b JOIN hosts h ON h.name = b.name'))
+
+        resolutions, ports, urls, tls_names, sightings = set(), set(), {}, set(), set()
+        for host, kind, port, url, ips, names in assets:
+            host_id = ids[host]
+            sightings.add((host_id, port or 0))
+            if port:
+                ports.add((host_id, port))
+            if url:
+                urls[url] = host_id
+            resolutions.update((host_id, ids[ip]) for ip in ips)
+            tls_names.update((host_id, port or 0, ids[name]) for name in names)
+
+        def upsert(table, columns, keys, rows):
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}, first_seen, last_seen) "
+                f"VALUES ({', '.join('?' * len(columns))}, ?, ?) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET last_seen = max(last_seen, excluded.last_seen)",
+                [tuple(row) + (seen_at, seen_at) for row in rows]
+            )
+        upsert('resolutions', ['host_id', 'ip_id'], ['host_id', 'ip_id'], resolutions)
+        upsert('ports', ['host_id', 'port'], ['host_id', 'port'], ports)
+        upsert('urls', ['url', 'host_id'], ['url'], urls.items())
+        upsert('tls_names', ['host_id', 'port', 'name_id'], ['host_id', 'port', 'name_id'], tls_names)
+        conn.executemany(
+            'INSERT INTO sightings (host_id, port, scan, seen_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (host_id, port, scan) DO UPDATE SET seen_at = max(seen_at, excluded.seen_at)',
+            [(host_id, port, scan, seen_at) for host_id, port in sightings]
+        )
+
+    def lookup(self, name, limit=100):
+        """Get everything known about one hostname or IP, or None if it was never seen"""
+        name, _ = normalize_asset(name)
+        conn = self._connect()
+        row = conn.execute('SELECT id, name, kind, first_seen, last_seen FROM hosts WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        host_id = row[0]
+        asset = dict(zip(['id', 'name', 'kind', 'first_seen', 'last_seen'], row))
+        asset['ports'] = [
+            dict(zip(['port', 'first_seen', 'last_seen'], port)) for port in conn.execute(
+                'SELECT port, first_seen, last_seen FROM ports WHERE host_id = ? ORDER BY port', (host_id,)
+            )
+        ]
+        # Addresses of a hostname, or the hostnames pointing at an IP
+        column, other = ('ip_id', 'host_id') if asset['kind'] == 'ip' else ('host_id', 'ip_id')
+        asset['resolutions'] = [
+            dict(zip(['name', 'first_seen', 'last_seen'], resolution)) for resolution in conn.execute(
+                f"SELECT h.name, r.first_seen, r.last_seen FROM resolutions r JOIN hosts h ON h.id = r.{other} "
+                f"WHERE r.{column} = ? ORDER BY h.name LIMIT ?", (host_id, limit)
+            )
+        ]
+        asset['urls'] = [
+            dict(zip(['url', 'first_seen', 'last_seen'], url)) for url in conn.execute(
+                'SELECT url, first_seen, last_seen FROM urls WHERE host_id = ? ORDER BY url LIMIT ?', (host_id, limit)
+            )
+        ]
+        asset['tls_names'] = [
+            dict(zip(['port', 'name', 'first_seen', 'last_seen'], tls_name)) for tls_name in conn.execute(
+                'SELECT t.port, h.name, t.first_seen, t.last_seen FROM tls_names t JOIN hosts h ON h.id = t.name_id '
+                'WHERE t.host_id = ? ORDER BY t.port, h.name LIMIT ?', (host_id, limit)
+            )
+        ]
+        asset['scans'] = [
+            {'workflow': workflow, 'scan_id': scan_id, 'ports': [int(port) for port in ports.split(',') if port != '0'],
+             'seen_at': seen_at}
+            for workflow, scan_id, ports, seen_at in conn.execute(
+                'SELECT s.workflow, s.scan_id, group_concat(g.port), max(g.seen_at) FROM sightings g '
+                'JOIN scans s ON s.id = g.scan WHERE g.host_id = ? GROUP BY g.scan ORDER BY max(g.seen_at) DESC',
+                (host_id,)
+            )
+        ]
+        return asset
+
+    def search(self, domain=None, since=None, kind=None, start=0, count=100):
+        """Get hosts within a domain and/or first seen since a timestamp, in domain order"""
+        query = 'SELECT name, kind, first_seen, last_seen FROM hosts WHERE 1'
+        params = []
+        if domain:
+            # Every name under the domain sorts between 'com.example.' and 'com.example/'
+            root = reverse_labels(normalize_asset(domain)[0] or domain.lower())
+            query += ' AND (rname = ? OR (rname >= ? AND rname < ?))'
+            params += [root, f"{root}.", f"{root}/"]
+        if since:
+            query += ' AND first_seen >= ?'
+            params.append(since)
+        if kind:
+            query += ' AND kind = ?'
+            params.append(kind)
+        query += ' ORDER BY first_seen DESC' if since and not domain else ' ORDER BY rname'
+        query += ' LIMIT ? OFFSET ?'
+        params += [count, start]
+        rows = self._connect().execute(query, params).fetchall()
+        return [dict(zip(['name', 'kind', 'first_seen', 'last_seen'], row)) for row in rows]
+
+    def stats(self):
+        """Get the number of rows of each asset table"""
+        conn = self._connect()
+        return {
+            table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            for table in ['hosts', 'resolutions', 'ports', 'urls', 'tls_names', 'scans', 'sightings']
+        }
+
+def get_asset_store(storage_manager):
+    """Open the asset store at the local path configured under `assets:` in the storage config"""
+    path = os.path.expanduser(storage_manager.config.get('assets', {}).get('path', DEFAULT_PATH))
+    shared = storage_manager.is_shared(path)
+    if shared:
+        logger.warning(f"Asset store {path} is in shared storage, falling back to a rollback journal")
+    return AssetStore(path, wal=not shared)
+
+def is_ingest_host(storage_manager):
+    """Check whether this host drains the spool: the one named by `assets.ingest_host`, or any if unset"""
+    host = storage_manager.config.get('assets', {}).get('ingest_host')
+    return not host or host in (socket.gethostname(), socket.getfqdn())
+
+def get_spool_dir(storage_manager):
+    return storage_manager.get_path('state', SPOOL_DIR)
+
+def spool_assets(storage_manager, output_path, workflow, scan_id, tls=False):
+    """Queue a task's output for ingestion by the host that owns the store, without opening it"""
+    spool_dir = get_spool_dir(storage_manager)
+    os.makedirs(spool_dir, exist_ok=True)
+    name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    # A copy, as the next run of the task truncates and rewrites its stdout in place
+    shutil.copyfile(output_path, os.path.join(spool_dir, f"{name}.data"))
+    entry = {'data': f"{name}.data", 'workflow': workflow, 'scan_id': scan_id, 'tls': tls, 'seen_at': time.time()}
+    # The entry is written last, so drainers never see one whose data is incomplete
+    tmp_path = os.path.join(spool_dir, f".{name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, os.path.join(spool_dir, f"{name}.json"))
+    return name
+
+def drain_spool(store, spool_dir):
+    """Ingest queued outputs in the order they were spooled and get the number of lines ingested"""
+    try:
+        names = sorted(os.listdir(spool_dir))
+    except FileNotFoundError:
+        return 0
+    count = 0
+    now = time.time()
+    for name in names:
+        path = os.path.join(spool_dir, name)
+        try:
+            if name.endswith('.ingesting') and now - os.path.getmtime(path) < STALE_CLAIM:
+                continue
+            if not name.endswith(('.json', '.ingesting')):
+                continue
+            # Claim the entry so concurrent drainers skip it; ingesting again is harmless
+            claimed = f"{path.rsplit('.json', 1)[0]}.json.{os.getpid()}.ingesting"
+            os.rename(path, claimed)
+            with open(claimed) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue  # Claimed by another drainer meanwhile
+        data_path = os.path.join(spool_dir, entry['data'])
+        try:
+            count += store.ingest(data_path, entry['workflow'], entry['scan_id'], entry['tls'], entry['seen_at'])
+        except Exception:
+            if name.endswith('.json'):
+                os.rename(claimed, path)  # Back in the queue for the next drain
+            raise
+        os.remove(data_path)
+        os.remove(claimed)
+    return count
+
+class SpoolIngester(threading.Thread):
+    """Drain the spool into the store in the background while a scan runs"""
+    def __init__(self, store, spool_dir, interval=SPOOL_INTERVAL):
+        super().__init__(daemon=True)
+        self.store = store
+        self.spool_dir = spool_dir
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.drain()
+
+    def drain(self):
+        try:
+            return drain_spool(self.store, self.spool_dir)
+        except sqlite3.Error as e:
+            # Entries stay in the spool for the next drain
+            logger.error(f"Error ingesting assets: {str(e)}")
+            return 0
+
+    def stop(self):
+        """Stop the thread and ingest what is left"""
+        self._stop_event.set()
+        self.join()
+        return self.drain()
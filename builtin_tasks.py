@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import os
+import heapq
+import tempfile
+from itertools import chain
+
+MAX_MEMORY_LINES = 1000000  # Distinct lines held in memory before spilling sorted runs to disk
+MAX_MERGE_FANIN = 128  # Runs merged at once, to stay well below the open file limit
+WRITE_BUFFER = 1024 * 1024
+
+def read_lines(path):
+    """Stream the non-empty lines of a file as bytes without line endings, or the hosts of a host set"""
+    if path.endswith('.hset'):
+        from hostset import HostSet
+        with HostSet(path) as hosts:
+            yield from hosts
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            if line:
+                yield line
+
+def write_run(lines, spill_dir):
+    """Write already sorted lines to a new run file and get its path"""
+    fd, path = tempfile.mkstemp(dir=spill_dir, suffix='.run')
+    with os.fdopen(fd, 'wb', buffering=WRITE_BUFFER) as f:
+        for line in lines:
+            f.write(line + b'\n')
+    return path
+
+def merge_runs(paths):
+    """Merge sorted run files into one sorted stream, dropping duplicates"""
+    files = [open(path, 'rb') for path in paths]
+    try:
+        previous = None
+        for line in heapq.merge(*[(line.rstrip(b'\n') for line in f) for f in files]):
+            if line != previous:
+                yield line
+                previous = line
+    finally:
+        for f in files:
+            f.close()
+
+def sorted_unique(lines, max_memory_lines=MAX_MEMORY_LINES):
+    """Sort and dedupe lines in bounded memory, spilling to an external merge sort when needed"""
+    seen = set()
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='k4enum-sort-') as spill_dir:
+        for line in lines:
+            seen.add(line)
+            if len(seen) >= max_memory_lines:
+                runs.append(write_run(sorted(seen), spill_dir))
+                seen = set()
+        if not runs:
+            yield from sorted(seen)
+            return
+        if seen:
+            runs.append(write_run(sorted(seen), spill_dir))
+        seen = None
+        # Merge in passes so the number of open runs stays bounded
+        while len(runs) > MAX_MERGE_FANIN:
+            batch, runs = runs[:MAX_MERGE_FANIN], runs[MAX_MERGE_FANIN:]
+            runs.append(write_run(merge_runs(batch), spill_dir))
+            for path in batch:
+                os.remove(path)
+        yield from merge_runs(runs)
+
+def unique(lines_factory, max_memory_lines=MAX_MEMORY_LINES):
+    """Dedupe lines keeping first-seen order, falling back to sorted output when they don't fit in memory"""
+    seen = set()
+    output = []
+    for line in lines_factory():
+        if line in seen:
+            continue
+        if len(seen) >= max_memory_lines:
+            # Start over on the sorted path, which holds at most one run in memory
+            yield from sorted_unique(lines_factory(), max_memory_lines)
+            return
+        seen.add(line)
+        output.append(line)
+    yield from output
+
+def normalize_host(line):
+    """Strip wildcard labels, a trailing dot and case from a hostname"""
+    return line.replace(b'*.', b'').strip().rstrip(b'.').lower()
+
+def get_host(line):
+    """Get the hostname of a line holding a hostname, host:port or URL"""
+    host = line.strip().lower()
+    if b'://' in host:
+        host = host.split(b'://', 1)[1]
+    host = host.split(b'/', 1)[0].split(b'@')[-1]
+    if host.startswith(b'['):
+        return host[1:].split(b']', 1)[0]
+    return host.split(b':', 1)[0].rstrip(b'.')
+
+def in_scope(host, domains):
+    return any(host == domain or host.endswith(b'.' + domain) for domain in domains)
+
+def sorted_merge(base, others, keep):
+    """Walk sorted unique streams together and keep base lines for which keep(count found in others) holds"""
+    heads = []
+    for stream in others:
+        line = next(stream, None)
+        if line is not None:
+            heads.append([line, stream])
+    for line in base:
+        found = 0
+        for head in heads:
+            while head[0] is not None and head[0] < line:
+                head[0] = next(head[1], None)
+            if head[0] == line:
+                found += 1
+        if keep(found):
+            yield line
+
+def run_union(paths, options, max_memory_lines):
+    return sorted_unique(chain.from_iterable(read_lines(path) for path in paths), max_memory_lines)
+
+def run_dedupe(paths, options, max_memory_lines):
+    return unique(lambda: chain.from_iterable(read_lines(path) for path in paths), max_memory_lines)
+
+def run_normalize_wildcards(paths, options, max_memory_lines):
+    lines = (normalize_host(line) for path in paths for line in read_lines(path))
+    return sorted_unique((line for line in lines if line), max_memory_lines)
+
+def run_filter_scope(paths, options, max_memory_lines):
+    scope = [normalize_host(domain.encode()) for domain in options.get('scope', [])]
+    exclude = [normalize_host(domain.encode()) for domain in options.get('exclude', [])]
+    def lines():
+        for path in paths:
+            for line in read_lines(path):
+                host = get_host(line)
+                if in_scope(host, scope) and not in_scope(host, exclude):
+                    yield line
+    return unique(lines, max_memory_lines)
+
+def run_intersect(paths, options, max_memory_lines):
+    others = [sorted_unique(read_lines(path), max_memory_lines) for path in paths[1:]]
+    return sorted_merge(sorted_unique(read_lines(paths[0]), max_memory_lines), others, lambda found: found == len(others))
+
+def run_diff(paths, options, max_memory_lines):
+    others = [sorted_unique(read_lines(path), max_memory_lines) for path in paths[1:]]
+    return sorted_merge(sorted_unique(read_lines(paths[0]), max_memory_lines), others, lambda found: found == 0)
+
+# Operator -> (function, minimum number of inputs)
+BUILTINS = {
+    'union': (run_union, 1),
+    'dedupe': (run_dedupe, 1),
+    'normalize_wildcards': (run_normalize_wildcards, 1),
+    'filter_scope': (run_filter_scope, 1),
+    'intersect': (run_intersect, 2),
+    'diff': (run_diff, 2)
+}
+
+def run_builtin(name, paths, output_path, options=None, max_memory_lines=MAX_MEMORY_LINES):
+    """Run a built-in operator over input files and write its lines to output_path, returning the line count"""
+    if name not in BUILTINS:
+        raise ValueError(f"Unknown builtin: {name}")
+    function, min_inputs = BUILTINS[name]
+    if len(paths) < min_inputs:
+        raise ValueError(f"Builtin {name} needs at least {min_inputs} inputs")
+    count = 0
+    with open(f"{output_path}.tmp", 'wb', buffering=WRITE_BUFFER) as f:
+        for line in function(paths, options or {}, max_memory_lines):
+            f.write(line + b'\n')
+            count += 1
+    os.replace(f"{output_path}.tmp", output_path)
+    return count
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import uuid
+import logging
+import itertools
+import threading
+from collections import deque
+from execution_catalog import ExecutionCatalog, STATUSES
+
+logger = logging.getLogger('k4enum.events')
+
+class StatusEventBroker:
+    """Single watcher thread turning task status changes into Server-Sent Events for every client"""
+    def __init__(self, results_dir="results", poll_interval=0.5, history=10000, catalog=None):
+        self.catalog = catalog or ExecutionCatalog(results_dir)
+        self.poll_interval = poll_interval
+        self.events = deque(maxlen=history)
+        self.next_id = 1
+        # Cursors from another broker process (e.g. before a restart) can't be resumed
+        self.epoch = uuid.uuid4().hex[:8]
+        self.condition = threading.Condition()
+        self._scans = {}
+        self._last_tick = None  # Newest directory mtime seen by the last poll
+        self._thread = None
+        self._lock = threading.Lock()
+        self.subscribers = 0
+        self._active = threading.Event()  # Set while at least one client is connected
+
+    def start(self):
+        """Start the shared watcher thread if it isn't running yet"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def subscribe(self):
+        with self._lock:
+            self.subscribers += 1
+            self._active.set()
+
+    def unsubscribe(self):
+        with self._lock:
+            self.subscribers -= 1
+            if not self.subscribers:
+                self._active.clear()
+
+    def _run(self):
+        watching = False
+        while True:
+            try:
+                if not self._active.is_set():
+                    # Nobody is listening, so don't touch the catalog until someone connects
+                    self._active.wait()
+                    watching = False
+                if not watching:
+                    # Baseline without replaying what changed while nobody listened. Clients
+                    # resuming a cursor from before that were told nothing, so make them refetch.
+                    had_baseline = self._last_tick is not None
+                    self.poll(emit=False)
+                    if had_baseline:
+                        self.publish('reset', {})
+                    watching = True
+                else:
+                    self.poll()
+            except Exception as e:
+                logger.error(f"Error watching execution status: {str(e)}")
+            time.sleep(self.poll_interval)
+
+    def poll(self, emit=True):
+        """Diff task statuses of active scans and of those whose directory changed since the last poll"""
+        self.catalog.refresh()
+        executions = self.catalog.list_changed_executions(self._last_tick if emit else None)
+        if executions:
+            self._last_tick = max([self._last_tick or 0] + [execution['updated_at'] or 0 for execution in executions])
+        elif self._last_tick is None:
+            self._last_tick = 0
+        for execution in executions:
+            path = execution['path']
+            known = self._scans.get(path)
+            if known and known[0] == execution['dir_mtime']:
+                continue
+
+            statuses = {}
+            try:
+                names = os.listdir(path)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                task_id, _, status = name.rpartition('.')
+                if status in STATUSES:
+                    statuses[task_id] = status
+
+            previous = known[1] if known else {}
+            self._scans[path] = (execution['dir_mtime'], statuses, execution['status'])
+            if not emit:
+                continue
+
+            for task_id, status in sorted(statuses.items()):
+                if previous.get(task_id) != status:
+                    self.publish('task', {
+                        'workflow': execution['workflow'],
+                        'scan_id': execution['scan_id'],
+                        'task_id': task_id,
+                        'status': status,
+                        'previous': previous.get(task_id)
+                    })
+            if not known or known[2] != execution['status']:
+                self.publish('execution', {
+                    'workflow': execution['workflow'],
+                    'scan_id': execution['scan_id'],
+                    'status': execution['status'],
+                    'counts': {status: execution[status] for status in STATUSES}
+                })
+
+    def publish(self, event_type, data):
+        """Append an event to the shared history and wake every client"""
+        with self.condition:
+            self.events.append({'id': self.next_id, 'type': event_type, 'data': data, 'time': time.time()})
+            self.next_id += 1
+            self.condition.notify_all()
+
+    def _parse_cursor(self, cursor):
+        """Get the event number from a `<epoch>-<n>` cursor, or None if it can't be resumed"""
+        if not cursor:
+            return None
+        epoch, _, number = str(cursor).partition('-')
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def stream(self, cursor=None, workflow=None, scan_id=None, heartbeat=15):
+        """Yield SSE-formatted events after the cursor (the client's Last-Event-ID)"""
+        self.start()
+        self.subscribe()
+        try:
+            yield from self._stream(cursor, workflow, scan_id, heartbeat)
+        finally:
+            self.unsubscribe()
+
+    def _stream(self, cursor, workflow, scan_id, heartbeat):
+        yield 'retry: 1000\n\n'
+
+        last = self._parse_cursor(cursor)
+        with self.condition:
+            oldest = self.events[0]['id'] if self.events else self.next_id
+            expired = last is None or last < oldest - 1
+            if expired:
+                last = self.next_id - 1
+        if expired and cursor:
+            # Events the client missed are gone, so it has to refetch a snapshot
+            yield self.format_event({'id': last, 'type': 'reset', 'data': {}})
+
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.next_id - 1 > last, timeout=heartbeat)
+                oldest = self.events[0]['id'] if self.events else self.next_id
+                missed = last + 1 < oldest
+                if missed:
+                    last = oldest - 1
+                pending = list(itertools.islice(self.events, last + 1 - oldest, None))
+
+            if missed:
+                # The client fell behind the retained history
+                yield self.format_event({'id': last, 'type': 'reset', 'data': {}})
+
+            if not pending:
+                yield ': keepalive\n\n'
+                continue
+
+            for event in pending:
+                last = event['id']
+                data = event['data']
+                if workflow and data.get('workflow') != workflow:
+                    continue
+                if scan_id and data.get('scan_id') != scan_id:
+                    continue
+                yield self.format_event(event)
+
+    def format_event(self, event):
+        """Render an event in the text/event-stream wire format"""
+        return f"id: {self.epoch}-{event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
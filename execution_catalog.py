@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+import os
+import time
+import sqlite3
+import yaml
+from datetime import datetime
+from workflow_registry import WorkflowRegistry
+
+STATUSES = ['pending', 'running', 'done', 'failed']
+
+class ExecutionCatalog:
+    """Persistent index of scans under results/<workflow>/<scan> for the web UI"""
+    def __init__(self, results_dir="results", workflows_dir="workflows", db_path=None, registry=None):
+        self.results_dir = results_dir
+        self.workflows_dir = workflows_dir
+        self.registry = registry or WorkflowRegistry(workflows_dir)
+        self.db_path = db_path or os.path.join(results_dir, '.catalog.db')
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS workflows (
+                    name TEXT PRIMARY KEY,
+                    dir_mtime REAL,
+                    config_mtime REAL,
+                    description TEXT,
+                    modules TEXT,
+                    total_tasks INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS executions (
+                    workflow TEXT NOT NULL,
+                    scan_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    dir_mtime REAL,
+                    status TEXT,
+                    total INTEGER,
+                    pending INTEGER,
+                    running INTEGER,
+                    done INTEGER,
+                    failed INTEGER,
+                    started_at TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (workflow, scan_id)
+                );
+                CREATE INDEX IF NOT EXISTS executions_started ON executions (started_at DESC);
+                CREATE INDEX IF NOT EXISTS executions_status ON executions (status, started_at DESC);
+                CREATE INDEX IF NOT EXISTS executions_updated ON executions (updated_at);
+            """)
+
+    def refresh(self, full=False):
+        """Bring the catalog up to date, only recounting scans whose directory changed"""
+        if not os.path.isdir(self.results_dir):
+            return 0
+        changed = 0
+        known = {row['name']: row for row in self.conn.execute('SELECT * FROM workflows')}
+        seen = set()
+
+        with self.conn:
+            for entry in os.scandir(self.results_dir):
+                if not entry.is_dir():
+                    continue
+                workflow = entry.name
+                seen.add(workflow)
+                dir_mtime = entry.stat().st_mtime
+                row = known.get(workflow)
+                self._refresh_workflow_config(workflow, row)
+
+                # A changed workflow directory means scans were added or removed
+                if full or row is None or row['dir_mtime'] != dir_mtime:
+                    changed += self._sync_scan_list(workflow, entry.path)
+                    self.conn.execute('UPDATE workflows SET dir_mtime = ? WHERE name = ?', (dir_mtime, workflow))
+
+                # Finished scans change too when they are re-run, so each scan directory's own
+                # mtime decides, which costs one stat per scan instead of a listing
+                query = 'SELECT scan_id, path, dir_mtime FROM executions WHERE workflow = ?'
+                for scan in self.conn.execute(query, (workflow,)).fetchall():
+                    known_mtime = None if full else scan['dir_mtime']
+                    changed += self._refresh_scan(workflow, scan['scan_id'], scan['path'], known_mtime)
+
+            for workflow in set(known) - seen:
+                self.conn.execute('DELETE FROM workflows WHERE name = ?', (workflow,))
+                self.conn.execute('DELETE FROM executions WHERE workflow = ?', (workflow,))
+        return changed
+
+    def _refresh_workflow_config(self, workflow, row):
+        """Re-read a workflow's compiled config only when the file changed"""
+        config_file = self.registry.get_config_path(workflow)
+        config_mtime = os.path.getmtime(config_file) if os.path.exists(config_file) else None
+        if row is not None and row['config_mtime'] == config_mtime:
+            return
+
+        description, modules, total_tasks = None, [], 0
+        if config_mtime is not None:
+            try:
+                compiled = self.registry.get(workflow)
+                description = compiled['description']
+                modules = [module['name'] for module in compiled['modules']]
+                total_tasks = len(compiled['tasks'])
+            except (ValueError, yaml.YAMLError):
+                pass  # Scans of a broken workflow are still listed
+
+        self.conn.execute(
+            'INSERT INTO workflows (name, config_mtime, description, modules, total_tasks) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET config_mtime = excluded.config_mtime, '
+            'description = excluded.description, modules = excluded.modules, total_tasks = excluded.total_tasks',
+            (workflow, config_mtime, description, ','.join(modules), total_tasks)
+        )
+
+    def _sync_scan_list(self, workflow, workflow_path):
+        """Add new scans of a workflow and drop removed ones"""
+        on_disk = {
+            entry.name: entry.path for entry in os.scandir(workflow_path)
+            if entry.is_dir() and entry.name.startswith('scan_')
+        }
+        known = {
+            row['scan_id'] for row in
+            self.conn.execute('SELECT scan_id FROM executions WHERE workflow = ?', (workflow,))
+        }
+        for scan_id in known - set(on_disk):
+            self.conn.execute('DELETE FROM executions WHERE workflow = ? AND scan_id = ?', (workflow, scan_id))
+        for scan_id in set(on_disk) - known:
+            self._refresh_scan(workflow, scan_id, on_disk[scan_id], None)
+        return len(known.symmetric_difference(on_disk))
+
+    def _refresh_scan(self, workflow, scan_id, path, known_mtime):
+        """Recount a scan's task statuses if its directory changed"""
+        try:
+            dir_mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            self.conn.execute('DELETE FROM executions WHERE workflow = ? AND scan_id = ?', (workflow, scan_id))
+            return 1
+        if known_mtime == dir_mtime:
+            return 0
+
+        counts = dict.fromkeys(STATUSES, 0)
+        for name in os.listdir(path):
+            task_id, _, status = name.rpartition('.')
+            # Module-level status files have no `module:` prefix
+            if status in counts and ':' in task_id:
+                counts[status] += 1
+
+        # A scan with tasks still running is running even if some already failed
+        if counts['running']:
+            status = 'running'
+        elif counts['failed']:
+            status = 'failed'
+        elif counts['pending']:
+            status = 'pending'
+        elif counts['done']:
+            status = 'done'
+        else:
+            status = 'pending'
+
+        self.conn.execute(
+            'INSERT OR REPLACE INTO executions (workflow, scan_id, path, dir_mtime, status, total, pending, '
+            'running, done, failed, started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (workflow, scan_id, path, dir_mtime, status, sum(counts.values()), counts['pending'],
+             counts['running'], counts['done'], counts['failed'], self._scan_started_at(scan_id, path), dir_mtime)
+        )
+        return 1
+
+    def _scan_started_at(self, scan_id, path):
+        """Get a scan's start time from its `scan_YYYYMMDD_HHMMSS` name"""
+        try:
+            return datetime.strptime(scan_id, 'scan_%Y%m%d_%H%M%S').isoformat()
+        except ValueError:
+            return datetime.fromtimestamp(os.stat(path).st_ctime).isoformat()
+
+    def list_executions(self, workflow=None, status=None, limit=50, offset=0, search=None, since=None, until=None):
+        """Get one page of executions, newest first"""
+        query = (
+            'SELECT e.*, w.description, w.modules, w.total_tasks '
+            'FROM executions e LEFT JOIN workflows w ON w.name = e.workflow'
+        )
+        where, params = self._filters(workflow, status, search, since, until)
+        rows = self.conn.execute(
+            f"{query}{where} ORDER BY e.started_at DESC, e.scan_id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        executions = []
+        for row in rows:
+            execution = dict(row)
+            execution['modules'] = execution['modules'].split(',') if execution['modules'] else []
+            executions.append(execution)
+        return executions
+
+    def list_changed_executions(self, since=None):
+        """Get active executions and those whose directory changed at or after `since`, or all of them"""
+        if since is None:
+            return [dict(row) for row in self.conn.execute('SELECT * FROM executions')]
+        rows = self.conn.execute(
+            'SELECT * FROM executions WHERE updated_at >= ? '
+            'UNION SELECT * FROM executions WHERE pending > 0 OR running > 0',
+            (since,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_executions(self, workflow=None, status=None, search=None, since=None, until=None):
+        """Get the number of executions matching the filters"""
+        where, params = self._filters(workflow, status, search, since, until)
+        return self.conn.execute(f"SELECT COUNT(*) FROM executions e{where}", params).fetchone()[0]
+
+    def list_workflows(self):
+        """Get the names of all workflows with results"""
+        return [row['name'] for row in self.conn.execute('SELECT name FROM workflows ORDER BY name')]
+
+    def get_execution(self, workflow, scan_id):
+        """Get a single execution, or None if it isn't catalogued"""
+        executions = self.conn.execute(
+            'SELECT * FROM executions WHERE workflow = ? AND scan_id = ?', (workflow, scan_id)
+        ).fetchall()
+        return dict(executions[0]) if executions else None
+
+    def get_stats(self):
+        """Get aggregate execution and task counts for the dashboard"""
+        row = self.conn.execute("""
+            SELECT COUNT(*) AS executions,
+                   COALESCE(SUM(status = 'running'), 0) AS running_executions,
+                   COALESCE(SUM(status = 'done'), 0) AS done_executions,
+                   COALESCE(SUM(status = 'failed'), 0) AS failed_executions,
+                   COALESCE(SUM(total), 0) AS tasks,
+                   COALESCE(SUM(done), 0) AS done_tasks,
+                   COALESCE(SUM(failed), 0) AS failed_tasks,
+                   COALESCE(SUM(running), 0) AS running_tasks,
+                   COALESCE(SUM(pending), 0) AS pending_tasks
+            FROM executions
+        """).fetchone()
+        stats = dict(row)
+        stats['workflows'] = self.conn.execute('SELECT COUNT(*) FROM workflows').fetchone()[0]
+        stats['refreshed_at'] = time.time()
+        return stats
+
+    def _filters(self, workflow, status, search=None, since=None, until=None):
+        clauses, params = [], []
+        if workflow:
+            clauses.append('e.workflow = ?')
+            params.append(workflow)
+        if status:
+            clauses.append('e.status = ?')
+            params.append(status)
+        if search:
+            clauses.append("(e.workflow LIKE ? ESCAPE '\\' OR e.status LIKE ? ESCAPE '\\')")
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params.extend([pattern, pattern])
+        if since:
+            clauses.append('e.started_at >= ?')
+            params.append(since)
+        if until:
+            clauses.append('e.started_at <= ?')
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
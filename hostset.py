@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import os
+import mmap
+import struct
+from array import array
+from builtin_tasks import read_lines, sorted_unique, get_host, normalize_host, MAX_MEMORY_LINES
+
+HOSTSET_SUFFIX = ".hset"
+MAGIC = b'K4HS'
+VERSION = 1
+BLOCK_SIZE = 64  # Entries per front-coded block; each block starts with a full key
+# magic, version, flags, block size, host count, block index offset
+HEADER = struct.Struct('<4sHHIQQ')
+
+def host_key(host):
+    """Get the sort key of a hostname: its labels reversed, so hosts of a domain share a prefix"""
+    return b'.'.join(reversed(host.split(b'.')))
+
+# Reversing labels is its own inverse
+key_host = host_key
+
+def encode_varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def decode_varint(buffer, offset):
+    value = shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class HostSetWriter:
+    """Write keys given in strictly increasing order as a front-coded host set"""
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self.count = 0
+        self.blocks = array('Q')
+        self.previous = b''
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, block_size, 0, 0))
+
+    def add(self, key):
+        if self.count and key <= self.previous:
+            raise ValueError("Host set keys must be added sorted and unique")
+        if self.count % self.block_size == 0:
+            self.blocks.append(self.file.tell())
+            shared = 0
+        else:
+            shared = len(os.path.commonprefix([self.previous, key]))
+        self.file.write(encode_varint(shared) + encode_varint(len(key) - shared) + key[shared:])
+        self.previous = key
+        self.count += 1
+
+    def close(self):
+        # The block index is 8-byte aligned so readers can cast it in place
+        self.file.write(b'\0' * (-self.file.tell() % 8))
+        index_offset = self.file.tell()
+        self.blocks.tofile(self.file)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, self.block_size, self.count, index_offset))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.tmp_path)
+
+class HostSet:
+    """Memory-mapped, sorted and front-coded set of hostnames"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.block_size, self.count, self.index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a host set")
+        self._blocks = (self.count + self.block_size - 1) // self.block_size
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _block_offset(self, block):
+        return struct.unpack_from('<Q', self._mmap, self.index_offset + 8 * block)[0]
+
+    def _read_entry(self, offset, previous):
+        shared, offset = decode_varint(self._mmap, offset)
+        length, offset = decode_varint(self._mmap, offset)
+        return previous[:shared] + self._mmap[offset:offset + length], offset + length
+
+    def keys(self, start_block=0):
+        """Iterate keys in order, decoding straight from the mapping"""
+        offset = self._block_offset(start_block) if self.count else self.index_offset
+        key = b''
+        for _ in range(start_block * self.block_size, self.count):
+            key, offset = self._read_entry(offset, key)
+            yield key
+
+    def __iter__(self):
+        """Iterate hostnames in key order"""
+        return (key_host(key) for key in self.keys())
+
+    def __contains__(self, host):
+        if isinstance(host, str):
+            host = host.encode()
+        key = host_key(normalize_host(host))
+        # Find the last block starting at or before the key, then scan within it
+        low, high = 0, self._blocks - 1
+        if high < 0:
+            return False
+        while low < high:
+            middle = (low + high + 1) // 2
+            first, _ = self._read_entry(self._block_offset(middle), b'')
+            if first <= key:
+                low = middle
+            else:
+                high = middle - 1
+        offset = self._block_offset(low)
+        current = b''
+        for _ in range(min(self.block_size, self.count - low * self.block_size)):
+            current, offset = self._read_entry(offset, current)
+            if current >= key:
+                return current == key
+        return False
+
+def merge_keys(left, right, keep_left, keep_both, keep_right):
+    """Walk two sorted key streams in one pass and yield the keys of the kept regions"""
+    a = next(left, None)
+    b = next(right, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a < b):
+            if keep_left:
+                yield a
+            a = next(left, None)
+        elif a is None or b < a:
+            if keep_right:
+                yield b
+            b = next(right, None)
+        else:
+            if keep_both:
+                yield a
+            a = next(left, None)
+            b = next(right, None)
+
+def union(a, b):
+    return merge_keys(a.keys(), b.keys(), True, True, True)
+
+def intersection(a, b):
+    return merge_keys(a.keys(), b.keys(), False, True, False)
+
+def difference(a, b):
+    return merge_keys(a.keys(), b.keys(), True, False, False)
+
+def write_keys(path, keys):
+    """Write sorted unique keys to a host set and get how many were written"""
+    with HostSetWriter(path) as writer:
+        for key in keys:
+            writer.add(key)
+    return writer.count
+
+def build_hostset(path, text_paths, max_memory_lines=MAX_MEMORY_LINES):
+    """Build a host set from text files of hostnames, host:port pairs or URLs"""
+    keys = (
+        host_key(normalize_host(get_host(line)))
+        for text_path in text_paths for line in read_lines(text_path)
+    )
+    return write_keys(path, sorted_unique((key for key in keys if key), max_memory_lines))
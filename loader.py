@@ -1,86 +1,204 @@
+import os
+import math
 import luigi
-from task_classes import TaskExecution, ModuleTask
+from task_classes import TaskExecution, ModuleTask, line_offsets
+from workflow_registry import compile_workflow
+from task_history import TaskHistory
 from rich.console import Console
 
 console = Console()
 
 class WorkflowLoader:
-    def __init__(self, config, save_dir):
+    _priority_enabled = True
+    
+    @classmethod
+    def set_priority_enabled(cls, enabled):
+        """Prioritize tasks by their critical path instead of leaving the scheduler's FIFO order"""
+        cls._priority_enabled = enabled
+    
+    def __init__(self, config, save_dir, compiled=None):
         self.config = config
         self.save_dir = save_dir
         self.tasks = {}
         self.modules = {}
+        self.shards = {}
+        # Validated DAG with resolved dependencies, e.g. from the WorkflowRegistry cache
+        self.compiled = compiled or compile_workflow(config)
         
         # Set the loader reference in ModuleTask
         ModuleTask.set_loader(self)
         
         # Load all tasks
         self._load_tasks()
+        if self._priority_enabled:
+            self._prioritize()
     
     def _load_tasks(self):
-        """Load all tasks from the configuration"""
-        if 'workflow' not in self.config:
-            raise ValueError("No 'workflow' section found in configuration")
+        """Load all tasks from the compiled workflow"""
+        compiled_tasks = self.compiled['tasks']
         
-        workflow = self.config['workflow']
-        if 'modules' not in workflow:
-            raise ValueError("No 'modules' section found in workflow configuration")
+        # Tasks whose stdout is fed into a child task must write it to disk
+        streamed_parents = self._get_parents(lambda config: config.get('stream', False))
+        stdout_parents = self._get_parents(self._reads_parent_stdout)
         
-        # First pass: Create all task instances
-        for module_config in workflow['modules']:
-            module_name = module_config['name']
-            if 'tasks' not in module_config:
-                console.print(f"[yellow]Warning: No tasks found in module {module_name}[/yellow]")
-                continue
+        for module in self.compiled['modules']:
+            if 'tasks' not in module['config']:
+                console.print(f"[yellow]Warning: No tasks found in module {module['name']}[/yellow]")
+        
+        # Dependencies come first in topological order, so they already exist when a task is created
+        for task_id in self.compiled['order']:
+            compiled_task = compiled_tasks[task_id]
+            module_name, task_name = compiled_task['module'], compiled_task['name']
+            task_config = compiled_task['config']
+            if (task_id in stdout_parents or self._reads_parent_stdout(task_config) or 'shard' in task_config
+                    or task_config.get('hostset', False) or task_config.get('assets', False)):
+                task_config = dict(task_config, stream_output=True)
+            dependencies = tuple(self.tasks[dep_id] for dep_id in compiled_task['requires'])
             
-            for task_dict in module_config['tasks']:
-                task_name = list(task_dict.keys())[0]
-                task_config = task_dict[task_name]
-                task_id = f"{module_name}:{task_name}"
-                task = TaskExecution(
-                    name=task_name,
-                    module_name=module_name,
-                    config=task_config,
-                    save_dir=self.save_dir,
-                    args=task_config.get('arguments', {})
-                )
-                self.tasks[task_id] = task
-                TaskExecution._task_registry[f"{module_name}:{task_name}"] = task
+            if 'shard' in task_config:
+                # Shards of a sharded task each wait for its parents
+                self._add_sharded_task(module_name, task_name, task_config, dependencies)
+                continue
+            task = TaskExecution(
+                name=task_name,
+                module_name=module_name,
+                config=task_config,
+                save_dir=self.save_dir,
+                args=task_config.get('arguments', {})
+            )
+            task.dependencies = dependencies
+            self.tasks[task_id] = task
+            TaskExecution._task_registry[task_id] = task
         
-        # Second pass: Set up dependencies
-        for module_config in workflow['modules']:
-            module_name = module_config['name']
-            if 'tasks' not in module_config:
+        # Tasks render their templates from the placeholders found at compile time
+        for task_id, task in self.tasks.items():
+            task.placeholders = compiled_tasks[task_id.split('#')[0]]['placeholders']
+        
+        for module in self.compiled['modules']:
+            if 'tasks' not in module['config']:
                 continue
-                
-            for task_dict in module_config['tasks']:
-                task_name = list(task_dict.keys())[0]
-                task_config = task_dict[task_name]
-                task_id = f"{module_name}:{task_name}"
-                task = self.tasks[task_id]
-                
-                if 'requires' in task_config:
-                    dependencies = []
-                    for dep in task_config['requires']:
-                        if ':' in dep:  # Cross-module reference
-                            dep_module, dep_task = dep.split(':')
-                            dep_id = f"{dep_module}:{dep_task}"
-                        else:  # Same module reference
-                            dep_id = f"{module_name}:{dep}"
-                        
-                        if dep_id not in self.tasks:
-                            raise ValueError(f"Dependency '{dep_id}' not found for task '{task_id}'")
-                        dependencies.append(self.tasks[dep_id])
-                    
-                    task.dependencies = dependencies
-            
             # Create module task
-            module_task = ModuleTask(
-                name=module_name,
+            self.modules[module['name']] = ModuleTask(
+                name=module['name'],
                 save_dir=self.save_dir,
-                config=module_config
+                config=module['config']
             )
-            self.modules[module_name] = module_task
+        
+        # Streamed children tail their parent's output as soon as they start,
+        # so clear anything a previous run of an unfinished parent left behind
+        for task_id in streamed_parents:
+            task = self.tasks[task_id]
+            if not task.complete():
+                task.reset_stream()
+        
+        # Children also fail once a task their parent waits for fails, so a failure
+        # left by a previous scan must not count before Luigi runs the task again
+        pending = [dep for task_id in streamed_parents for dep in self.tasks[task_id].dependencies]
+        reset = set()
+        while pending:
+            task = pending.pop()
+            if task.get_task_id() in reset:
+                continue
+            reset.add(task.get_task_id())
+            if not task.complete() and task.get_status() == 'failed':
+                task._update_status('pending')
+            pending.extend(task.dependencies)
+    
+    def _prioritize(self):
+        """Set each task's scheduler priority to its longest remaining path in expected seconds"""
+        history = TaskHistory(TaskExecution.get_storage_manager(), TaskExecution.get_status_store())
+        history.update()
+        durations = history.estimate(list(self.tasks))
+        
+        children = {}
+        for task_id, task in self.tasks.items():
+            for dep in task.dependencies:
+                children.setdefault(dep.get_task_id(), []).append(task_id)
+        
+        # Tasks are added after their dependencies, so walking backwards sees children first.
+        # The scheduler raises dependencies to their dependents' priority on its own, so
+        # across workflows the tasks heading the longest chains start first.
+        remaining = {}
+        for task_id in reversed(list(self.tasks)):
+            remaining[task_id] = durations[task_id] + max(
+                (remaining[child] for child in children.get(task_id, [])), default=0
+            )
+            self.tasks[task_id].priority = math.ceil(remaining[task_id])
+    
+    def _reads_parent_stdout(self, task_config):
+        """Check whether a task is fed its parent's stdout"""
+        if task_config.get('stream', False) or task_config.get('incremental', False) or 'builtin' in task_config:
+            return True
+        return 'shard' in task_config and not task_config['shard'].get('input')
+    
+    def _get_parents(self, predicate):
+        """Get IDs of tasks required by a task whose config matches the predicate"""
+        parents = set()
+        for task in self.compiled['tasks'].values():
+            if predicate(task['config']):
+                parents.update(task['requires'])
+        return parents
+    
+    def _get_shard_ranges(self, task_id, task_config):
+        """Get the byte range of each shard a `shard` option splits a task into, or None per shard to split at run time"""
+        shard = task_config['shard']
+        if 'count' in shard:
+            return [None] * max(1, int(shard['count']))
+        if 'lines' not in shard:
+            raise ValueError(f"Task '{task_id}' needs `count` or `lines` in its shard option")
+        
+        # Splitting by lines needs the input up front to know how many shards there are.
+        # The same pass finds where each shard starts, so shards don't count it again.
+        source = task_config.get('arguments', {}).get(shard.get('input'))
+        if not source or not os.path.isfile(str(source)):
+            raise ValueError(f"Task '{task_id}' shards by lines, which needs an existing input file argument; use `count` instead")
+        offsets = line_offsets(source, int(shard['lines']))
+        return list(zip(offsets, offsets[1:]))
+    
+    def _add_sharded_task(self, module_name, task_name, task_config, dependencies):
+        """Expand a task with a `shard` option into shard tasks plus a merge task"""
+        task_id = f"{module_name}:{task_name}"
+        shard = task_config['shard']
+        ranges = self._get_shard_ranges(task_id, task_config)
+        count = len(ranges)
+        args = dict(task_config.get('arguments', {}))
+        source = args.get(shard['input']) if shard.get('input') else None
+        
+        shard_tasks = []
+        for index, byte_range in enumerate(ranges):
+            shard_name = f"{task_name}#{index}"
+            shard_path = TaskExecution.get_storage_manager().get_path('temp', f"{module_name}:{shard_name}.shard")
+            shard_config = dict(shard, index=index, count=count, source=source, path=shard_path)
+            if byte_range:
+                shard_config['start'], shard_config['end'] = byte_range
+            shard_args = dict(args)
+            if shard.get('input'):
+                shard_args[shard['input']] = shard_path
+            shard_task = TaskExecution(
+                name=shard_name,
+                module_name=module_name,
+                config=dict(task_config, hostset=False, assets=False, shard=shard_config),
+                save_dir=self.save_dir,
+                args=shard_args
+            )
+            shard_task.dependencies = dependencies
+            shard_tasks.append(shard_task)
+            self.tasks[f"{module_name}:{shard_name}"] = shard_task
+            TaskExecution._task_registry[f"{module_name}:{shard_name}"] = shard_task
+        
+        # The merge task keeps the original ID so downstream `requires` still resolve
+        merge_config = {key: value for key, value in task_config.items() if key not in ('shard', 'requires', 'resources')}
+        merge_task = TaskExecution(
+            name=task_name,
+            module_name=module_name,
+            config=dict(merge_config, merge_shards=[task.get_task_id() for task in shard_tasks]),
+            save_dir=self.save_dir,
+            args=args
+        )
+        merge_task.dependencies = tuple(shard_tasks)
+        self.shards[task_id] = shard_tasks
+        self.tasks[task_id] = merge_task
+        TaskExecution._task_registry[task_id] = merge_task
     
     def get_tasks(self):
         """Get all tasks"""
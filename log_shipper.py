@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+import os
+import json
+import gzip
+import shlex
+import shutil
+import threading
+from datetime import datetime
+from ssh_pool import get_pool
+
+WORKER_LOG = "/var/log/k4enum-worker.log"
+JOURNAL_UNIT = "k4enum-worker"
+MAX_TRANSFER_BYTES = 8 * 1024 * 1024  # Per stream and cycle; the rest follows next cycle
+SEGMENT_SIZE = 16 * 1024 * 1024
+MAX_SEGMENTS = 50  # Compressed segments kept per node and stream
+SHIP_TIMEOUT = 30
+
+# Runs on the node and prints a JSON header line followed by the new worker
+# log bytes and then the new journal output. argv: log path, last inode,
+# last offset, byte limit, journal unit, last journald cursor.
+LOG_PROBE = r'''
+import os, sys, json, subprocess
+
+path, inode, offset, limit, unit, cursor = sys.argv[1:7]
+inode, offset, limit = int(inode), int(offset), int(limit)
+
+worker = b''
+try:
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        # A new inode or a shorter file means the log was rotated or truncated
+        if stat.st_ino != inode or stat.st_size < offset:
+            offset = 0
+        f.seek(offset)
+        worker = f.read(limit)
+    inode = stat.st_ino
+except OSError:
+    inode, offset = 0, 0
+
+command = ['journalctl', '-u', unit, '--no-pager', '--show-cursor', '-o', 'short-iso']
+command += [f'--after-cursor={cursor}'] if cursor else ['--since', '1 hour ago']
+try:
+    system = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+except OSError:
+    system = b''
+head, _, last = system.rstrip(b'\n').rpartition(b'\n')
+if last.startswith(b'-- cursor: '):
+    cursor = last[len(b'-- cursor: '):].decode()
+    system = head + b'\n' if head else b''
+elif last.startswith(b'-- No entries --'):
+    system = b''
+
+header = {'inode': inode, 'offset': offset, 'worker_bytes': len(worker), 'cursor': cursor, 'system_bytes': len(system)}
+sys.stdout.buffer.write(json.dumps(header).encode() + b'\n' + worker + system)
+'''
+
+class LogShipper:
+    """Ship only new node log bytes into rotated, gzip-compressed per-node segments"""
+    def __init__(self, storage_manager, segment_size=SEGMENT_SIZE, max_segments=MAX_SEGMENTS,
+                 max_transfer=MAX_TRANSFER_BYTES):
+        self.storage_manager = storage_manager
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.max_transfer = max_transfer
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get_log_dir(self, node):
+        log_dir = self.storage_manager.get_path('logs', node['name'])
+        os.makedirs(log_dir, exist_ok=True)
+        return log_dir
+
+    def load_state(self, log_dir):
+        """Get the last shipped worker log inode/offset and journald cursor of a node"""
+        try:
+            with open(os.path.join(log_dir, '.shipping.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'inode': 0, 'offset': 0, 'cursor': ''}
+
+    def save_state(self, log_dir, state):
+        path = os.path.join(log_dir, '.shipping.json')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def ship(self, node):
+        """Transfer and append everything logged on a node since the last call"""
+        with self._lock:
+            node_lock = self._locks.setdefault(node['name'], threading.Lock())
+        # A node still shipping from a timed out cycle must not append twice
+        if not node_lock.acquire(blocking=False):
+            return False
+        try:
+            log_dir = self.get_log_dir(node)
+            state = self.load_state(log_dir)
+            command = 'python3 -c {} {} {} {} {} {} {}'.format(*map(shlex.quote, [
+                LOG_PROBE, WORKER_LOG, str(state['inode']), str(state['offset']),
+                str(self.max_transfer), JOURNAL_UNIT, state['cursor'] or ''
+            ]))
+
+            stdin, stdout, stderr = get_pool().get_client(node).exec_command(command, timeout=SHIP_TIMEOUT)
+            output = stdout.read()
+            if stdout.channel.recv_exit_status() != 0:
+                raise Exception(f"Log probe failed: {stderr.read().decode(errors='replace').strip()}")
+
+            header_line, _, data = output.partition(b'\n')
+            header = json.loads(header_line)
+            worker = data[:header['worker_bytes']]
+            system = data[header['worker_bytes']:header['worker_bytes'] + header['system_bytes']]
+
+            self.append(log_dir, 'worker', worker)
+            self.append(log_dir, 'system', system)
+            # Saved after appending: a crash in between re-ships rather than loses lines
+            self.save_state(log_dir, {
+                'inode': header['inode'],
+                'offset': header['offset'] + len(worker),
+                'cursor': header['cursor']
+            })
+            return True
+        finally:
+            node_lock.release()
+
+    def append(self, log_dir, stream, data):
+        """Append bytes to a stream's active segment, rotating it once it is full"""
+        if not data:
+            return
+        path = os.path.join(log_dir, f'{stream}.log')
+        with open(path, 'ab') as f:
+            f.write(data)
+            size = f.tell()
+        if size >= self.segment_size:
+            self.rotate(log_dir, stream)
+
+    def rotate(self, log_dir, stream):
+        """Compress the active segment and drop the oldest ones beyond the limit"""
+        path = os.path.join(log_dir, f'{stream}.log')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        segment = os.path.join(log_dir, f'{stream}_{timestamp}.log.gz')
+        with open(path, 'rb') as src, gzip.open(f'{segment}.tmp', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(f'{segment}.tmp', segment)
+        os.remove(path)
+
+        segments = self.list_segments(log_dir, stream)
+        for old in segments[:-self.max_segments] if self.max_segments else []:
+            os.remove(os.path.join(log_dir, old))
+
+    def list_segments(self, log_dir, stream):
+        """Get the compressed segment names of a stream, oldest first"""
+        return sorted(
+            name for name in os.listdir(log_dir)
+            if name.startswith(f'{stream}_') and name.endswith('.log.gz')
+        )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger('k4enum.metrics')
+
+DEFAULT_PATH = "~/.k4enum/metrics.db"  # Local to the host running the monitor and the UI
+
+# Numeric node metrics kept in the store, in column order
+METRICS = [
+    'cpu_usage', 'memory_usage', 'disk_usage', 'load_avg', 'luigi_workers', 'task_processes',
+    'net_rx_bytes_per_sec', 'net_tx_bytes_per_sec', 'open_files', 'online'
+]
+
+# Sample resolution in seconds -> seconds kept. Coarser levels are averages of the one below.
+RESOLUTIONS = {
+    60: 2 * 86400,
+    300: 30 * 86400,
+    3600: 365 * 86400
+}
+PRUNE_INTERVAL = 3600
+MAX_POINTS = 1000
+
+class MetricsStore:
+    """Fixed-width node metric samples in SQLite, downsampled into coarser averages with retention"""
+    def __init__(self, path, resolutions=None, wal=True):
+        self.path = path
+        self.resolutions = dict(sorted((resolutions or RESOLUTIONS).items()))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # The UI reads while the monitor writes; WAL needs shared memory, which NFS doesn't provide
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ', '.join(f"{metric} REAL" for metric in METRICS)
+        with self.conn:
+            # Clustered on (node, resolution, ts) so a range query is one contiguous scan
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS samples (
+                    node TEXT NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,
+                    samples INTEGER NOT NULL,
+                    {columns},
+                    PRIMARY KEY (node, resolution, ts)
+                ) WITHOUT ROWID
+            """)
+
+    def record(self, metrics, timestamp=None):
+        """Append one monitoring cycle's metrics and update the downsampled levels"""
+        timestamp = int(timestamp or time.time())
+        levels = list(self.resolutions)
+        with self._lock, self.conn:
+            for metric in metrics:
+                online = metric.get('status') == 'online'
+                values = [metric.get(name) if online else None for name in METRICS[:-1]] + [1.0 if online else 0.0]
+                ts = timestamp - timestamp % levels[0]
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO samples (node, resolution, ts, samples, {', '.join(METRICS)}) "
+                    f"VALUES (?, ?, ?, 1, {', '.join('?' * len(METRICS))})",
+                    [metric['node'], levels[0], ts] + values
+                )
+                for source, level in zip(levels, levels[1:]):
+                    self._rollup(metric['node'], source, level, timestamp)
+            if timestamp - self._last_prune >= PRUNE_INTERVAL:
+                self.prune(timestamp)
+
+    def _rollup(self, node, source, level, timestamp):
+        """Recompute the level bucket containing timestamp from the finer level"""
+        bucket = timestamp - timestamp % level
+        averages = ', '.join(f"AVG({metric})" for metric in METRICS)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO samples (node, resolution, ts, samples, {', '.join(METRICS)}) "
+            f"SELECT node, ?, ?, SUM(samples), {averages} FROM samples "
+            f"WHERE node = ? AND resolution = ? AND ts >= ? AND ts < ? GROUP BY node",
+            (level, bucket, node, source, bucket, bucket + level)
+        )
+
+    def prune(self, now=None):
+        """Drop samples older than the retention of their level"""
+        now = int(now or time.time())
+        nodes = [row[0] for row in self.conn.execute('SELECT DISTINCT node FROM samples')]
+        for node in nodes:
+            for level, retention in self.resolutions.items():
+                self.conn.execute(
+                    'DELETE FROM samples WHERE node = ? AND resolution = ? AND ts < ?',
+                    (node, level, now - retention)
+                )
+        self._last_prune = now
+
+    def choose_resolution(self, start, end, max_points=MAX_POINTS, now=None):
+        """Get the finest level that still covers start and returns at most max_points"""
+        now = now or time.time()
+        for level, retention in self.resolutions.items():
+            if start >= now - retention and (end - start) / level <= max_points:
+                return level
+        return max(self.resolutions)
+
+    def query(self, node, metric, start, end=None, resolution=None, max_points=MAX_POINTS):
+        """Get [timestamp, value] points of one node metric between start and end"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        if resolution is not None and resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution: {resolution}, use one of {', '.join(map(str, self.resolutions))}")
+        end = end or time.time()
+        if resolution is None:
+            resolution = self.choose_resolution(start, end, max_points)
+        rows = self.conn.execute(
+            f"SELECT ts, {metric} FROM samples WHERE node = ? AND resolution = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (node, resolution, int(start) - int(start) % resolution, int(end))
+        ).fetchall()
+        return {
+            'node': node,
+            'metric': metric,
+            'resolution': resolution,
+            'points': [list(row) for row in rows]
+        }
+
+    def latest(self):
+        """Get the most recent sample of every node"""
+        level = next(iter(self.resolutions))
+        rows = self.conn.execute(f"""
+            SELECT node, ts, {', '.join(METRICS)} FROM samples s
+            WHERE resolution = ? AND ts = (SELECT MAX(ts) FROM samples WHERE node = s.node AND resolution = ?)
+            ORDER BY node
+        """, (level, level)).fetchall()
+        return [dict(zip(['node', 'ts'] + METRICS, row)) for row in rows]
+
+    def list_nodes(self):
+        """Get the names of all nodes with stored samples"""
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT node FROM samples ORDER BY node')]
+
+def get_metrics_store(storage_manager):
+    """Open the metrics store at the local path configured under `metrics:` in the storage config"""
+    path = os.path.expanduser(storage_manager.config.get('metrics', {}).get('path', DEFAULT_PATH))
+    shared = storage_manager.is_shared(path)
+    if shared:
+        logger.warning(f"Metrics store {path} is in shared storage, falling back to a rollback journal")
+    return MetricsStore(path, wal=not shared)
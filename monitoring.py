@@ -3,20 +3,112 @@ import os
 import time
 import json
 import psutil
+import shlex
 import logging
-import paramiko
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
 from storage_manager import StorageManager
 from node_manager import NodeManager
+from ssh_pool import get_pool
+from log_shipper import LogShipper
+from metrics_store import get_metrics_store
 
 console = Console()
 
+PROBE_TIMEOUT = 15
+
+# Runs on the node and prints every metric as one JSON document, so a
+# monitoring cycle costs a single round trip per node. argv[1] is the
+# shared storage mount point.
+METRICS_PROBE = r'''
+import os, sys, json, time
+
+def cpu_times():
+    times = {}
+    with open('/proc/stat') as f:
+        for line in f:
+            if line.startswith('cpu'):
+                name, *values = line.split()
+                values = [int(v) for v in values]
+                times[name] = (sum(values), values[3] + values[4])
+    return times
+
+def net_bytes():
+    rx = tx = 0
+    with open('/proc/net/dev') as f:
+        for line in f.readlines()[2:]:
+            name, data = line.split(':', 1)
+            if name.strip() != 'lo':
+                values = data.split()
+                rx += int(values[0])
+                tx += int(values[8])
+    return rx, tx
+
+def usage(before, after):
+    total = after[0] - before[0]
+    return round(100.0 * (total - (after[1] - before[1])) / total, 1) if total else 0.0
+
+mount_point = sys.argv[1]
+cpu_before, net_before, started = cpu_times(), net_bytes(), time.time()
+time.sleep(0.5)
+cpu_after, net_after, elapsed = cpu_times(), net_bytes(), time.time() - started
+
+meminfo = {}
+with open('/proc/meminfo') as f:
+    for line in f:
+        key, value = line.split(':', 1)
+        meminfo[key] = int(value.split()[0])
+
+disk = os.statvfs(mount_point)
+with open('/proc/loadavg') as f:
+    load_avg = float(f.read().split()[0])
+with open('/proc/sys/fs/file-nr') as f:
+    open_files = int(f.read().split()[0])
+
+luigi_workers = task_processes = 0
+for pid in filter(str.isdigit, os.listdir('/proc')):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            argv = f.read().split(b'\0')
+        # luigid itself, or an interpreter running it. Not this probe, whose source mentions it
+        if any(os.path.basename(arg) == b'luigid' for arg in argv[:2]):
+            luigi_workers += 1
+        # Tasks run with their working directory in shared storage
+        if os.readlink(f'/proc/{pid}/cwd').startswith(mount_point):
+            task_processes += 1
+    except OSError:
+        continue
+
+print(json.dumps({
+    'cpu_usage': usage(cpu_before['cpu'], cpu_after['cpu']),
+    'cpu_per_core': [usage(cpu_before[n], cpu_after[n]) for n in sorted(cpu_after, key=lambda n: int(n[3:] or -1)) if n != 'cpu'],
+    'memory_usage': round(100.0 * (meminfo['MemTotal'] - meminfo.get('MemAvailable', meminfo['MemFree'])) / meminfo['MemTotal'], 1),
+    'disk_usage': round(100.0 * (disk.f_blocks - disk.f_bfree) / disk.f_blocks, 1) if disk.f_blocks else 0.0,
+    'load_avg': load_avg,
+    'net_rx_bytes_per_sec': int((net_after[0] - net_before[0]) / elapsed),
+    'net_tx_bytes_per_sec': int((net_after[1] - net_before[1]) / elapsed),
+    'open_files': open_files,
+    'luigi_workers': luigi_workers,
+    'task_processes': task_processes
+}))
+'''
+
+MAX_MONITOR_WORKERS = 32
+NODE_DEADLINE = 45  # Seconds a monitoring cycle waits for any one node
+
 class MonitoringSystem:
-    def __init__(self):
+    def __init__(self, node_deadline=NODE_DEADLINE, max_workers=MAX_MONITOR_WORKERS):
         self.storage_manager = StorageManager()
         self.node_manager = NodeManager()
+        self.log_shipper = LogShipper(self.storage_manager)
+        self.metrics_store = get_metrics_store(self.storage_manager)
+        self.node_deadline = node_deadline
+        self.max_workers = max_workers
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
         self.setup_logging()
     
     def setup_logging(self):
@@ -36,52 +128,24 @@ class MonitoringSystem:
         self.logger = logging.getLogger('k4enum.monitor')
     
     def get_node_metrics(self, node):
-        """Get health metrics from a node"""
+        """Get health metrics from a node with a single remote probe"""
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                node['host'],
-                node['port'],
-                node['username'],
-                key_filename=node['key_file'],
-                timeout=5
-            )
-            
-            # Get CPU usage
-            stdin, stdout, stderr = ssh.exec_command('top -bn1 | grep "Cpu(s)" | sed "s/.*, *\\([0-9.]*\\)%* id.*/\\1/" | awk \'{print 100 - $1}\'')
-            cpu_usage = float(stdout.read().decode().strip())
-            
-            # Get memory usage
-            stdin, stdout, stderr = ssh.exec_command('free | grep Mem | awk \'{print $3/$2 * 100.0}\'')
-            memory_usage = float(stdout.read().decode().strip())
-            
-            # Get disk usage
-            stdin, stdout, stderr = ssh.exec_command(f'df {self.storage_manager.config["client"]["mount_point"]} | tail -1 | awk \'{{print $5}}\' | sed \'s/%//\'')
-            disk_usage = float(stdout.read().decode().strip())
-            
-            # Get active Luigi workers
-            stdin, stdout, stderr = ssh.exec_command('ps aux | grep "luigid" | grep -v grep | wc -l')
-            luigi_workers = int(stdout.read().decode().strip())
-            
-            # Get system load
-            stdin, stdout, stderr = ssh.exec_command('uptime | awk -F\'load average:\' \'{ print $2 }\' | awk -F\', \' \'{ print $1 }\'')
-            load_avg = float(stdout.read().decode().strip())
-            
-            ssh.close()
+            mount_point = self.storage_manager.config["client"]["mount_point"]
+            command = f"python3 -c {shlex.quote(METRICS_PROBE)} {shlex.quote(mount_point)}"
+            exit_status, output, error = get_pool().exec_command(node, command, timeout=PROBE_TIMEOUT)
+            if exit_status != 0:
+                raise Exception(f"Metrics probe failed: {error.strip()}")
             
+            probe = json.loads(output)
             return {
                 'timestamp': datetime.now().isoformat(),
                 'node': node['name'],
                 'status': 'online',
-                'cpu_usage': cpu_usage,
-                'memory_usage': memory_usage,
-                'disk_usage': disk_usage,
-                'luigi_workers': luigi_workers,
-                'load_avg': load_avg
+                **probe
             }
             
         except Exception as e:
+            get_pool().close(node)  # Reconnect on the next cycle
             self.logger.error(f"Error getting metrics from node {node['name']}: {str(e)}")
             return {
                 'timestamp': datetime.now().isoformat(),
@@ -91,69 +155,79 @@ class MonitoringSystem:
             }
     
     def collect_logs(self, node):
-        """Collect logs from a node"""
+        """Ship new worker and journal log lines from a node into its log segments"""
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                node['host'],
-                node['port'],
-                node['username'],
-                key_filename=node['key_file'],
-                timeout=5
-            )
-            
-            # Get Luigi worker logs
-            stdin, stdout, stderr = ssh.exec_command('cat /var/log/k4enum-worker.log')
-            worker_logs = stdout.read().decode()
-            
-            # Get system logs related to k4enum
-            stdin, stdout, stderr = ssh.exec_command('journalctl -u k4enum-worker --since "1 hour ago"')
-            system_logs = stdout.read().decode()
-            
-            ssh.close()
-            
-            # Save logs to shared storage
-            log_dir = self.storage_manager.get_path('logs', node['name'])
-            os.makedirs(log_dir, exist_ok=True)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
-            with open(os.path.join(log_dir, f'worker_{timestamp}.log'), 'w') as f:
-                f.write(worker_logs)
-            
-            with open(os.path.join(log_dir, f'system_{timestamp}.log'), 'w') as f:
-                f.write(system_logs)
-            
-            return True
+            return self.log_shipper.ship(node)
             
         except Exception as e:
+            get_pool().close(node)
             self.logger.error(f"Error collecting logs from node {node['name']}: {str(e)}")
             return False
     
+    def _check_node(self, node, results):
+        """Get metrics from one node, then collect its logs if it is online"""
+        try:
+            node_metrics = self.get_node_metrics(node)
+            # Publish metrics before the slower log transfer so a late node still reports them
+            results[node['name']] = node_metrics
+            if node_metrics['status'] == 'online':
+                self.collect_logs(node)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(node['name'])
+    
+    def _unavailable_metrics(self, node, status, error):
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'node': node['name'],
+            'status': status,
+            'error': error
+        }
+    
     def monitor_nodes(self):
-        """Monitor all nodes and collect metrics"""
+        """Monitor all nodes concurrently and collect metrics"""
         nodes = self.node_manager.list_nodes()
-        metrics = []
+        results = {}
+        futures = []
         
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(nodes))))
         for node in nodes:
-            # Get node metrics
-            node_metrics = self.get_node_metrics(node)
-            metrics.append(node_metrics)
-            
-            # Collect logs if node is online
-            if node_metrics['status'] == 'online':
-                self.collect_logs(node)
+            with self._in_flight_lock:
+                busy = node['name'] in self._in_flight
+                if not busy:
+                    self._in_flight.add(node['name'])
+            if busy:
+                continue  # Still stuck in an earlier cycle
+            futures.append(executor.submit(self._check_node, node, results))
         
-        # Save metrics to shared storage
-        metrics_dir = self.storage_manager.get_path('logs', 'metrics')
-        os.makedirs(metrics_dir, exist_ok=True)
+        # Wait for the slowest node, but never past the deadline
+        wait(futures, timeout=self.node_deadline)
+        executor.shutdown(wait=False)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        metrics_file = os.path.join(metrics_dir, f'metrics_{timestamp}.json')
+        metrics = []
+        for node in nodes:
+            if node['name'] in results:
+                metrics.append(results[node['name']])
+            elif node['name'] in self._in_flight:
+                metrics.append(self._unavailable_metrics(
+                    node, 'timeout', f"No response within {self.node_deadline} seconds"
+                ))
+            else:
+                metrics.append(self._unavailable_metrics(node, 'offline', 'Metrics collection failed'))
         
-        with open(metrics_file, 'w') as f:
-            json.dump(metrics, f, indent=2)
+        # Append to the metrics time series in shared storage
+        self.metrics_store.record(metrics)
+        
+        # Keep the liveness table fresh so the CLI can use it without probing
+        self.node_manager.liveness.update({
+            metric['node']: {
+                'online': metric['status'] == 'online',
+                'error': metric.get('error'),
+                'latency': None,
+                'checked_at': time.time()
+            }
+            for metric in metrics
+        })
         
         return metrics
     
@@ -168,6 +242,9 @@ class MonitoringSystem:
         table.add_column("Disk Usage", style="yellow")
         table.add_column("Load Avg", style="yellow")
         table.add_column("Workers", style="yellow")
+        table.add_column("Tasks", style="yellow")
+        table.add_column("Net RX/TX", style="yellow")
+        table.add_column("Open Files", style="yellow")
         
         for metric in metrics:
             if metric['status'] == 'online':
@@ -178,12 +255,18 @@ class MonitoringSystem:
                     f"{metric['memory_usage']:.1f}%",
                     f"{metric['disk_usage']:.1f}%",
                     f"{metric['load_avg']:.2f}",
-                    str(metric['luigi_workers'])
+                    str(metric['luigi_workers']),
+                    str(metric['task_processes']),
+                    f"{metric['net_rx_bytes_per_sec'] / 1024:.0f}/{metric['net_tx_bytes_per_sec'] / 1024:.0f} KB/s",
+                    str(metric['open_files'])
                 )
             else:
                 table.add_row(
                     metric['node'],
-                    "[red]Offline[/red]",
+                    "[yellow]Timeout[/yellow]" if metric['status'] == 'timeout' else "[red]Offline[/red]",
+                    "-",
+                    "-",
+                    "-",
                     "-",
                     "-",
                     "-",
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+LIVENESS_TTL = 120  # Seconds a check is trusted; the monitor refreshes it every cycle
+TCP_TIMEOUT = 1
+SSH_TIMEOUT = 5
+MAX_PROBE_WORKERS = 32
+
+def tcp_reachable(host, port, timeout=TCP_TIMEOUT):
+    """Check something accepts connections on a node's SSH port, without a handshake"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def check_node(node, ssh_timeout=SSH_TIMEOUT):
+    """Check a node is up, skipping the SSH handshake when its port doesn't even answer"""
+    from ssh_pool import get_pool
+    started = time.time()
+    if not tcp_reachable(node['host'], node['port']):
+        online, error = False, f"{node['host']}:{node['port']} is unreachable"
+    elif get_pool().test(node, timeout=ssh_timeout):
+        online, error = True, None
+    else:
+        online, error = False, "SSH connection failed"
+    return {
+        'online': online,
+        'error': error,
+        'latency': time.time() - started,
+        'checked_at': time.time()
+    }
+
+class LivenessTable:
+    """Last known reachability of each node, shared by the CLI and the monitor"""
+    def __init__(self, path, ttl=LIVENESS_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def update(self, results):
+        """Merge new checks into the table, keeping whichever check of a node is newer"""
+        entries = self.load()
+        for name, entry in results.items():
+            if name not in entries or entries[name]['checked_at'] <= entry['checked_at']:
+                entries[name] = entry
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+        return entries
+
+    def get_fresh(self, now=None):
+        """Get the checks that are still within the TTL"""
+        now = now or time.time()
+        return {name: entry for name, entry in self.load().items() if now - entry['checked_at'] <= self.ttl}
+
+    def check(self, nodes, refresh=False, max_workers=MAX_PROBE_WORKERS):
+        """Get the liveness of nodes, probing concurrently only those without a fresh check"""
+        results = {} if refresh else self.get_fresh()
+        stale = [node for node in nodes if node['name'] not in results]
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(stale))) as executor:
+                probed = dict(zip(
+                    [node['name'] for node in stale],
+                    executor.map(check_node, stale)
+                ))
+            results.update(probed)
+            self.update(probed)
+        return {node['name']: results[node['name']] for node in nodes}
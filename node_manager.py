@@ -2,9 +2,10 @@
 import os
 import json
 import subprocess
-import paramiko
 from rich.console import Console
 from storage_manager import StorageManager
+from ssh_pool import get_pool
+from node_liveness import LivenessTable, check_node
 
 console = Console()
 
@@ -12,6 +13,7 @@ class NodeManager:
     def __init__(self, nodes_file="config/nodes.json"):
         self.nodes_file = nodes_file
         self.storage_manager = StorageManager()
+        self.liveness = LivenessTable(self.storage_manager.get_path('state', 'liveness.json'))
         self._ensure_config_dir()
         self._load_nodes()
     
@@ -41,11 +43,18 @@ class NodeManager:
                 console.print(f"[yellow]Node {name} already exists[/yellow]")
                 return False
             
+            node_info = {
+                'name': name,
+                'host': host,
+                'port': port,
+                'username': username,
+                'key_file': key_file,
+                'cores': cores
+            }
+            
             # Test SSH connection
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             try:
-                ssh.connect(host, port, username, key_filename=key_file)
+                ssh = get_pool().get_client(node_info)
             except Exception as e:
                 console.print(f"[red]SSH connection failed: {str(e)}[/red]")
                 return False
@@ -106,14 +115,7 @@ class NodeManager:
                 console.print("[yellow]Warning: Error while setting up systemd service[/yellow]")
             
             # Add node to registry
-            node_info = {
-                'name': name,
-                'host': host,
-                'port': port,
-                'username': username,
-                'key_file': key_file,
-                'cores': cores
-            }
+            node_info['cores'] = cores
             self.nodes.append(node_info)
             self._save_nodes()
             
@@ -123,9 +125,6 @@ class NodeManager:
         except Exception as e:
             console.print(f"[red]Error registering node: {str(e)}[/red]")
             return False
-        finally:
-            if 'ssh' in locals():
-                ssh.close()
     
     def remove_node(self, name):
         """Remove a registered node"""
@@ -136,9 +135,7 @@ class NodeManager:
         
         try:
             # Connect to node
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(node['host'], node['port'], node['username'], key_filename=node['key_file'])
+            ssh = get_pool().get_client(node)
             
             # Stop and remove systemd service
             stdin, stdout, stderr = ssh.exec_command('sudo systemctl stop k4enum-worker && sudo systemctl disable k4enum-worker && sudo rm /etc/systemd/system/k4enum-worker.service')
@@ -158,8 +155,7 @@ class NodeManager:
         except Exception as e:
             console.print(f"[red]Error removing node: {str(e)}[/red]")
         finally:
-            if 'ssh' in locals():
-                ssh.close()
+            get_pool().close(node)
     
     def list_nodes(self):
         """List all registered nodes"""
@@ -175,11 +171,10 @@ class NodeManager:
         if not node:
             return False
         
-        try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(node['host'], node['port'], node['username'], key_filename=node['key_file'], timeout=5)
-            ssh.close()
-            return True
-        except:
-            return False 
\ No newline at end of file
+        result = check_node(node)
+        self.liveness.update({name: result})
+        return result['online']
+    
+    def check_nodes(self, refresh=False):
+        """Get the liveness of every node, from the cached table where it is fresh"""
+        return self.liveness.check(self.nodes, refresh=refresh) 
\ No newline at end of file
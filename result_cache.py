@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import yaml
+from rich.console import Console
+from storage_manager import StorageManager
+
+console = Console()
+
+DIGEST_CHUNK_SIZE = 1024 * 1024
+EVICT_STAMP = ".last_evict"  # Inside the cache directory; its mtime is when eviction last ran
+
+def file_digest(path):
+    """Get the SHA-256 digest of a file without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def tree_digest(path):
+    """Get a digest covering every file name and content below a directory"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(file_digest(file_path).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Content-addressed store of task results shared across scans"""
+    def __init__(self, config_path="config/cache.yaml", storage_manager=None):
+        self.config_path = config_path
+        self.storage_manager = storage_manager or StorageManager()
+        self.load_config()
+
+    def load_config(self):
+        """Load cache configuration from YAML file"""
+        self.config = {'enabled': True, 'ttl': 7 * 24 * 3600, 'max_size': 10 * 1024 ** 3, 'evict_interval': 600}
+        if os.path.exists(self.config_path):
+            with open(self.config_path) as f:
+                self.config.update(yaml.safe_load(f).get('cache', {}))
+
+    @property
+    def enabled(self):
+        return bool(self.config.get('enabled', True))
+
+    def get_cache_dir(self):
+        """Get the cache root in shared storage"""
+        return self.storage_manager.ensure_directory('cache')
+
+    def make_key(self, command, input_paths, version=''):
+        """Build the cache key for a rendered command and its input artifacts"""
+        digest = hashlib.sha256()
+        digest.update(f"command:{command}\n".encode())
+        digest.update(f"version:{version}\n".encode())
+        for path in sorted(set(input_paths)):
+            if os.path.isdir(path):
+                content = tree_digest(path)
+            elif os.path.isfile(path):
+                content = file_digest(path)
+            else:
+                content = 'missing'
+            # Paths are already part of the command, so only content counts here
+            digest.update(f"input:{content}\n".encode())
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.get_cache_dir(), key)
+
+    def _read_meta(self, entry_dir):
+        with open(os.path.join(entry_dir, 'meta.json')) as f:
+            return json.load(f)
+
+    def _write_meta(self, entry_dir, meta):
+        meta_file = os.path.join(entry_dir, 'meta.json')
+        with open(f"{meta_file}.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_file}.tmp", meta_file)
+
+    def lookup(self, key):
+        """Get the entry directory for a key, or None if missing or expired"""
+        entry_dir = self._entry_dir(key)
+        try:
+            meta = self._read_meta(entry_dir)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - meta['created_at'] > self.config['ttl']:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        meta['last_used'] = time.time()
+        self._write_meta(entry_dir, meta)
+        return entry_dir
+
+    def store(self, key, files, results_dir):
+        """Store task output files and its results directory under a key"""
+        tmp_dir = os.path.join(self.get_cache_dir(), f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(os.path.join(tmp_dir, 'files'))
+            for path in files:
+                if os.path.exists(path):
+                    shutil.copy2(path, os.path.join(tmp_dir, 'files', os.path.basename(path)))
+            if os.path.isdir(results_dir):
+                shutil.copytree(results_dir, os.path.join(tmp_dir, 'results'))
+
+            now = time.time()
+            size = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(tmp_dir) for name in names
+            )
+            self._write_meta(tmp_dir, {'key': key, 'created_at': now, 'last_used': now, 'size': size})
+
+            # Another worker may have stored the same result meanwhile
+            try:
+                os.rename(tmp_dir, self._entry_dir(key))
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            console.print(f"[yellow]Warning: Could not cache result {key}: {str(e)}[/yellow]")
+            return False
+
+        self.evict_if_due()
+        return True
+
+    def materialize(self, entry_dir, files, results_dir):
+        """Restore cached output files and results directory into place"""
+        cached_files = os.path.join(entry_dir, 'files')
+        for path in files:
+            cached = os.path.join(cached_files, os.path.basename(path))
+            if os.path.exists(cached):
+                shutil.copy2(cached, path)
+
+        cached_results = os.path.join(entry_dir, 'results')
+        if os.path.isdir(cached_results):
+            shutil.copytree(cached_results, results_dir, dirs_exist_ok=True)
+
+    def evict_if_due(self):
+        """Evict at most once per `evict_interval` across all workers, as it lists the whole cache"""
+        stamp = os.path.join(self.get_cache_dir(), EVICT_STAMP)
+        now = time.time()
+        try:
+            if now - os.path.getmtime(stamp) < self.config['evict_interval']:
+                return False
+        except OSError:
+            pass
+        # Claim this round before scanning, so other workers storing meanwhile skip it
+        with open(stamp, 'a'):
+            os.utime(stamp, (now, now))
+        self.evict()
+        return True
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones above the size limit"""
+        now = time.time()
+        entries = []
+        cache_dir = self.get_cache_dir()
+        for name in os.listdir(cache_dir):
+            entry_dir = os.path.join(cache_dir, name)
+            if name.startswith('.'):
+                continue
+            try:
+                meta = self._read_meta(entry_dir)
+            except (OSError, ValueError):
+                continue
+            if now - meta['created_at'] > self.config['ttl']:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            else:
+                entries.append((meta['last_used'], meta['size'], entry_dir))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.config['max_size']:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
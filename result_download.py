@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import os
+import re
+import time
+import zlib
+import tarfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+TAR_BLOCK_SIZE = 512
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header doesn't fit the file"""
+    pass
+
+def parse_range(header, size):
+    """Parse a single `bytes=` Range header into an inclusive (start, end), or None to send everything"""
+    if not header:
+        return None
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+    if not match or not any(match.groups()):
+        return None  # Unsupported or multi-range requests get the whole file
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+def choose_encoding(accept_encoding):
+    """Pick the best supported compression from an Accept-Encoding header"""
+    accepted = {value.split(';')[0].strip() for value in (accept_encoding or '').split(',')}
+    if 'zstd' in accepted and zstandard is not None:
+        return 'zstd'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def iter_file(path, start=0, end=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Yield a file's bytes from start to end (inclusive) in fixed-size chunks"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+def get_compressions():
+    """Get the compressions this host can produce, which depends on zstandard being installed"""
+    return ['gzip', 'zstd'] if zstandard is not None else ['gzip']
+
+def compress_stream(chunks, encoding):
+    """Compress a stream of chunks on the fly, checking the encoding before anything is sent"""
+    if encoding is None:
+        return iter(chunks)
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    elif encoding == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        compressor = zstandard.ZstdCompressor().compressobj()
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    return _compressed(chunks, compressor)
+
+def _compressed(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def iter_tar(root, arcname=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Yield an uncompressed tar archive of a directory tree one file chunk at a time"""
+    arcname = arcname or os.path.basename(os.path.normpath(root))
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        relative = os.path.relpath(directory, root)
+        base = arcname if relative == '.' else os.path.join(arcname, relative)
+        yield _tar_header(directory, base, tarfile.DIRTYPE, 0)
+
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path):
+                continue
+            # Files may still be growing, so stick to the size in the header
+            size = os.path.getsize(path)
+            yield _tar_header(path, os.path.join(base, name), tarfile.REGTYPE, size)
+            sent = 0
+            for chunk in iter_file(path, 0, size - 1, chunk_size) if size else []:
+                sent += len(chunk)
+                yield chunk
+            if sent < size:
+                yield b'\0' * (size - sent)  # File shrank while it was being sent
+            if size % TAR_BLOCK_SIZE:
+                yield b'\0' * (TAR_BLOCK_SIZE - size % TAR_BLOCK_SIZE)
+    yield b'\0' * (TAR_BLOCK_SIZE * 2)
+
+def _tar_header(path, name, member_type, size):
+    info = tarfile.TarInfo(name)
+    stat = os.stat(path)
+    info.type = member_type
+    info.size = size
+    info.mtime = int(stat.st_mtime)
+    info.mode = stat.st_mode & 0o777
+    return info.tobuf(format=tarfile.PAX_FORMAT)
+
+def file_download(path, range_header=None, accept_encoding=None, compress=True):
+    """Build status, headers and a streamed body for downloading one result file"""
+    size = os.path.getsize(path)
+    name = os.path.basename(path)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{name}"',
+        'Content-Type': 'application/octet-stream'
+    }
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        headers['Content-Range'] = f"bytes */{size}"
+        return 416, headers, iter([])
+
+    if byte_range:
+        # Ranges address the stored bytes, so they are always sent uncompressed
+        start, end = byte_range
+        headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        headers['Content-Length'] = str(end - start + 1)
+        return 206, headers, iter_file(path, start, end)
+
+    encoding = choose_encoding(accept_encoding) if compress else None
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = 'Accept-Encoding'
+        return 200, headers, compress_stream(iter_file(path), encoding)
+
+    headers['Content-Length'] = str(size)
+    return 200, headers, iter_file(path)
+
+def archive_download(scan_dir, compression='gzip'):
+    """Build status, headers and a streamed tar body for a whole results/<workflow>/<scan> tree"""
+    scan_dir = os.path.normpath(scan_dir)
+    workflow = os.path.basename(os.path.dirname(scan_dir))
+    arcname = f"{workflow}_{os.path.basename(scan_dir)}"
+    extension = {'gzip': '.tar.gz', 'zstd': '.tar.zst', None: '.tar'}[compression]
+    headers = {
+        'Content-Disposition': f'attachment; filename="{arcname}{extension}"',
+        'Content-Type': {'gzip': 'application/gzip', 'zstd': 'application/zstd', None: 'application/x-tar'}[compression],
+        'Last-Modified': time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(os.path.getmtime(scan_dir)))
+    }
+    return 200, headers, compress_stream(iter_tar(scan_dir, arcname), compression)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+import os
+import struct
+import zlib
+import hashlib
+import itertools
+import tempfile
+from array import array
+
+READ_CHUNK_SIZE = 1024 * 1024
+INDEX_STEP = 1024  # Lines between two recorded offsets
+INDEX_HEADER = struct.Struct('<8sQQQQQQII')
+INDEX_MAGIC = b'K4LIDX03'
+CHECK_BLOCK_SIZE = 4096  # Bytes at the start and before the indexed end that must not change
+MAX_PAGE_BYTES = 1024 * 1024
+MAX_PAGE_LINES = 10000
+
+class LineIndex:
+    """Sparse line-offset index of a text file, stored in a sidecar and extended as the file grows"""
+    def __init__(self, path, index_path, step=INDEX_STEP):
+        self.path = path
+        self.index_path = index_path
+        self.step = step
+        self._reset()
+
+    def _reset(self):
+        self.offsets = array('Q', [0])  # Byte offset of lines 0, step, 2*step, ...
+        self.size = 0
+        self.mtime_ns = 0
+        self.inode = 0
+        self.complete_lines = 0  # Newline-terminated lines
+        self.tail_offset = 0  # Where the line after the last newline starts
+        self.head_crc = 0
+        self.end_crc = 0
+
+    @property
+    def lines(self):
+        """Number of lines, counting a final line without a newline"""
+        return self.complete_lines + (1 if self.size > self.tail_offset else 0)
+
+    def load(self):
+        """Load the sidecar and bring it up to date with the file"""
+        stat = os.stat(self.path)
+        if (not self._read_sidecar() or stat.st_ino != self.inode or stat.st_size < self.size
+                or (stat.st_size == self.size and stat.st_mtime_ns != self.mtime_ns)
+                or (stat.st_size > self.size and self._checksums() != (self.head_crc, self.end_crc))):
+            # No usable sidecar, or the file was replaced, truncated or rewritten in place.
+            # A larger file with the same inode was only appended to if the indexed bytes
+            # it is checked against are unchanged, as outputs are reopened with 'wb'.
+            self._reset()
+        if stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns:
+            self._extend(stat)
+            self._write_sidecar()
+        return self
+
+    def _read_sidecar(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+        except (OSError, ValueError, struct.error):
+            return False
+        (magic, step, self.size, self.mtime_ns, self.inode, self.complete_lines, self.tail_offset,
+         self.head_crc, self.end_crc) = header
+        self.offsets = offsets
+        return magic == INDEX_MAGIC and step == self.step
+
+    def _write_sidecar(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, self.step, self.size, self.mtime_ns, self.inode, self.complete_lines, self.tail_offset,
+                self.head_crc, self.end_crc
+            ))
+            f.write(self.offsets.tobytes())
+        os.replace(tmp_path, self.index_path)
+
+    def _extend(self, stat):
+        """Index bytes written after the last complete line seen so far"""
+        position = self.tail_offset
+        with open(self.path, 'rb') as f:
+            f.seek(position)
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                parts = chunk.split(b'\n')
+                newlines = len(parts) - 1
+                if newlines:
+                    # Offset just past the i-th newline in the chunk is ends[i] + i + 1
+                    ends = list(itertools.accumulate(map(len, parts[:-1])))
+                    first = (self.step - self.complete_lines % self.step) % self.step or self.step
+                    for i in range(first - 1, newlines, self.step):
+                        self.offsets.append(position + ends[i] + i + 1)
+                    self.complete_lines += newlines
+                    self.tail_offset = position + ends[-1] + newlines
+                position += len(chunk)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.inode = stat.st_ino
+        self.head_crc, self.end_crc = self._checksums()
+
+    def _checksums(self):
+        """Get CRCs of the first block and of the block before the indexed end"""
+        with open(self.path, 'rb') as f:
+            head = f.read(min(CHECK_BLOCK_SIZE, self.tail_offset))
+            start = max(0, self.tail_offset - CHECK_BLOCK_SIZE)
+            f.seek(start)
+            end = f.read(self.tail_offset - start)
+        return zlib.crc32(head), zlib.crc32(end)
+
+    def _line_offset(self, line):
+        """Get the byte offset where a line starts"""
+        block = line // self.step
+        position = self.offsets[block]
+        with open(self.path, 'rb') as f:
+            f.seek(position)
+            for _ in range(line - block * self.step):
+                position += len(f.readline())
+        return position
+
+    def read_lines(self, start, count):
+        """Read `count` lines starting at line number `start` (0-based)"""
+        if start >= self.lines or count <= 0:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self._line_offset(start))
+            lines = []
+            for _ in range(min(count, self.lines - start)):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line.rstrip(b'\n').decode(errors='replace'))
+        return lines
+
+class ResultViewer:
+    """Paged access to task result files without loading them into memory"""
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir or os.path.join(tempfile.gettempdir(), 'k4enum-line-index')
+
+    def get_index(self, path):
+        """Get the up to date line index of a file, building it on first use"""
+        key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return LineIndex(path, os.path.join(self.index_dir, f"{key}.idx")).load()
+
+    def read_bytes(self, path, offset=0, length=MAX_PAGE_BYTES):
+        """Read a byte range of a file"""
+        length = max(0, min(length, MAX_PAGE_BYTES))
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            f.seek(min(max(0, offset), size))
+            data = f.read(length)
+        return {'offset': offset, 'length': len(data), 'size': size, 'data': data.decode(errors='replace')}
+
+    def read_lines(self, path, start=0, count=100):
+        """Read a page of lines using the line index"""
+        count = max(0, min(count, MAX_PAGE_LINES))
+        index = self.get_index(path)
+        lines = index.read_lines(max(0, start), count)
+        return {'start': start, 'count': len(lines), 'total': index.lines, 'lines': lines}
+
+    def head(self, path, count=100):
+        """Read the first lines of a file without an index"""
+        count = max(0, min(count, MAX_PAGE_LINES))
+        lines = []
+        with open(path, 'rb') as f:
+            for line in f:
+                if len(lines) >= count:
+                    break
+                lines.append(line.rstrip(b'\n').decode(errors='replace'))
+        return lines
+
+    def tail(self, path, count=100):
+        """Read the last lines of a file by scanning backwards from the end"""
+        count = max(0, min(count, MAX_PAGE_LINES))
+        if count == 0:
+            return []
+        with open(path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            data = b''
+            while position > 0 and data.count(b'\n') <= count:
+                step = min(READ_CHUNK_SIZE, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+        lines = data.split(b'\n')
+        if lines and lines[-1] == b'':
+            lines.pop()
+        return [line.decode(errors='replace') for line in lines[-count:]]
+
+    def count_lines(self, path):
+        """Get the number of lines in a file from its index"""
+        return self.get_index(path).lines
+
+    def summarize(self, paths, count_lines=True):
+        """Get name, size and line count of each file, never its contents"""
+        summary = []
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            summary.append({
+                'name': os.path.basename(path),
+                'path': path,
+                'size': size,
+                'lines': self.count_lines(path) if count_lines and size else 0
+            })
+        return summary
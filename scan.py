@@ -1,27 +1,60 @@
 #!/usr/bin/env python3
 import os
-import yaml
-import subprocess
-from datetime import datetime
-from rich.console import Console
-from rich.table import Table
-from loader import WorkflowLoader
-import luigi
-import warnings
+import sys
 import argparse
-import uuid
-from task_classes import ModuleTask, TaskExecution
-import json
-from node_manager import NodeManager
+from workflow_registry import WorkflowRegistry
 
-# Suppress Luigi warnings
-warnings.filterwarnings('ignore', category=UserWarning, module='luigi.task')
-luigi.interface.core.log_level = 'ERROR'
+# Luigi, paramiko and rich are only imported by the commands that use them, so
+# listing commands called from scripts return without paying for their import
 
-console = Console()
+class LazyConsole:
+    """Rich console created on first use"""
+    _console = None
+    
+    def __getattr__(self, name):
+        if LazyConsole._console is None:
+            from rich.console import Console
+            LazyConsole._console = Console()
+        return getattr(LazyConsole._console, name)
+
+console = LazyConsole()
+
+def is_interactive():
+    """Check whether output goes to a terminal rather than to a script"""
+    return sys.stdout.isatty()
 
-def setup_luigi_config(use_central_scheduler=False, distributed=False):
+def print_rows(rows):
+    """Print table rows as tab-separated lines for scripts"""
+    for row in rows:
+        print('\t'.join(row))
+
+def load_resource_limits(config_path="config/scheduler.yaml", total_cores=None):
+    """Load global caps for task resources, resolving `auto` from the host"""
+    import yaml
+    limits = {}
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            limits = dict((yaml.safe_load(f) or {}).get('scheduler', {}).get('resources', {}))
+    
+    if limits.get('cpu') == 'auto':
+        limits['cpu'] = total_cores or os.cpu_count()
+    if limits.get('memory') == 'auto':
+        limits['memory'] = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024 ** 3
+    return {name: int(amount) for name, amount in limits.items()}
+
+def check_resources(tasks, limits):
+    """Fail early on tasks that ask for more of a resource than will ever be free"""
+    for task in tasks:
+        for name, amount in task.resources.items():
+            # Luigi gives resources without a cap a capacity of 1
+            limit = limits.get(name, 1)
+            if amount > limit:
+                configured = f"only {limit} are configured" if name in limits else "it has no cap in config/scheduler.yaml"
+                raise ValueError(f"Task {task.get_task_id()} needs {amount} {name} but {configured}")
+
+def setup_luigi_config(use_central_scheduler=False, distributed=False, resources=None):
     """Setup Luigi configuration based on command-line arguments"""
+    import luigi
     # Load template configuration
     template_path = "luigi.cfg.template"
     if os.path.exists(template_path):
@@ -53,19 +86,77 @@ task_failed=30
 scheduling_error=35
 unhandled_exception=40"""
     
-    # Create temporary config file
-    config_path = "luigi.cfg"
-    with open(config_path, 'w') as f:
-        if use_central_scheduler:
-            # Add central scheduler configuration
-            f.write("[core]\n")
-            f.write("default-scheduler-host=localhost\n")
-            f.write("default-scheduler-port=8082\n")
-            f.write("parallel-scheduling=true\n\n")
-        f.write(config_text)
+    # Apply it to the in-memory config instead of writing and re-reading a luigi.cfg
+    config = luigi.configuration.get_config()
+    config.read_string(config_text)
+    if use_central_scheduler:
+        # Add central scheduler configuration
+        config.set('core', 'default-scheduler-host', 'localhost')
+        config.set('core', 'default-scheduler-port', '8082')
+        config.set('core', 'parallel-scheduling', 'true')
+    if resources:
+        if not config.has_section('resources'):
+            config.add_section('resources')
+        for name, amount in resources.items():
+            config.set('resources', name, str(amount))
+
+def format_bytes(size):
+    """Format a byte count for display"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def show_resource_usage(tasks):
+    """Show what each task and node used, to spot the bottleneck stages of a workflow"""
+    from rich.table import Table
+    from task_classes import TaskExecution
+    from status_store import summarize_usage
+    store = TaskExecution.get_status_store()
+    records = [store.get(task.get_task_id()) for task in tasks]
+    records = [record for record in records if record and record.get('usage')]
+    if not records:
+        return
+    
+    table = Table(title="Task Resource Usage")
+    table.add_column("Task", style="cyan")
+    table.add_column("Node", style="green")
+    table.add_column("Status", style="magenta")
+    for column in ["Wall", "User CPU", "Sys CPU", "Max RSS", "Read", "Written", "Stdout Lines", "Stdout"]:
+        table.add_column(column, style="yellow", justify="right")
     
-    # Load configuration into Luigi
-    luigi.configuration.LuigiConfigParser.reload()
+    for record in sorted(records, key=lambda record: -record['usage']['wall_time']):
+        usage = record['usage']
+        table.add_row(
+            record['task_id'],
+            usage['host'],
+            record['status'],
+            f"{usage['wall_time']:.1f}s",
+            f"{usage['user_time']:.1f}s",
+            f"{usage['system_time']:.1f}s",
+            format_bytes(usage['max_rss']),
+            format_bytes(usage['read_bytes']),
+            format_bytes(usage['write_bytes']),
+            str(usage['stdout_lines']),
+            format_bytes(usage['stdout_bytes'])
+        )
+    console.print(table)
+    
+    table = Table(title="Node Resource Usage")
+    table.add_column("Node", style="cyan")
+    for column in ["Tasks", "Wall", "CPU", "Peak RSS", "Read", "Written"]:
+        table.add_column(column, style="yellow", justify="right")
+    for node in summarize_usage(records):
+        table.add_row(
+            node['host'],
+            str(node['tasks']),
+            f"{node['wall_time']:.1f}s",
+            f"{node['user_time'] + node['system_time']:.1f}s",
+            format_bytes(node['max_rss']),
+            format_bytes(node['read_bytes']),
+            format_bytes(node['write_bytes'])
+        )
+    console.print(table)
 
 def show_banner():
     banner = """[cyan]
@@ -81,64 +172,134 @@ def show_banner():
 
 def list_workflows():
     """List available workflows"""
+    workflows, errors = WorkflowRegistry("workflows").get_all()
+    rows = []
+    for workflow, compiled in workflows.items():
+        modules = [module['name'] for module in compiled['modules'] if module['tasks']]
+        if modules:
+            rows.append([workflow, ", ".join(modules), str(len(compiled['tasks']))])
+    
+    if not is_interactive():
+        print_rows(rows)
+        for workflow, error in errors.items():
+            print(f"Skipping workflow {workflow}: {error}", file=sys.stderr)
+        return
+    
+    from rich.table import Table
     table = Table(title="Available Workflows")
     table.add_column("Workflow", style="cyan")
     table.add_column("Modules", style="green")
     table.add_column("Tasks", style="yellow")
-    
-    for workflow in os.listdir("workflows"):
-        if os.path.isdir(os.path.join("workflows", workflow)):
-            config_file = os.path.join("workflows", workflow, "workflow_config.yaml")
-            if os.path.exists(config_file):
-                with open(config_file) as f:
-                    config = yaml.safe_load(f)
-                    if config and 'workflow' in config and 'modules' in config['workflow']:
-                        modules = []
-                        total_tasks = 0
-                        for module in config['workflow']['modules']:
-                            module_name = module['name']
-                            tasks = [list(task.keys())[0] for task in module.get('tasks', [])]
-                            if tasks:
-                                modules.append(module_name)
-                                total_tasks += len(tasks)
-                        
-                        if modules:
-                            table.add_row(
-                                workflow,
-                                ", ".join(modules),
-                                str(total_tasks)
-                            )
+    for row in rows:
+        table.add_row(*row)
+    for workflow, error in errors.items():
+        console.print(f"[yellow]Warning: Skipping workflow {workflow}: {error}[/yellow]")
     
     console.print(table)
 
-def list_nodes():
+def list_nodes(refresh=False):
     """List registered remote nodes"""
+    import time
+    from node_manager import NodeManager
     node_manager = NodeManager()
     nodes = node_manager.list_nodes()
+    # Cached checks younger than the TTL are used as is, the rest are probed concurrently
+    liveness = node_manager.check_nodes(refresh=refresh)
+    rows = [
+        [
+            node['name'],
+            f"{node['host']}:{node['port']}",
+            str(node['cores']),
+            "connected" if liveness[node['name']]['online'] else "disconnected",
+            f"{time.time() - liveness[node['name']]['checked_at']:.0f}s"
+        ]
+        for node in nodes
+    ]
     
+    if not is_interactive():
+        print_rows(rows)
+        return
     if not nodes:
         console.print("[yellow]No remote nodes registered[/yellow]")
         return
     
+    from rich.table import Table
     table = Table(title="Registered Remote Nodes")
     table.add_column("Name", style="cyan")
     table.add_column("Host", style="green")
     table.add_column("Cores", style="yellow")
     table.add_column("Status", style="magenta")
+    table.add_column("Checked", style="dim")
+    for name, host, cores, status, age in rows:
+        status = "[green]Connected[/green]" if status == "connected" else "[red]Disconnected[/red]"
+        table.add_row(name, host, cores, status, f"{age} ago")
     
-    for node in nodes:
-        status = "[green]Connected[/green]" if node_manager.test_connection(node['name']) else "[red]Disconnected[/red]"
-        table.add_row(
-            node['name'],
-            f"{node['host']}:{node['port']}",
-            str(node['cores']),
-            status
-        )
+    console.print(table)
+
+def format_time(timestamp):
+    import time
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+def open_assets():
+    """Open the asset store, first ingesting what finished tasks queued for it if this host owns it"""
+    from storage_manager import StorageManager
+    from asset_store import get_asset_store, get_spool_dir, drain_spool, is_ingest_host
+    storage_manager = StorageManager()
+    store = get_asset_store(storage_manager)
+    if is_ingest_host(storage_manager):
+        drain_spool(store, get_spool_dir(storage_manager))
+    return store
+
+def show_asset(name):
+    """Show what every scan found about one hostname or IP"""
+    asset = open_assets().lookup(name)
+    if asset is None:
+        if is_interactive():
+            console.print(f"[yellow]{name} was never seen[/yellow]")
+        sys.exit(1)
+    rows = [[asset['name'], asset['kind'], format_time(asset['first_seen']), format_time(asset['last_seen'])]]
+    rows += [['port', str(port['port']), format_time(port['first_seen']), format_time(port['last_seen'])] for port in asset['ports']]
+    rows += [['resolves' if asset['kind'] == 'host' else 'name', item['name'], format_time(item['first_seen']), format_time(item['last_seen'])] for item in asset['resolutions']]
+    rows += [['url', item['url'], format_time(item['first_seen']), format_time(item['last_seen'])] for item in asset['urls']]
+    rows += [['tls', f"{item['name']} ({item['port']})", format_time(item['first_seen']), format_time(item['last_seen'])] for item in asset['tls_names']]
+    rows += [['scan', f"{scan['workflow']}/{scan['scan_id']}", ','.join(map(str, scan['ports'])), format_time(scan['seen_at'])] for scan in asset['scans']]
     
+    if not is_interactive():
+        print_rows(rows)
+        return
+    from rich.table import Table
+    table = Table(title=f"Asset {asset['name']}")
+    table.add_column("Type", style="cyan")
+    table.add_column("Value", style="green")
+    table.add_column("First seen / ports", style="yellow")
+    table.add_column("Last seen", style="magenta")
+    for row in rows:
+        table.add_row(*row)
+    console.print(table)
+
+def search_assets(domain, since_hours=None, limit=100):
+    """List known hosts within a domain, or first seen in the last hours"""
+    import time
+    since = time.time() - since_hours * 3600 if since_hours else None
+    hosts = open_assets().search(domain=domain, since=since, count=limit)
+    rows = [[host['name'], host['kind'], format_time(host['first_seen']), format_time(host['last_seen'])] for host in hosts]
+    
+    if not is_interactive():
+        print_rows(rows)
+        return
+    from rich.table import Table
+    table = Table(title=f"Assets in {domain}" if domain else "New assets")
+    table.add_column("Name", style="cyan")
+    table.add_column("Kind", style="green")
+    table.add_column("First seen", style="yellow")
+    table.add_column("Last seen", style="magenta")
+    for row in rows:
+        table.add_row(*row)
     console.print(table)
 
 def register_node(args):
     """Register a new remote node"""
+    from node_manager import NodeManager
     node_manager = NodeManager()
     success = node_manager.register_node(
         name=args.name,
@@ -155,6 +316,7 @@ def register_node(args):
 
 def remove_node(args):
     """Remove a registered node"""
+    from node_manager import NodeManager
     node_manager = NodeManager()
     node_manager.remove_node(args.name)
 
@@ -166,6 +328,9 @@ def main():
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     parser.add_argument('-c', action='store_true', help='Use central Luigi scheduler')
     parser.add_argument('-d', '--distributed', action='store_true', help='Enable distributed execution')
+    parser.add_argument('--no-cache', action='store_true', help='Run every task even if an identical result is cached')
+    parser.add_argument('--no-priority', action='store_true', help="Leave ready tasks in the scheduler's FIFO order instead of prioritizing critical paths")
+    parser.add_argument('--incremental', action='store_true', help='Feed incremental tasks only input that is new since the previous scan')
     
     # Node management arguments
     node_group = parser.add_argument_group('Node management')
@@ -176,110 +341,155 @@ def main():
     node_group.add_argument('--key-file', help='SSH private key file for register command')
     node_group.add_argument('--port', type=int, default=22, help='SSH port for register command (default: 22)')
     node_group.add_argument('--cores', type=int, help='Number of cores to use (default: auto-detect)')
+    node_group.add_argument('--refresh', action='store_true', help='Re-check node liveness instead of using recent cached checks')
+    
+    # Asset store queries
+    asset_group = parser.add_argument_group('Asset queries')
+    asset_group.add_argument('--asset', help='Show the ports, addresses, URLs, TLS names and scans of a hostname or IP')
+    asset_group.add_argument('--assets', metavar='DOMAIN', nargs='?', const='', help='List known hosts within a domain')
+    asset_group.add_argument('--since', type=float, metavar='HOURS', help='With --assets, only hosts first seen in the last HOURS')
+    asset_group.add_argument('--limit', type=int, default=100, help='With --assets, the number of hosts to list (default: 100)')
     
     args = parser.parse_args()
     
+    # Informational commands skip the banner and the execution machinery
+    if args.list:
+        list_workflows()
+        return
+    if args.nodes == 'list':
+        list_nodes(args.refresh)
+        return
+    if args.asset:
+        show_asset(args.asset)
+        return
+    if args.assets is not None:
+        search_assets(args.assets, args.since, args.limit)
+        return
+    
+    show_banner()
+    if args.nodes:
+        if args.nodes == 'register':
+            if not all([args.name, args.host, args.username, args.key_file]):
+                console.print("[red]Error: register command requires --name, --host, --username, and --key-file[/red]")
+                return
+            register_node(args)
+        elif args.nodes == 'remove':
+            if not args.name:
+                console.print("[red]Error: remove command requires --name[/red]")
+                return
+            remove_node(args)
+        return
+    
+    if not args.workflow:
+        console.print("[red]Error: Please specify at least one workflow (-w)[/red]")
+        return
+    run_workflows(args)
+
+def run_workflows(args):
+    """Load the requested workflows and run them with Luigi"""
+    import luigi
+    import warnings
+    from loader import WorkflowLoader
+    from task_classes import TaskExecution
+    from node_manager import NodeManager
+    from asset_store import SpoolIngester, get_asset_store, get_spool_dir, is_ingest_host
+    
+    # Suppress Luigi warnings
+    warnings.filterwarnings('ignore', category=UserWarning, module='luigi.task')
+    luigi.interface.core.log_level = 'ERROR'
+    
+    frameworks = []  # Store framework instances
     try:
-        show_banner()
+        # Cap concurrent task resources at what the scan has available
+        total_cores = None
+        if args.distributed:
+            total_cores = NodeManager().get_total_cores() or None
+        resource_limits = load_resource_limits(total_cores=total_cores)
         
-        if args.list:
-            list_workflows()
-            return
+        # Setup Luigi configuration
+        setup_luigi_config(args.c, args.distributed, resource_limits)
+        TaskExecution.set_cache_enabled(not args.no_cache)
+        TaskExecution.set_incremental_enabled(args.incremental)
+        WorkflowLoader.set_priority_enabled(not args.no_priority)
         
-        if args.nodes:
-            if args.nodes == 'list':
-                list_nodes()
-            elif args.nodes == 'register':
-                if not all([args.name, args.host, args.username, args.key_file]):
-                    console.print("[red]Error: register command requires --name, --host, --username, and --key-file[/red]")
-                    return
-                register_node(args)
-            elif args.nodes == 'remove':
-                if not args.name:
-                    console.print("[red]Error: remove command requires --name[/red]")
-                    return
-                remove_node(args)
-            return
+        # Parse arguments
+        workflow_args = {}
+        if args.args:
+            workflow_args.update(dict(arg.split('=', 1) for arg in args.args))
         
-        if not args.workflow:
-            console.print("[red]Error: Please specify at least one workflow (-w)[/red]")
-            return
+        # Create tasks for all workflows
+        all_tasks = []
+        for workflow_name in args.workflow:
+            # Create and load framework
+            framework = Framework(workflow_name)
+            frameworks.append(framework)  # Store framework instance
+            framework.load()
+            
+            # Get module tasks
+            module_tasks = framework.run_tasks(workflow_args)
+            all_tasks.extend(module_tasks)
         
-        # Setup Luigi configuration
-        setup_luigi_config(args.c, args.distributed)
+        check_resources(TaskExecution._task_registry.values(), resource_limits)
         
-        try:
-            # Parse arguments
-            workflow_args = {}
-            if args.args:
-                workflow_args.update(dict(arg.split('=', 1) for arg in args.args))
-            
-            # Create tasks for all workflows
-            all_tasks = []
-            frameworks = []  # Store framework instances
-            for workflow_name in args.workflow:
-                # Create and load framework
-                framework = Framework(workflow_name)
-                frameworks.append(framework)  # Store framework instance
-                framework.load()
+        # Set up distributed execution if enabled
+        if args.distributed:
+            node_manager = NodeManager()
+            nodes = node_manager.list_nodes()
+            if not nodes:
+                console.print("[yellow]No remote nodes available. Running locally.[/yellow]")
+            else:
+                # Configure Luigi for distributed execution
+                total_cores = node_manager.get_total_cores()
+                luigi.configuration.get_config().set('core', 'parallel-scheduling', 'true')
+                luigi.configuration.get_config().set('core', 'max-workers', str(total_cores))
                 
-                # Get module tasks
-                module_tasks = framework.run_tasks(workflow_args)
-                all_tasks.extend(module_tasks)
-            
-            # Set up distributed execution if enabled
-            if args.distributed:
-                node_manager = NodeManager()
-                nodes = node_manager.list_nodes()
-                if not nodes:
-                    console.print("[yellow]No remote nodes available. Running locally.[/yellow]")
-                else:
-                    # Configure Luigi for distributed execution
-                    total_cores = node_manager.get_total_cores()
-                    luigi.configuration.get_config().set('core', 'parallel-scheduling', 'true')
-                    luigi.configuration.get_config().set('core', 'max-workers', str(total_cores))
-                    
-                    # Set up remote workers
-                    for node in nodes:
-                        if node_manager.test_connection(node['name']):
-                            console.print(f"[green]Using node {node['name']} with {node['cores']} cores[/green]")
-                        else:
-                            console.print(f"[yellow]Node {node['name']} is not available[/yellow]")
-            
-            # Run all modules together
-            success = luigi.build(
-                all_tasks,
-                local_scheduler=not args.c,
-                detailed_summary=True,
-                workers=len(all_tasks)  # One worker per task for maximum parallelism
-            )
-            
-            if not success:
-                console.print("[red]Some modules failed[/red]")
-                for framework in frameworks:
-                    framework._update_task_status("failed")
-                exit(1)
-            
-            console.print("[green]All workflows completed successfully![/green]")
-            
-            # Show results paths
-            console.print("\n[cyan]Results locations:[/cyan]")
+                # Set up remote workers from the cached liveness view the monitor keeps fresh
+                liveness = node_manager.check_nodes(refresh=args.refresh)
+                for node in nodes:
+                    if liveness[node['name']]['online']:
+                        console.print(f"[green]Using node {node['name']} with {node['cores']} cores[/green]")
+                    else:
+                        console.print(f"[yellow]Node {node['name']} is not available[/yellow]")
+        
+        # Tasks queue their assets when they finish and the ingest host alone writes them to
+        # its local store, so the database never sits on shared storage
+        storage_manager = TaskExecution.get_storage_manager()
+        ingester = None
+        if is_ingest_host(storage_manager):
+            ingester = SpoolIngester(get_asset_store(storage_manager), get_spool_dir(storage_manager))
+            ingester.start()
+        
+        # Run all modules together
+        success = luigi.build(
+            all_tasks,
+            local_scheduler=not args.c,
+            detailed_summary=True,
+            # One worker per task; declared resources keep them from oversubscribing the node
+            workers=len(TaskExecution._task_registry)
+        )
+        if ingester:
+            ingester.stop()
+        
+        show_resource_usage(TaskExecution._task_registry.values())
+        
+        if not success:
+            console.print("[red]Some modules failed[/red]")
             for framework in frameworks:
-                console.print(f"[green]- {framework.name}:[/green] {framework.save_dir}")
-                
-        finally:
-            # Cleanup temporary Luigi config
-            if os.path.exists("luigi.cfg"):
-                os.remove("luigi.cfg")
+                framework._update_task_status("failed")
+            exit(1)
+        
+        console.print("[green]All workflows completed successfully![/green]")
+        
+        # Show results paths
+        console.print("\n[cyan]Results locations:[/cyan]")
+        for framework in frameworks:
+            console.print(f"[green]- {framework.name}:[/green] {framework.save_dir}")
                 
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
         for framework in frameworks:
             framework._update_task_status("failed")
-        # Cleanup temporary Luigi config
-        if os.path.exists("luigi.cfg"):
-            os.remove("luigi.cfg")
         exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""Measure the overhead k4ENUM adds on top of the tools it runs, using synthetic workflows"""
+import os
+import sys
+import json
+import time
+import yaml
+import socket
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import warnings
+from datetime import datetime
+from rich.console import Console
+from rich.table import Table
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import luigi
+from storage_manager import StorageManager
+from status_store import BACKENDS
+from task_classes import TaskExecution, ModuleTask
+from loader import WorkflowLoader
+
+warnings.filterwarnings('ignore', category=UserWarning, module='luigi.task')
+luigi.interface.core.log_level = 'ERROR'
+
+# Results go to stdout as JSON, so the human-readable summary goes to stderr
+console = Console(stderr=True)
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_STORAGE = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+def generate_workflow(tasks, depth=1, fan_in=1, command="true"):
+    """Build a workflow config in the workflows/testing style with one module per DAG layer"""
+    depth = max(1, min(depth, tasks))
+    width = -(-tasks // depth)  # Tasks per layer, rounded up
+    modules = []
+    created = 0
+    for layer in range(depth):
+        count = min(width, tasks - created)
+        if count <= 0:
+            break
+        module_tasks = []
+        for index in range(count):
+            task_config = {'command': command}
+            if layer:
+                previous = modules[-1]['tasks']
+                # Spread parents over the previous layer so every task there has children
+                parents = {(index + offset) % len(previous) for offset in range(min(fan_in, len(previous)))}
+                task_config['requires'] = [
+                    f"layer{layer - 1}:{list(previous[parent].keys())[0]}" for parent in sorted(parents)
+                ]
+            module_tasks.append({f"task{index}": task_config})
+        modules.append({'name': f"layer{layer}", 'tasks': module_tasks})
+        created += count
+    return {
+        'workflow': {
+            'name': f"bench_{tasks}x{depth}",
+            'description': f"Synthetic benchmark workflow with {tasks} tasks in {depth} layers",
+            'modules': modules
+        }
+    }
+
+def setup_storage(base_dir, backend):
+    """Point the framework's shared storage at a fresh directory, e.g. on tmpfs as a stand-in for NFS"""
+    if os.path.exists(base_dir):
+        shutil.rmtree(base_dir)
+    directories = ['results', 'temp', 'logs', 'tasks', 'cache', 'state']
+    for directory in directories:
+        os.makedirs(os.path.join(base_dir, directory))
+    config_path = os.path.join(base_dir, 'storage.yaml')
+    with open(config_path, 'w') as f:
+        yaml.safe_dump({'storage': {
+            'type': 'local',
+            'server': {'path': base_dir},
+            'client': {'mount_point': base_dir},
+            'directories': directories,
+            'status': {'backend': backend, 'export_files': False}
+        }}, f)
+    return StorageManager(config_path)
+
+def reset_framework(storage_manager):
+    """Make task classes use the benchmark storage and forget tasks of earlier runs"""
+    store = BACKENDS[storage_manager.config['status']['backend']](storage_manager, export_files=False)
+    TaskExecution._task_registry = {}
+    for cls in (TaskExecution, ModuleTask):
+        cls._storage_manager = storage_manager
+        cls._status_store = store
+    # Measure orchestration only, not cache lookups
+    TaskExecution.set_cache_enabled(False)
+    return store
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def bench_load(config, storage_manager, repeat):
+    """Time WorkflowLoader building the task graph"""
+    timings = []
+    for _ in range(repeat):
+        reset_framework(storage_manager)
+        started = time.perf_counter()
+        loader = WorkflowLoader(config, 'bench')
+        timings.append(time.perf_counter() - started)
+    tasks = len(loader.get_tasks())
+    return {
+        'load_seconds': min(timings),
+        'load_seconds_per_task': min(timings) / tasks
+    }
+
+def bench_status_io(tasks, base_dir, backend):
+    """Time pending -> running -> done transitions and reads through a status backend"""
+    storage_manager = setup_storage(base_dir, backend)
+    store = reset_framework(storage_manager)
+    task_ids = [f"bench:task{index}" for index in range(tasks)]
+
+    started = time.perf_counter()
+    for status in ['pending', 'running', 'done']:
+        for task_id in task_ids:
+            store.set_status(task_id, status, f"Task is {status}")
+    write_seconds = time.perf_counter() - started
+
+    # A fresh store has to replay whatever the writer left behind
+    store = BACKENDS[backend](storage_manager, export_files=False)
+    started = time.perf_counter()
+    for task_id in task_ids:
+        store.get_status(task_id)
+    read_seconds = time.perf_counter() - started
+
+    return {
+        'status_backend': backend,
+        'status_write_seconds_per_transition': write_seconds / (tasks * 3),
+        'status_read_seconds_per_task': read_seconds / tasks
+    }
+
+def read_run_times(store):
+    """Get when each task started running and finished, from the status store"""
+    running, done = {}, {}
+    for record in store.list():
+        if record['status'] in ['done', 'failed'] and record.get('usage'):
+            # Compaction keeps only the latest record, so the start comes from the run's wall time
+            done[record['task_id']] = record['updated_at']
+            running[record['task_id']] = record['updated_at'] - record['usage']['wall_time']
+    return running, done
+
+def bench_run(config, storage_manager, workers, task_seconds):
+    """Run the workflow with the local scheduler and measure scheduling latency and overhead"""
+    reset_framework(storage_manager)
+    loader = WorkflowLoader(config, 'bench')
+    depth = len(config['workflow']['modules'])
+
+    started = time.time()
+    success = luigi.build(loader.get_modules(), local_scheduler=True, workers=workers)
+    elapsed = time.time() - started
+
+    # Latency is the time from a task becoming runnable to it starting
+    running, done = read_run_times(BACKENDS[storage_manager.config['status']['backend']](storage_manager))
+    latencies = []
+    for task in loader.get_tasks():
+        task_id = task.get_task_id()
+        if task_id not in running:
+            continue
+        ready = max([done.get(dep.get_task_id(), started) for dep in task.dependencies] or [started])
+        latencies.append(max(0.0, running[task_id] - ready))
+
+    tasks = len(loader.get_tasks())
+    return {
+        'success': success,
+        'workers': workers,
+        'run_seconds': elapsed,
+        'scheduling_latency_p50': percentile(latencies, 0.5),
+        'scheduling_latency_p95': percentile(latencies, 0.95),
+        'scheduling_latency_max': max(latencies) if latencies else None,
+        # Time beyond what the tools themselves need along the critical path
+        'overhead_seconds_per_task': max(0.0, elapsed - depth * task_seconds) / tasks
+    }
+
+def generate_priority_workflows(width, depth, task_seconds):
+    """Build a wide workflow of short independent tasks and a workflow with one long chain"""
+    command = f"sleep {task_seconds}"
+    fanout = {'workflow': {'name': 'fanout', 'modules': [{
+        'name': 'fanout', 'tasks': [{f"task{index}": {'command': command}} for index in range(width)]
+    }]}}
+    chain = {'workflow': {'name': 'chain', 'modules': [{
+        'name': 'chain', 'tasks': [
+            {f"task{index}": dict({'command': command}, **({'requires': [f"task{index - 1}"]} if index else {}))}
+            for index in range(depth)
+        ]
+    }]}}
+    return [fanout, chain]
+
+def bench_priority(storage_manager, width, depth, workers, task_seconds):
+    """Compare the makespan of a multi-workflow run in FIFO order and by critical path"""
+    configs = generate_priority_workflows(width, depth, task_seconds)
+    result = {'priority_width': width, 'priority_depth': depth, 'workers': workers, 'task_seconds': task_seconds}
+    # The FIFO run goes first and leaves the durations the prioritized run learns from
+    for mode, enabled in [('fifo', False), ('priority', True)]:
+        tasks_dir = storage_manager.get_path('tasks', '')
+        for name in os.listdir(tasks_dir):
+            if name.endswith('.done'):
+                os.remove(os.path.join(tasks_dir, name))
+        reset_framework(storage_manager)
+        WorkflowLoader.set_priority_enabled(enabled)
+        modules = []
+        for config in configs:
+            modules.extend(WorkflowLoader(config, 'bench').get_modules())
+        started = time.time()
+        luigi.build(modules, local_scheduler=True, workers=workers)
+        result[f"{mode}_makespan"] = time.time() - started
+    WorkflowLoader.set_priority_enabled(True)
+    result['priority_speedup'] = result['fifo_makespan'] / result['priority_makespan']
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def show_results(results):
+    table = Table(title="Orchestration Benchmark")
+    columns = [
+        ('tasks', "Tasks", '{}'), ('depth', "Depth", '{}'),
+        ('load_seconds_per_task', "Load/task", '{:.2e}s'),
+        ('status_write_seconds_per_transition', "Status write", '{:.2e}s'),
+        ('status_read_seconds_per_task', "Status read", '{:.2e}s'),
+        ('scheduling_latency_p50', "Latency p50", '{:.3f}s'),
+        ('scheduling_latency_p95', "Latency p95", '{:.3f}s'),
+        ('overhead_seconds_per_task', "Overhead/task", '{:.3f}s')
+    ]
+    for _, title, _ in columns:
+        table.add_column(title, style="yellow", justify="right")
+    for result in results:
+        table.add_row(*[
+            fmt.format(result[key]) if result.get(key) is not None else "-" for key, _, fmt in columns
+        ])
+    console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark k4ENUM orchestration overhead on synthetic workflows')
+    parser.add_argument('--tasks', type=int, nargs='+', default=DEFAULT_SIZES, help='Task counts to benchmark')
+    parser.add_argument('--depth', type=int, nargs='+', default=[1, 10], help='DAG depths (layers) to benchmark')
+    parser.add_argument('--fan-in', type=int, default=1, help='Parents each task requires from the layer before')
+    parser.add_argument('--sleep', type=float, default=0, help='Seconds each task sleeps (default: no-op)')
+    parser.add_argument('--backend', default='journal', choices=sorted(BACKENDS), help='Status backend for the status I/O benchmark')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Luigi workers for end-to-end runs')
+    parser.add_argument('--run-limit', type=int, default=1000, help='Largest task count to run end to end')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions of the load benchmark (best is reported)')
+    parser.add_argument('--storage-dir', default=DEFAULT_STORAGE, help='Where to put the stand-in shared storage')
+    parser.add_argument('--compare-priority', action='store_true', help='Also compare critical-path priority with FIFO ordering')
+    parser.add_argument('--priority-width', type=int, default=24, help='Short tasks in the priority comparison')
+    parser.add_argument('--priority-depth', type=int, default=6, help='Chain length in the priority comparison')
+    parser.add_argument('-o', '--output', help='Write JSON results to a file instead of stdout')
+    args = parser.parse_args()
+
+    base_dir = os.path.join(args.storage_dir, f"k4enum-bench-{os.getpid()}")
+    command = f"sleep {args.sleep}" if args.sleep else "true"
+    results = []
+    priority = None
+    try:
+        for tasks in args.tasks:
+            for depth in args.depth:
+                config = generate_workflow(tasks, depth, args.fan_in, command)
+                result = {'tasks': tasks, 'depth': depth, 'fan_in': args.fan_in, 'task_seconds': args.sleep}
+                console.print(f"[cyan]Benchmarking {tasks} tasks in {depth} layers[/cyan]")
+
+                result.update(bench_load(config, setup_storage(base_dir, 'journal'), args.repeat))
+                result.update(bench_status_io(tasks, base_dir, args.backend))
+                if tasks <= args.run_limit:
+                    result.update(bench_run(config, setup_storage(base_dir, 'journal'), args.workers, args.sleep))
+                results.append(result)
+        if args.compare_priority:
+            console.print("[cyan]Comparing critical-path priority with FIFO ordering[/cyan]")
+            priority = bench_priority(
+                setup_storage(base_dir, 'journal'), args.priority_width, args.priority_depth,
+                args.workers, args.sleep or 0.5
+            )
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'revision': git_revision(),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'luigi': getattr(luigi, '__version__', None),
+        'storage_dir': args.storage_dir,
+        'results': results,
+        'priority': priority
+    }
+    show_results(results)
+    if priority:
+        console.print(
+            f"FIFO makespan {priority['fifo_makespan']:.2f}s, critical path {priority['priority_makespan']:.2f}s "
+            f"({priority['priority_speedup']:.2f}x)"
+        )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+import os
+import time
+import threading
+
+KEEPALIVE_INTERVAL = 30
+IDLE_TIMEOUT = 300
+CONNECT_TIMEOUT = 5
+
+class SSHSession:
+    """A cached SSH connection to one node whose transport multiplexes every command"""
+    def __init__(self, node, timeout=CONNECT_TIMEOUT):
+        import paramiko  # Deferred so importing the pool stays cheap for commands that never connect
+        self.node = node
+        self.client = paramiko.SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(
+            node['host'],
+            node['port'],
+            node['username'],
+            key_filename=node['key_file'],
+            timeout=timeout
+        )
+        self.client.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+        self.last_used = time.time()
+
+    def is_active(self):
+        """Check the transport is still usable"""
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def close(self):
+        self.client.close()
+
+class SSHPool:
+    """Process-wide SSH sessions keyed by node, with keepalive, idle eviction and reconnects"""
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._node_locks = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _key(self, node):
+        return (node['name'], node['host'], node['port'], node['username'], node['key_file'])
+
+    def _check_fork(self):
+        # Sessions inherited across fork share a socket with the parent and can't be used
+        if self._pid != os.getpid():
+            self._sessions = {}
+            self._node_locks = {}
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+    def get_client(self, node, timeout=CONNECT_TIMEOUT):
+        """Get a connected SSHClient for a node, reusing its session when possible"""
+        self._check_fork()
+        self.evict_idle()
+        key = self._key(node)
+        with self._lock:
+            node_lock = self._node_locks.setdefault(key, threading.Lock())
+        # Only callers for the same node wait on each other's handshake
+        with node_lock:
+            with self._lock:
+                session = self._sessions.get(key)
+            if session is not None and not session.is_active():
+                session.close()
+                session = None
+            if session is None:
+                session = SSHSession(node, timeout)
+                with self._lock:
+                    self._sessions[key] = session
+            session.last_used = time.time()
+            return session.client
+
+    def exec_command(self, node, command, timeout=None):
+        """Run a command on a node and get (exit status, stdout, stderr), reconnecting once on failure"""
+        import paramiko
+        for attempt in range(2):
+            client = self.get_client(node)
+            try:
+                stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+                out = stdout.read().decode()
+                err = stderr.read().decode()
+                return stdout.channel.recv_exit_status(), out, err
+            except (paramiko.SSHException, EOFError, OSError):
+                self.close(node)
+                if attempt:
+                    raise
+
+    def open_sftp(self, node):
+        """Open an SFTP channel over the node's pooled session"""
+        return self.get_client(node).open_sftp()
+
+    def test(self, node, timeout=CONNECT_TIMEOUT):
+        """Check a node is reachable over SSH"""
+        try:
+            self.get_client(node, timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self, node):
+        """Close and forget a node's session"""
+        with self._lock:
+            session = self._sessions.pop(self._key(node), None)
+        if session is not None:
+            session.close()
+
+    def evict_idle(self):
+        """Close sessions that haven't been used within the idle timeout"""
+        now = time.time()
+        with self._lock:
+            idle = [key for key, session in self._sessions.items() if now - session.last_used > self.idle_timeout]
+            sessions = [self._sessions.pop(key) for key in idle]
+        for session in sessions:
+            session.close()
+
+    def close_all(self):
+        """Close every pooled session"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+_pool = None
+
+def get_pool():
+    """Get the process-wide SSH pool"""
+    global _pool
+    if _pool is None:
+        _pool = SSHPool()
+    return _pool
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import socket
+import sqlite3
+from abc import ABC, abstractmethod
+from storage_manager import StorageManager
+
+STATUSES = ['pending', 'running', 'done', 'failed']
+JOURNAL_SNAPSHOT = "snapshot.json"
+JOURNAL_LOCK = "compact.lock"
+SEGMENT_BYTES = 4 * 1024 * 1024  # Journal segment size at which a host starts a new one
+COMPACT_BYTES = 8 * 1024 * 1024  # Journal a reader replays past the snapshot before it compacts
+COMPACT_LOCK_TIMEOUT = 300
+SEAL_GRACE = 60  # Seconds without appends before a superseded segment may be deleted
+USAGE_DIR = ".usage"  # Inside a scan's results directory, one file per task
+
+class StatusStore(ABC):
+    """Record of task and module status transitions with timestamps and attempt counts"""
+    def __init__(self, storage_manager, export_files=False):
+        self.storage_manager = storage_manager
+        self.export_files = export_files
+
+    def set_status(self, task_id, status, output=None, usage=None):
+        """Atomically move a task to a new status, with the resource usage of the run that ended"""
+        if status not in STATUSES:
+            raise ValueError(f"Invalid status: {status}")
+        previous = self._get_previous(task_id)
+        attempts = (previous['attempts'] or 0) if previous else 0
+        if status == 'running':
+            attempts += 1
+        record = {
+            'task_id': task_id,
+            'status': status,
+            'output': output,
+            'attempts': attempts,
+            'updated_at': time.time(),
+            'usage': usage
+        }
+        self._write(record)
+        if self.export_files:
+            self._export(task_id, status, output, previous['status'] if previous else None)
+        return record
+
+    def get_status(self, task_id):
+        """Get the current status name of a task, or None if it never ran"""
+        record = self.get(task_id)
+        return record['status'] if record else None
+
+    @abstractmethod
+    def get(self, task_id):
+        """Get the current status record of a task"""
+
+    @abstractmethod
+    def list(self, prefix=''):
+        """Get current status records of all tasks whose ID starts with prefix"""
+
+    @abstractmethod
+    def _write(self, record):
+        """Persist a new status record"""
+
+    def _get_previous(self, task_id):
+        """Get the record a transition follows, to carry its attempt count over"""
+        return self.get(task_id)
+
+    def _export(self, task_id, status, output, previous):
+        """Mirror a transition into the legacy `tasks/<id>.<status>` file layout"""
+        # Create the new file before removing the old one so readers always see a status
+        status_file = self.storage_manager.get_path('tasks', f"{task_id}.{status}")
+        with open(status_file, 'w') as f:
+            if output:
+                f.write(output)
+        stale = [previous] if previous else STATUSES
+        for old in stale:
+            if old == status:
+                continue
+            try:
+                os.remove(self.storage_manager.get_path('tasks', f"{task_id}.{old}"))
+            except FileNotFoundError:
+                pass
+
+class FileStatusStore(StatusStore):
+    """Status kept only in the legacy one-file-per-status layout"""
+    def __init__(self, storage_manager, export_files=True):
+        super().__init__(storage_manager, export_files=True)
+
+    def get(self, task_id):
+        for status in ['done', 'failed', 'running', 'pending']:
+            status_file = self.storage_manager.get_path('tasks', f"{task_id}.{status}")
+            try:
+                stat = os.stat(status_file)
+            except FileNotFoundError:
+                continue
+            with open(status_file) as f:
+                output = f.read() or None
+            return {
+                'task_id': task_id,
+                'status': status,
+                'output': output,
+                'attempts': None,
+                'updated_at': stat.st_mtime,
+                'usage': None
+            }
+        return None
+
+    def list(self, prefix=''):
+        records = []
+        for name in sorted(os.listdir(self.storage_manager.get_path('tasks'))):
+            task_id, _, status = name.rpartition('.')
+            if status in STATUSES and task_id.startswith(prefix):
+                records.append(self.get(task_id))
+        return [record for record in records if record]
+
+    def _write(self, record):
+        pass  # The exported file is the record
+
+class SQLiteStatusStore(StatusStore):
+    """Status kept in a SQLite database in WAL mode (single host only, WAL doesn't work over NFS)"""
+    def __init__(self, storage_manager, export_files=False, path=None):
+        super().__init__(storage_manager, export_files)
+        self.path = path or storage_manager.get_path('tasks', 'status.db')
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # Luigi runs tasks in forked workers, which must not share a connection
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS task_status (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    output TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    usage TEXT
+                )
+            """)
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(task_status)')]
+            if 'usage' not in columns:
+                # Databases created before resource accounting
+                self._conn.execute('ALTER TABLE task_status ADD COLUMN usage TEXT')
+            self._pid = os.getpid()
+        return self._conn
+
+    def set_status(self, task_id, status, output=None, usage=None):
+        if status not in STATUSES:
+            raise ValueError(f"Invalid status: {status}")
+        conn = self._connect()
+        # Read the previous state and write the new one in a single transaction
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            previous = self.get(task_id)
+            attempts = (previous['attempts'] or 0) if previous else 0
+            if status == 'running':
+                attempts += 1
+            record = {
+                'task_id': task_id,
+                'status': status,
+                'output': output,
+                'attempts': attempts,
+                'updated_at': time.time(),
+                'usage': usage
+            }
+            self._write(record)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if self.export_files:
+            self._export(task_id, status, output, previous['status'] if previous else None)
+        return record
+
+    def get(self, task_id):
+        row = self._connect().execute(
+            'SELECT task_id, status, output, attempts, updated_at, usage FROM task_status WHERE task_id = ?',
+            (task_id,)
+        ).fetchone()
+        return self._to_record(row) if row else None
+
+    def list(self, prefix=''):
+        rows = self._connect().execute(
+            'SELECT task_id, status, output, attempts, updated_at, usage FROM task_status '
+            'WHERE substr(task_id, 1, ?) = ? ORDER BY task_id',
+            (len(prefix), prefix)
+        ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def _to_record(self, row):
+        keys = ['task_id', 'status', 'output', 'attempts', 'updated_at', 'usage']
+        record = dict(zip(keys, row))
+        record['usage'] = json.loads(record['usage']) if record['usage'] else None
+        return record
+
+    def _write(self, record):
+        self._connect().execute(
+            'INSERT INTO task_status (task_id, status, output, attempts, updated_at, usage) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(task_id) DO UPDATE SET status = excluded.status, output = excluded.output, '
+            'attempts = excluded.attempts, updated_at = excluded.updated_at, usage = excluded.usage',
+            (record['task_id'], record['status'], record['output'], record['attempts'], record['updated_at'],
+             json.dumps(record['usage']) if record['usage'] else None)
+        )
+
+class JournalStatusStore(StatusStore):
+    """Status kept in append-only per-host journals in shared storage, replayed incrementally.
+
+    Each host appends to its newest journal segment and starts a new one once it reaches
+    SEGMENT_BYTES. Once enough has been appended since the last snapshot, whoever is reading
+    compacts: it writes the latest record of every task with the journal offsets they cover,
+    then deletes the sealed segments the snapshot fully covers. Readers start from the
+    snapshot, so startup cost doesn't grow with history.
+
+    Records are ordered by a Lamport clock rather than by the clocks of the hosts writing
+    them: each one gets a `seq` above that of every record its writer has seen.
+    """
+    def __init__(self, storage_manager, export_files=False):
+        super().__init__(storage_manager, export_files)
+        self.journal_dir = storage_manager.get_path('tasks', 'journal')
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.host = socket.gethostname()
+        self.snapshot_file = os.path.join(self.journal_dir, JOURNAL_SNAPSHOT)
+        self._segment = None
+        self._snapshot_mtime = None
+        self._offsets = {}  # Journal file name -> bytes applied to the state
+        self._state = {}
+        self._clock = 0  # Highest `seq` seen
+        self._refreshed = False
+
+    def _segment_name(self, segment):
+        # Segment 0 keeps the name journals had before rotation
+        return f"{self.host}.jsonl" if segment == 0 else f"{self.host}@{segment}.jsonl"
+
+    def _current_segment(self):
+        """Get the newest segment of this host's journal"""
+        if self._segment is None:
+            segments = [0]
+            for name in os.listdir(self.journal_dir):
+                host, _, segment = name[:-len('.jsonl')].rpartition('@')
+                if name.endswith('.jsonl') and host == self.host and segment.isdigit():
+                    segments.append(int(segment))
+            self._segment = max(segments)
+        # Another process of this host may have moved on to a newer segment
+        while os.path.exists(os.path.join(self.journal_dir, self._segment_name(self._segment + 1))):
+            self._segment += 1
+        return self._segment
+
+    @staticmethod
+    def _order(record):
+        # Wall clock only breaks ties between concurrent writers, and orders records older than `seq`
+        return record.get('seq', 0), record['updated_at']
+
+    def _merge(self, records):
+        """Apply records to the state, keeping the newest one of each task"""
+        for record in records:
+            self._clock = max(self._clock, record.get('seq', 0))
+            current = self._state.get(record['task_id'])
+            if current is None or self._order(record) >= self._order(current):
+                self._state[record['task_id']] = record
+
+    def _load_snapshot(self):
+        """Merge a snapshot written since the last one seen, returning whether there was one"""
+        try:
+            mtime = os.stat(self.snapshot_file).st_mtime_ns
+            if mtime == self._snapshot_mtime:
+                return False
+            with open(self.snapshot_file) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self._snapshot_mtime = mtime
+        self._merge(snapshot['state'].values())
+        for name, offset in snapshot['offsets'].items():
+            self._offsets[name] = max(self._offsets.get(name, 0), offset)
+        return True
+
+    def refresh(self):
+        """Apply journal entries written since the last refresh"""
+        self._refreshed = True
+        self._load_snapshot()
+        pending = 0
+        for name in sorted(os.listdir(self.journal_dir)):
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.journal_dir, name)
+            offset = self._offsets.get(name, 0)
+            try:
+                if os.path.getsize(path) <= offset:
+                    continue
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    records = []
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break  # Entry still being written
+                        offset += len(line)
+                        records.append(json.loads(line))
+            except FileNotFoundError:
+                # Compacted meanwhile; its entries are in the new snapshot
+                self._load_snapshot()
+                continue
+            pending += offset - self._offsets.get(name, 0)
+            self._merge(records)
+            self._offsets[name] = offset
+        if pending and self._bytes_since_snapshot() >= COMPACT_BYTES:
+            self.compact()
+
+    def _bytes_since_snapshot(self):
+        """Get how much journal a fresh reader would replay on top of the snapshot"""
+        try:
+            with open(self.snapshot_file) as f:
+                covered = json.load(f)['offsets']
+        except (OSError, ValueError):
+            covered = {}
+        return sum(offset - covered.get(name, 0) for name, offset in self._offsets.items())
+
+    def compact(self):
+        """Snapshot the state and delete sealed journal segments it covers, if no one else is compacting"""
+        lock_file = os.path.join(self.journal_dir, JOURNAL_LOCK)
+        try:
+            if time.time() - os.path.getmtime(lock_file) > COMPACT_LOCK_TIMEOUT:
+                os.remove(lock_file)  # Left by a compactor that died
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+        except FileExistsError:
+            return False
+        try:
+            self._load_snapshot()
+            names = sorted(name for name in os.listdir(self.journal_dir) if name.endswith('.jsonl'))
+            # Drop offsets of segments that are gone, so the snapshot doesn't grow forever
+            offsets = {name: self._offsets[name] for name in names if name in self._offsets}
+            tmp_path = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'state': self._state, 'offsets': offsets, 'created_at': time.time()}, f)
+            os.replace(tmp_path, self.snapshot_file)
+            self._snapshot_mtime = os.stat(self.snapshot_file).st_mtime_ns
+
+            # A segment is sealed once its host started a newer one and nobody appended to it for
+            # a while; appenders check for a newer segment right before each write
+            newest = {}
+            for name in names:
+                host, segment = self._parse_segment(name)
+                newest[host] = max(newest.get(host, 0), segment)
+            now = time.time()
+            for name in names:
+                host, segment = self._parse_segment(name)
+                path = os.path.join(self.journal_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if (segment < newest[host] and now - stat.st_mtime > SEAL_GRACE
+                        and offsets.get(name, 0) >= stat.st_size):
+                    os.remove(path)
+            return True
+        finally:
+            os.remove(lock_file)
+
+    @staticmethod
+    def _parse_segment(name):
+        """Get the host and segment number of a journal file name"""
+        host, _, segment = name[:-len('.jsonl')].rpartition('@')
+        if host and segment.isdigit():
+            return host, int(segment)
+        return name[:-len('.jsonl')], 0
+
+    def get(self, task_id):
+        self.refresh()
+        return self._state.get(task_id)
+
+    def list(self, prefix=''):
+        self.refresh()
+        return [self._state[task_id] for task_id in sorted(self._state) if task_id.startswith(prefix)]
+
+    def _get_previous(self, task_id):
+        # A transition only needs the attempt count, so it doesn't replay journals on every write.
+        # Forked Luigi workers inherit the state the loader already read.
+        if not self._refreshed:
+            self.refresh()
+        return self._state.get(task_id)
+
+    def _write(self, record):
+        self._clock += 1
+        record['seq'] = self._clock
+        line = (json.dumps(record) + '\n').encode()
+        segment = self._current_segment()
+        path = os.path.join(self.journal_dir, self._segment_name(segment))
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            full = os.fstat(fd).st_size >= SEGMENT_BYTES
+        finally:
+            os.close(fd)
+        if full:
+            # Creating the next segment seals this one for every appender
+            next_path = os.path.join(self.journal_dir, self._segment_name(segment + 1))
+            os.close(os.open(next_path, os.O_WRONLY | os.O_CREAT, 0o644))
+            self._segment = segment + 1
+        self._state[record['task_id']] = record
+
+def write_scan_usage(scan_dir, task_id, usage):
+    """Keep the resource usage of a task's run with the scan it ran in"""
+    usage_dir = os.path.join(scan_dir, USAGE_DIR)
+    os.makedirs(usage_dir, exist_ok=True)
+    path = os.path.join(usage_dir, f"{task_id}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(usage, f)
+    os.replace(tmp_path, path)
+
+def read_scan_usage(scan_dir):
+    """Get the resource usage of every task that finished in a scan, by task ID"""
+    usage_dir = os.path.join(scan_dir, USAGE_DIR)
+    usage = {}
+    try:
+        names = os.listdir(usage_dir)
+    except FileNotFoundError:
+        return usage
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(usage_dir, name)) as f:
+                usage[name[:-len('.json')]] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return usage
+
+def summarize_usage(records):
+    """Aggregate the resource usage of status records per node"""
+    nodes = {}
+    for record in records:
+        usage = record.get('usage')
+        if not usage:
+            continue
+        node = nodes.setdefault(usage['host'], {
+            'host': usage['host'], 'tasks': 0, 'wall_time': 0.0, 'user_time': 0.0, 'system_time': 0.0,
+            'max_rss': 0, 'read_bytes': 0, 'write_bytes': 0, 'stdout_bytes': 0, 'stdout_lines': 0
+        })
+        node['tasks'] += 1
+        node['max_rss'] = max(node['max_rss'], usage['max_rss'])
+        for key in ['wall_time', 'user_time', 'system_time', 'read_bytes', 'write_bytes', 'stdout_bytes', 'stdout_lines']:
+            node[key] += usage[key]
+    return [nodes[host] for host in sorted(nodes)]
+
+BACKENDS = {
+    'file': FileStatusStore,
+    'sqlite': SQLiteStatusStore,
+    'journal': JournalStatusStore
+}
+
+def get_status_store(storage_manager=None):
+    """Create the status store configured under `status:` in the storage config"""
+    storage_manager = storage_manager or StorageManager()
+    config = storage_manager.config.get('status', {})
+    backend = config.get('backend', 'file')
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid status backend: {backend}")
+    return BACKENDS[backend](storage_manager, export_files=config.get('export_files', False))
@@ -91,6 +91,15 @@ class StorageManager:
             path = os.path.join(path, filename)
         return path
     
+    def is_shared(self, path):
+        """Check whether a path is inside shared storage"""
+        roots = [self.config['server']['path'], self.config.get('client', {}).get('mount_point')]
+        path = os.path.realpath(path)
+        return any(
+            root and os.path.commonpath([path, os.path.realpath(root)]) == os.path.realpath(root)
+            for root in roots
+        )
+    
     def ensure_directory(self, directory):
         """Ensure a directory exists in shared storage"""
         if directory not in self.config['directories']:
@@ -2,11 +2,195 @@ import luigi
 import os
 import subprocess
 import re
+import shutil
+import hashlib
+import signal
+import socket
+import resource
+import threading
+import time
+import json
 from rich.console import Console
 from storage_manager import StorageManager
+from result_cache import ResultCache
+from status_store import get_status_store, write_scan_usage
+from builtin_tasks import run_builtin, MAX_MEMORY_LINES
+from hostset import build_hostset, HOSTSET_SUFFIX
+from asset_store import spool_assets
 
 console = Console()
 
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_POLL_INTERVAL = 0.5
+
+def line_offsets(path, step):
+    """Get the byte offsets where every step-th line starts, ending with the file size"""
+    offsets = [0]
+    position = 0
+    with open(path, 'rb') as f:
+        for number, line in enumerate(f, 1):
+            position += len(line)
+            if number % step == 0:
+                offsets.append(position)
+    if len(offsets) == 1 or offsets[-1] != position:
+        offsets.append(position)
+    return offsets
+
+def align_to_line(f, offset, size):
+    """Move a byte offset forward to the start of the next line, unless a line starts there"""
+    if offset <= 0 or offset >= size:
+        return min(max(offset, 0), size)
+    f.seek(offset - 1)
+    f.readline()
+    return f.tell()
+
+BLOCK_SIZE = 512  # Unit of the block I/O counts in rusage
+
+class ResourceUsage:
+    """Wall time, CPU, peak RSS and I/O of the command tree a task runs"""
+    def __init__(self):
+        self.started = time.time()
+        self.children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    
+    def stop(self, stdout_bytes=0, stdout_lines=0):
+        """Get the usage since the task started as a dict for the status store"""
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {
+            'host': socket.gethostname(),
+            'wall_time': round(time.time() - self.started, 3),
+            'user_time': round(children.ru_utime - self.children.ru_utime, 3),
+            'system_time': round(children.ru_stime - self.children.ru_stime, 3),
+            # Peak of any one child; per task because Luigi runs each task in its own worker process
+            'max_rss': children.ru_maxrss * 1024,
+            # Block I/O of the tools only; output they pipe to the worker is in the stdout counts
+            'read_bytes': (children.ru_inblock - self.children.ru_inblock) * BLOCK_SIZE,
+            'write_bytes': (children.ru_oublock - self.children.ru_oublock) * BLOCK_SIZE,
+            'stdout_bytes': stdout_bytes,
+            'stdout_lines': stdout_lines
+        }
+
+class OutputLimitExceeded(Exception):
+    """Raised when a streamed task writes more output than allowed"""
+    pass
+
+class StreamCapture(threading.Thread):
+    """Copy a process pipe to a file in fixed-size chunks, counting bytes and lines"""
+    def __init__(self, pipe, path, max_bytes=None, on_limit=None):
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.path = path
+        self.max_bytes = max_bytes
+        self.on_limit = on_limit
+        self.bytes_written = 0
+        self.newlines = 0
+        self.ends_with_newline = True
+        self.limit_exceeded = False
+    
+    @property
+    def lines_written(self):
+        """Number of lines written, counting a final line without a newline"""
+        return self.newlines + (0 if self.ends_with_newline else 1)
+    
+    def run(self):
+        with open(self.path, 'wb') as f:
+            while True:
+                chunk = self.pipe.read1(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if self.limit_exceeded:
+                    continue  # Drain the pipe so the child never blocks on write
+                if self.max_bytes is not None and self.bytes_written + len(chunk) > self.max_bytes:
+                    chunk = chunk[:self.max_bytes - self.bytes_written]
+                    self.limit_exceeded = True
+                f.write(chunk)
+                self.bytes_written += len(chunk)
+                if chunk:
+                    self.newlines += chunk.count(b'\n')
+                    self.ends_with_newline = chunk.endswith(b'\n')
+                if self.limit_exceeded and self.on_limit:
+                    self.on_limit()
+        self.pipe.close()
+
+class UpstreamFailed(Exception):
+    """Raised when the task feeding a streamed task fails"""
+    pass
+
+class StreamFeed(threading.Thread):
+    """Tail an upstream task's growing stdout file into a process stdin"""
+    def __init__(self, source, pipe, on_error=None, poll_interval=STREAM_POLL_INTERVAL):
+        super().__init__(daemon=True)
+        self.source = source
+        self.pipe = pipe
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self.error = None
+        self._stopped = threading.Event()
+    
+    def stop(self):
+        """Stop tailing, e.g. because the downstream process already exited"""
+        self._stopped.set()
+    
+    def _check_ancestors(self):
+        """Fail if a task the upstream task waits for failed, as Luigi then never runs it"""
+        pending = list(self.source.dependencies)
+        seen = set()
+        while pending:
+            task = pending.pop()
+            if task.get_task_id() in seen:
+                continue
+            seen.add(task.get_task_id())
+            if task.get_status() == 'failed':
+                raise UpstreamFailed(
+                    f"Upstream task {self.source.get_task_id()} can't run because {task.get_task_id()} failed"
+                )
+            pending.extend(task.dependencies)
+    
+    def _wait_for_output(self, path):
+        """Wait until the upstream task has created its stdout file"""
+        while not os.path.exists(path) and not self._stopped.is_set():
+            status = self.source.get_status()
+            if status == 'failed':
+                raise UpstreamFailed(f"Upstream task {self.source.get_task_id()} failed")
+            if status == 'done':
+                raise UpstreamFailed(f"Upstream task {self.source.get_task_id()} has no streamed output")
+            if status != 'running':
+                self._check_ancestors()
+            self._stopped.wait(self.poll_interval)
+    
+    def run(self):
+        path = self.source.get_shared_path('results', f"{self.source.get_task_id()}.stdout")
+        try:
+            self._wait_for_output(path)
+            if self._stopped.is_set():
+                return
+            with open(path, 'rb') as f:
+                while not self._stopped.is_set():
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if chunk:
+                        self.pipe.write(chunk)
+                        continue
+                    
+                    status = self.source.get_status()
+                    if status == 'done':
+                        # Upstream closes its output before reporting done, so drain what's left
+                        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+                            self.pipe.write(chunk)
+                        break
+                    if status == 'failed':
+                        raise UpstreamFailed(f"Upstream task {self.source.get_task_id()} failed")
+                    self._stopped.wait(self.poll_interval)
+        except BrokenPipeError:
+            pass  # Downstream exited without reading all of its input
+        except Exception as e:
+            self.error = e
+            if self.on_error:
+                self.on_error()
+        finally:
+            try:
+                self.pipe.close()
+            except BrokenPipeError:
+                pass
+
 class TaskExecution(luigi.Task):
     """Base Luigi task for task execution"""
     name = luigi.Parameter()
@@ -19,6 +203,10 @@ class TaskExecution(luigi.Task):
     # Class variables
     _task_registry = {}
     _storage_manager = None
+    _result_cache = None
+    _status_store = None
+    _cache_enabled = True
+    _incremental_enabled = False
     
     @classmethod
     def get_storage_manager(cls):
@@ -27,6 +215,30 @@ class TaskExecution(luigi.Task):
             cls._storage_manager = StorageManager()
         return cls._storage_manager
     
+    @classmethod
+    def get_status_store(cls):
+        """Get or create status store instance"""
+        if cls._status_store is None:
+            cls._status_store = get_status_store(cls.get_storage_manager())
+        return cls._status_store
+    
+    @classmethod
+    def get_result_cache(cls):
+        """Get or create result cache instance"""
+        if cls._result_cache is None:
+            cls._result_cache = ResultCache(storage_manager=cls.get_storage_manager())
+        return cls._result_cache
+    
+    @classmethod
+    def set_cache_enabled(cls, enabled):
+        """Enable or disable the result cache for all tasks"""
+        cls._cache_enabled = enabled
+    
+    @classmethod
+    def set_incremental_enabled(cls, enabled):
+        """Feed `incremental: true` tasks only input that is new since the previous scan"""
+        cls._incremental_enabled = enabled
+    
     def get_task_id(self):
         """Get unique task identifier"""
         return f"{self.module_name}:{self.name}"
@@ -36,29 +248,46 @@ class TaskExecution(luigi.Task):
         """Override task family to show module.taskname format"""
         return f"{self.module_name}:{self.name}"
     
+    @property
+    def resources(self):
+        """Scheduler resources declared under `resources:` in the workflow"""
+        return {name: int(amount) for name, amount in self.config.get('resources', {}).items()}
+    
     def get_shared_path(self, directory, filename):
         """Get path in shared storage"""
         storage = self.get_storage_manager()
         return storage.get_path(directory, filename)
     
-    def _update_status(self, status, output=None):
-        """Update task status using file extensions in shared storage"""
-        task_id = self.get_task_id()
-        storage = self.get_storage_manager()
-        
-        # Remove any existing status files
-        for ext in ['.pending', '.running', '.done', '.failed']:
-            status_file = storage.get_path('tasks', f"{task_id}{ext}")
-            if os.path.exists(status_file):
-                os.remove(status_file)
-        
-        # Create new status file in shared storage
-        status_file = storage.get_path('tasks', f"{task_id}.{status}")
-        if output:
-            with open(status_file, 'w') as f:
-                f.write(output)
-        else:
-            open(status_file, 'w').close()  # Create empty file
+    def get_status(self):
+        """Get current task status from the status store"""
+        return self.get_status_store().get_status(self.get_task_id())
+    
+    def reset_stream(self):
+        """Clear stale status and streamed output before a streamed child tails it"""
+        self._update_status('pending')
+        stdout_file = self.get_shared_path('results', f"{self.get_task_id()}.stdout")
+        if os.path.exists(stdout_file):
+            os.remove(stdout_file)
+    
+    def requires(self):
+        """Upstream tasks that must finish before this one starts"""
+        if self.config.get('stream', False):
+            # Streamed tasks start right away and tail their parent instead
+            return []
+        return list(self.dependencies)
+    
+    def get_stream_source(self):
+        """Get the task whose stdout feeds this task's stdin, if any"""
+        if self.config.get('stream', False) and self.dependencies:
+            return self.dependencies[0]
+        return None
+    
+    def _update_status(self, status, output=None, usage=None):
+        """Record a task status transition in the status store, and the run's usage with its scan"""
+        self.get_status_store().set_status(self.get_task_id(), status, output, usage)
+        # The store holds the task's latest run from any scan, the scan directory holds this one
+        if usage and os.path.isdir(self.save_dir):
+            write_scan_usage(self.save_dir, self.get_task_id(), usage)
     
     def get_output_path(self, task_ref):
         """Get the output path for a task reference from shared storage"""
@@ -84,49 +313,380 @@ class TaskExecution(luigi.Task):
             return self.config['arguments'][arg_name]
         raise ValueError(f"Argument '{arg_name}' not found in any scope")
     
+    def get_placeholders(self, template):
+        """Get the placeholders in a template, from the compiled workflow when the loader set them"""
+        placeholders = getattr(self, 'placeholders', None)
+        if placeholders is None:
+            return re.findall(r'{([^}]+)}', template)
+        return [name for name in placeholders if f"{{{name}}}" in template]
+    
+    def render(self, template):
+        """Replace argument placeholders in a template"""
+        if '{' in template and '}' in template:
+            for arg_name in self.get_placeholders(template):
+                arg_value = self.get_argument_value(arg_name)
+                template = template.replace(f"{{{arg_name}}}", str(arg_value))
+        return template
+    
+    def get_command(self):
+        """Get the rendered command, or a description of a builtin that identifies its result"""
+        if self.config.get('builtin'):
+            return f"builtin:{self.config['builtin']} {json.dumps(self.get_builtin_options(), sort_keys=True)}"
+        return self.render(self.config['command'])
+    
+    def get_builtin_options(self):
+        """Get a builtin's rendered `scope` and `exclude` domains"""
+        return {
+            option: [self.render(str(value)) for value in self.config.get(option, [])]
+            for option in ('scope', 'exclude')
+        }
+    
+    def get_output_files(self):
+        """Get the files in shared storage holding this task's captured output"""
+        if self.config.get('stream_output', False) or self.get_stream_source() or self.config.get('incremental', False):
+            extensions = ['stdout', 'stderr']
+        else:
+            extensions = ['output']
+        return [self.get_shared_path('results', f"{self.get_task_id()}.{ext}") for ext in extensions]
+    
+    def get_input_paths(self):
+        """Get the artifacts this task reads: declared inputs, file arguments and parent outputs"""
+        paths = [self.render(path) for path in self.config.get('inputs', [])]
+        if 'shard' in self.config:
+            paths.append(self.config['shard']['path'])
+        for arg_name in self.get_placeholders(self.config.get('command', '')):
+            arg_value = str(self.get_argument_value(arg_name))
+            if os.path.exists(arg_value):
+                paths.append(arg_value)
+        for dep in self.dependencies:
+            paths.extend(dep.get_output_files())
+            paths.append(dep.get_shared_path('results', dep.get_task_id()))
+        return paths
+    
+    def get_cache_key(self, command):
+        """Get the result cache key for this run, or None if it can't be cached"""
+        cache = self.get_result_cache()
+        if not (self._cache_enabled and cache.enabled and self.config.get('cache', True)):
+            return None
+        if self.get_stream_source():
+            return None  # Input is still being produced when the task starts
+        if self.config.get('incremental', False) and self._incremental_enabled:
+            return None  # Input depends on what the previous scan already saw
+        return cache.make_key(
+            command,
+            self.get_input_paths(),
+            version=f"{self.config.get('version', '')}:{bool(self.config.get('stream_output', False))}"
+        )
+    
+    def get_stdout_counts(self):
+        """Get the byte and line count of what the command wrote to stdout, as counted while it ran"""
+        return getattr(self, 'stdout_bytes', 0), getattr(self, 'stdout_lines', 0)
+    
     def run(self):
         """Execute the task"""
+        usage = ResourceUsage()
         try:
             self._update_status('running')
             
+            # Shards cut their slice of the input before anything reads it
+            if 'shard' in self.config:
+                self._write_shard_input()
+            
             # Prepare command with arguments
-            command = self.config['command']
-            if '{' in command and '}' in command:
-                # Replace argument placeholders
-                for arg_name in re.findall(r'{([^}]+)}', command):
-                    arg_value = self.get_argument_value(arg_name)
-                    command = command.replace(f"{{{arg_name}}}", str(arg_value))
+            command = self.get_command()
             
             # Create results directory in shared storage
             results_dir = self.get_shared_path('results', self.get_task_id())
             os.makedirs(results_dir, exist_ok=True)
             
-            # Execute command
-            process = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                cwd=results_dir
-            )
+            # Reuse the output of an identical earlier run if there is one
+            cache = self.get_result_cache()
+            cache_key = self.get_cache_key(command)
+            entry_dir = cache.lookup(cache_key) if cache_key else None
             
-            # Write output to shared storage
-            output_file = self.get_shared_path('results', f"{self.get_task_id()}.output")
-            with open(output_file, 'w') as f:
-                f.write(f"STDOUT:\n{process.stdout}\n\nSTDERR:\n{process.stderr}")
+            if entry_dir:
+                cache.materialize(entry_dir, self.get_output_files(), results_dir)
+                summary = f"Restored from cache {cache_key}"
+            else:
+                # Execute command
+                if self.config.get('merge_shards'):
+                    summary = self._run_merge(results_dir)
+                elif self.config.get('builtin'):
+                    summary = self._run_builtin()
+                elif 'shard' in self.config and not self.config['shard'].get('input'):
+                    summary = self._run_streaming(command, results_dir, stdin_path=self.config['shard']['path'])
+                elif self.config.get('incremental', False):
+                    summary = self._run_incremental(command, results_dir)
+                elif self.config.get('stream_output', False) or self.get_stream_source():
+                    summary = self._run_streaming(command, results_dir)
+                else:
+                    summary = self._run_buffered(command, results_dir)
+                
+                if cache_key:
+                    cache.store(cache_key, self.get_output_files(), results_dir)
             
-            if process.returncode != 0:
-                raise Exception(f"Command failed with exit code {process.returncode}")
+            if self.config.get('hostset', False):
+                summary = "\n".join(filter(None, [summary, self._write_hostset()]))
             
             # Create done file
+            message = f"Task completed at {results_dir}"
+            if summary:
+                message += f"\n{summary}"
             with self.output().open('w') as f:
-                f.write(f"Task completed at {results_dir}")
+                f.write(message)
             
-            self._update_status('done')
+            self._update_status('done', message, usage.stop(*self.get_stdout_counts()))
             
         except Exception as e:
-            self._update_status('failed', str(e))
+            self._update_status('failed', str(e), usage.stop(*self.get_stdout_counts()))
             raise
+        
+        # Queued once the run is recorded, so its usage doesn't include it. The host
+        # running scan.py ingests the queue, off the worker slots.
+        if self.config.get('assets', False):
+            self._spool_assets()
+    
+    def _run_buffered(self, command, results_dir):
+        """Run the command and write its captured output in one go"""
+        process = subprocess.run(
+            command,
+            shell=True,
+            capture_output=True,
+            text=True,
+            cwd=results_dir
+        )
+        
+        self.stdout_bytes = len(process.stdout.encode())
+        self.stdout_lines = process.stdout.count('\n') + (1 if process.stdout and not process.stdout.endswith('\n') else 0)
+        
+        # Write output to shared storage
+        output_file = self.get_shared_path('results', f"{self.get_task_id()}.output")
+        with open(output_file, 'w') as f:
+            f.write(f"STDOUT:\n{process.stdout}\n\nSTDERR:\n{process.stderr}")
+        
+        if process.returncode != 0:
+            raise Exception(f"Command failed with exit code {process.returncode}")
+        return None
+    
+    def get_incremental_state_dir(self, command):
+        """Get the directory holding what the previous scan of this task and target saw"""
+        key = hashlib.sha256(f"{self.get_task_id()}\n{command}".encode()).hexdigest()
+        return os.path.join(self.get_shared_path('state', 'incremental'), key)
+    
+    def _run_incremental(self, command, results_dir):
+        """Run the command on input lines the previous scan didn't see and merge in its results"""
+        source = self.dependencies[0]
+        input_file = source.get_shared_path('results', f"{source.get_task_id()}.stdout")
+        stdout_file = self.get_shared_path('results', f"{self.get_task_id()}.stdout")
+        state_dir = self.get_incremental_state_dir(command)
+        previous_input = os.path.join(state_dir, 'input')
+        previous_output = os.path.join(state_dir, 'output')
+        have_baseline = (
+            self._incremental_enabled
+            and os.path.exists(previous_input)
+            and os.path.exists(previous_output)
+        )
+        
+        # Sorted merges in bounded memory, as inputs can hold more lines than fit in a set
+        max_memory_lines = self.config.get('max_memory_lines', MAX_MEMORY_LINES)
+        current_file = self.get_shared_path('temp', f"{self.get_task_id()}.input")
+        total = run_builtin('union', [input_file], current_file, max_memory_lines=max_memory_lines)
+        if have_baseline:
+            delta_file = self.get_shared_path('temp', f"{self.get_task_id()}.delta")
+            new_lines = run_builtin('diff', [current_file, previous_input], delta_file, max_memory_lines=max_memory_lines)
+        else:
+            delta_file, new_lines = current_file, total
+        try:
+            if new_lines or not have_baseline:
+                summary = self._run_streaming(command, results_dir, stdin_path=delta_file)
+            else:
+                # Nothing new to probe, so skip the tool entirely
+                for path in self.get_output_files():
+                    open(path, 'w').close()
+                summary = None
+        finally:
+            if delta_file != current_file:
+                os.remove(delta_file)
+        
+        # Merge fresh results into those carried over from the previous scan
+        if have_baseline:
+            run_builtin('union', [previous_output, stdout_file], stdout_file, max_memory_lines=max_memory_lines)
+        
+        os.makedirs(state_dir, exist_ok=True)
+        os.replace(current_file, previous_input)
+        shutil.copyfile(stdout_file, previous_output)
+        
+        message = f"incremental: {new_lines} of {total} input lines are new"
+        return f"{summary}\n{message}" if summary else message
+    
+    def _write_shard_input(self):
+        """Write this shard's contiguous slice of the sharded input, reading only that slice"""
+        shard = self.config['shard']
+        source = shard.get('source')
+        if not source:
+            parent = self.dependencies[0]
+            source = parent.get_shared_path('results', f"{parent.get_task_id()}.stdout")
+        
+        with open(source, 'rb') as src, open(f"{shard['path']}.tmp", 'wb') as dst:
+            if 'start' in shard:
+                # Sharding by lines, the loader found every shard's byte range in one pass
+                start, end = shard['start'], shard['end']
+            else:
+                # Otherwise shards split the file evenly by bytes, on line boundaries
+                size = os.fstat(src.fileno()).st_size
+                start = align_to_line(src, size * shard['index'] // shard['count'], size)
+                end = align_to_line(src, size * (shard['index'] + 1) // shard['count'], size)
+            src.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = src.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        os.replace(f"{shard['path']}.tmp", shard['path'])
+    
+    def _run_merge(self, results_dir):
+        """Concatenate shard outputs in shard order, as an unsharded run would have written them"""
+        shards = list(self.dependencies)
+        self.stdout_bytes = self.stdout_lines = 0
+        for ext in ['stdout', 'stderr']:
+            target = self.get_shared_path('results', f"{self.get_task_id()}.{ext}")
+            with open(target, 'wb') as dst:
+                for shard in shards:
+                    with open(shard.get_shared_path('results', f"{shard.get_task_id()}.{ext}"), 'rb') as src:
+                        for chunk in iter(lambda: src.read(STREAM_CHUNK_SIZE), b''):
+                            dst.write(chunk)
+                            if ext == 'stdout':
+                                # Counted on the way through, so stdout isn't read again for usage
+                                self.stdout_bytes += len(chunk)
+                                self.stdout_lines += chunk.count(b'\n')
+                                last = chunk[-1:]
+            if ext == 'stdout' and self.stdout_bytes and last != b'\n':
+                self.stdout_lines += 1  # Final line without a newline
+        
+        # Files the tool wrote into its working directory are concatenated by name too
+        shutil.rmtree(results_dir)
+        os.makedirs(results_dir)
+        for shard in shards:
+            shard_dir = shard.get_shared_path('results', shard.get_task_id())
+            for root, _, files in os.walk(shard_dir):
+                for name in files:
+                    relative = os.path.relpath(os.path.join(root, name), shard_dir)
+                    target = os.path.join(results_dir, relative)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(os.path.join(root, name), 'rb') as src, open(target, 'ab') as dst:
+                        shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+        
+        for shard in shards:
+            if os.path.exists(shard.config['shard']['path']):
+                os.remove(shard.config['shard']['path'])
+        return f"merged {len(shards)} shards"
+    
+    def _run_builtin(self):
+        """Run a built-in set operator in-process over parent stdouts and `inputs` files"""
+        paths = [dep.get_shared_path('results', f"{dep.get_task_id()}.stdout") for dep in self.dependencies]
+        paths += [self.render(str(path)) for path in self.config.get('inputs', [])]
+        stdout_file = self.get_shared_path('results', f"{self.get_task_id()}.stdout")
+        stderr_file = self.get_shared_path('results', f"{self.get_task_id()}.stderr")
+        
+        lines = run_builtin(
+            self.config['builtin'], paths, stdout_file, self.get_builtin_options(),
+            self.config.get('max_memory_lines', MAX_MEMORY_LINES)
+        )
+        open(stderr_file, 'w').close()
+        self.stdout_bytes = os.path.getsize(stdout_file)
+        self.stdout_lines = lines
+        return f"{self.config['builtin']}: {lines} lines from {len(paths)} inputs"
+    
+    def get_hostset_path(self):
+        """Get the path of the host set built from this task's stdout"""
+        return self.get_shared_path('results', f"{self.get_task_id()}{HOSTSET_SUFFIX}")
+    
+    def _write_hostset(self):
+        """Build a sorted host set from stdout, next to it and in the scan's directory"""
+        stdout_file = self.get_shared_path('results', f"{self.get_task_id()}.stdout")
+        hostset_file = self.get_hostset_path()
+        count = build_hostset(hostset_file, [stdout_file], self.config.get('max_memory_lines', MAX_MEMORY_LINES))
+        if os.path.isdir(self.save_dir):
+            shutil.copyfile(hostset_file, os.path.join(self.save_dir, os.path.basename(hostset_file)))
+        return f"hostset: {count} hosts"
+    
+    def _spool_assets(self):
+        """Queue stdout for the cross-scan asset store, under the scan's workflow and ID"""
+        stdout_file = self.get_shared_path('results', f"{self.get_task_id()}.stdout")
+        scan_dir = os.path.abspath(self.save_dir)
+        try:
+            spool_assets(
+                self.get_storage_manager(), stdout_file, os.path.basename(os.path.dirname(scan_dir)),
+                os.path.basename(scan_dir), tls=self.config['assets'] == 'tls'
+            )
+        except OSError as e:
+            # The store is an index over results, the task itself succeeded
+            console.print(f"[yellow]Warning: Could not queue assets of {self.get_task_id()}: {str(e)}[/yellow]")
+    
+    def _run_streaming(self, command, results_dir, stdin_path=None):
+        """Run the command writing stdout/stderr straight to shared storage"""
+        max_bytes = self.config.get('max_output_bytes')
+        stdout_file = self.get_shared_path('results', f"{self.get_task_id()}.stdout")
+        stderr_file = self.get_shared_path('results', f"{self.get_task_id()}.stderr")
+        
+        source = self.get_stream_source()
+        
+        if source:
+            stdin = subprocess.PIPE
+        elif stdin_path:
+            stdin = open(stdin_path, 'rb')
+        else:
+            stdin = None
+        
+        # Run in its own session so the whole pipeline can be killed on overflow
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=results_dir,
+            start_new_session=True
+        )
+        
+        def kill():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        
+        captures = [
+            StreamCapture(process.stdout, stdout_file, max_bytes, kill),
+            StreamCapture(process.stderr, stderr_file, max_bytes, kill)
+        ]
+        for capture in captures:
+            capture.start()
+        feed = None
+        if source:
+            feed = StreamFeed(source, process.stdin, kill)
+            feed.start()
+        returncode = process.wait()
+        if stdin_path:
+            stdin.close()
+        for capture in captures:
+            capture.join()
+        if feed:
+            feed.stop()
+            feed.join()
+        
+        self.stdout_bytes = captures[0].bytes_written
+        self.stdout_lines = captures[0].lines_written
+        self.stderr_bytes = captures[1].bytes_written
+        
+        if feed and feed.error:
+            raise feed.error
+        if any(capture.limit_exceeded for capture in captures):
+            raise OutputLimitExceeded(f"Output limit of {max_bytes} bytes exceeded")
+        if returncode != 0:
+            raise Exception(f"Command failed with exit code {returncode}")
+        return f"stdout: {self.stdout_bytes} bytes\nstderr: {self.stderr_bytes} bytes"
     
     def output(self):
         """Define task output file in shared storage"""
@@ -141,11 +701,19 @@ class ModuleTask(luigi.Task):
     # Class variables
     _loader = None
     _storage_manager = None
+    _status_store = None
     
     @classmethod
     def set_loader(cls, loader):
         cls._loader = loader
     
+    @classmethod
+    def get_status_store(cls):
+        """Get or create status store instance"""
+        if cls._status_store is None:
+            cls._status_store = get_status_store(cls.get_storage_manager())
+        return cls._status_store
+    
     @classmethod
     def get_storage_manager(cls):
         """Get or create storage manager instance"""
@@ -159,22 +727,8 @@ class ModuleTask(luigi.Task):
         return self.name
     
     def _update_status(self, status, output=None):
-        """Update module status using file extensions in shared storage"""
-        storage = self.get_storage_manager()
-        
-        # Remove any existing status files
-        for ext in ['.pending', '.running', '.done', '.failed']:
-            status_file = storage.get_path('tasks', f"{self.name}{ext}")
-            if os.path.exists(status_file):
-                os.remove(status_file)
-        
-        # Create new status file
-        status_file = storage.get_path('tasks', f"{self.name}.{status}")
-        with open(status_file, 'w') as f:
-            if output:
-                f.write(output)
-            else:
-                f.write(f"Module {self.name} is {status}")
+        """Record a module status transition in the status store"""
+        self.get_status_store().set_status(self.name, status, output or f"Module {self.name} is {status}")
     
     def requires(self):
         # Get all tasks for this module
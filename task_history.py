@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import statistics
+
+HISTORY_FILE = "durations.json"
+SMOOTHING = 0.3  # Weight of the newest run in the moving average
+DEFAULT_DURATION = 60  # Seconds assumed for tasks that never ran anywhere
+
+class TaskHistory:
+    """Smoothed run durations of tasks in previous scans, kept in the shared state directory"""
+    def __init__(self, storage_manager, status_store=None):
+        self.path = storage_manager.get_path('state', HISTORY_FILE)
+        self.status_store = status_store
+        self.durations = self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.durations, f)
+        os.replace(tmp_path, self.path)
+
+    def update(self):
+        """Fold runs finished since the last update into the averages"""
+        if self.status_store is None:
+            return 0
+        added = 0
+        for record in self.status_store.list():
+            usage = record.get('usage')
+            if record['status'] != 'done' or not usage:
+                continue
+            # A restore from the result cache says nothing about how long the tool takes
+            if "Restored from cache" in (record.get('output') or ''):
+                continue
+            entry = self.durations.get(record['task_id'])
+            if entry and entry['updated_at'] >= record['updated_at']:
+                continue
+            self.record(record['task_id'], usage['wall_time'], record['updated_at'])
+            added += 1
+        if added:
+            self.save()
+        return added
+
+    def record(self, task_id, duration, timestamp=None):
+        """Add one run of a task to its moving average"""
+        entry = self.durations.get(task_id)
+        if entry:
+            duration = SMOOTHING * duration + (1 - SMOOTHING) * entry['duration']
+        self.durations[task_id] = {
+            'duration': duration,
+            'runs': (entry['runs'] if entry else 0) + 1,
+            'updated_at': timestamp or time.time()
+        }
+
+    def estimate(self, task_ids):
+        """Get the expected duration of each task, the median of known ones standing in for the rest"""
+        known = [self.durations[task_id]['duration'] for task_id in task_ids if task_id in self.durations]
+        default = statistics.median(known) if known else DEFAULT_DURATION
+        return {
+            task_id: self.durations[task_id]['duration'] if task_id in self.durations else default
+            for task_id in task_ids
+        }
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import os
+import sys
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = {'luigi', 'paramiko', 'rich', 'yaml'}
+IMPORT_BUDGET_US = 150000  # Imports of `scan.py -l` on a compiled workflow cache hit, startup excluded
+
+def run_list(*options):
+    return subprocess.run(
+        [sys.executable, *options, 'scan.py', '-l'],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+
+def parse_importtime(stderr):
+    """Get (module, cumulative microseconds, nesting level) of each `-X importtime` line"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(cumulative), level))
+    return imports
+
+def test_list_skips_heavy_imports():
+    run_list()  # Fill the compiled workflow cache, so yaml isn't needed
+    imports = parse_importtime(run_list('-X', 'importtime').stderr)
+    assert imports
+
+    imported = {name.split('.')[0] for name, _, _ in imports}
+    assert not imported & HEAVY_MODULES
+
+    # Top-level lines are the only ones not already counted in a parent's cumulative time
+    total = sum(cumulative for _, cumulative, level in imports if level == 0)
+    assert total < IMPORT_BUDGET_US, f"scan.py -l imports took {total / 1000:.0f} ms"
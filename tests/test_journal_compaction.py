@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import status_store
+from status_store import JournalStatusStore, JOURNAL_SNAPSHOT
+
+WRITERS = [('node1', 0), ('node1', 1), ('node2.example.com', 2), ('node3', 3)]
+TASKS = 20
+ROUNDS = 15
+
+class FakeStorageManager:
+    def __init__(self, path):
+        self.path = path
+
+    def get_path(self, directory, filename=None):
+        path = os.path.join(self.path, directory)
+        return os.path.join(path, filename) if filename else path
+
+def shrink_limits():
+    # Small enough that segments rotate and compaction runs many times during the test
+    status_store.SEGMENT_BYTES = 4096
+    status_store.COMPACT_BYTES = 8192
+    status_store.SEAL_GRACE = 0.2
+
+def append(path, host, writer):
+    shrink_limits()
+    store = JournalStatusStore(FakeStorageManager(path))
+    store.host = host
+    for round_number in range(ROUNDS):
+        for task in range(TASKS):
+            task_id = f"w{writer}:t{task}"
+            store.set_status(task_id, 'running')
+            store.set_status(task_id, 'done', output=f"{round_number}")
+
+def compact(path, stop):
+    shrink_limits()
+    store = JournalStatusStore(FakeStorageManager(path))
+    while not stop.is_set():
+        store.refresh()
+        store.compact()
+        time.sleep(0.01)
+
+def test_compaction_round_trip_with_concurrent_appenders(tmp_path):
+    path = str(tmp_path)
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    compactor = context.Process(target=compact, args=(path, stop))
+    compactor.start()
+    writers = [context.Process(target=append, args=(path, host, writer)) for host, writer in WRITERS]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join()
+        assert process.exitcode == 0
+    # Let superseded segments age past the grace period, then compact them away
+    time.sleep(0.3)
+    stop.set()
+    compactor.join()
+    assert compactor.exitcode == 0
+
+    shrink_limits()
+    JournalStatusStore(FakeStorageManager(path)).compact()
+    journal_dir = os.path.join(path, 'tasks', 'journal')
+    assert os.path.exists(os.path.join(journal_dir, JOURNAL_SNAPSHOT))
+    # Every host keeps only its newest segment
+    segments = sorted(name for name in os.listdir(journal_dir) if name.endswith('.jsonl'))
+    assert len(segments) == len({host for host, _ in WRITERS})
+
+    # A fresh reader rebuilds every task from the snapshot and the remaining journal tail
+    records = JournalStatusStore(FakeStorageManager(path)).list()
+    assert len(records) == len(WRITERS) * TASKS
+    for record in records:
+        assert record['status'] == 'done'
+        assert record['output'] == f"{ROUNDS - 1}"
+        assert record['attempts'] == ROUNDS
+
+def test_order_ignores_clock_skew(tmp_path, monkeypatch):
+    storage_manager = FakeStorageManager(str(tmp_path))
+    fast, slow = JournalStatusStore(storage_manager), JournalStatusStore(storage_manager)
+    fast.host, slow.host = 'fast', 'slow'
+    now = time.time()
+    monkeypatch.setattr(status_store.time, 'time', lambda: now + 3600)
+    fast.set_status('m:t', 'running')
+    # The host whose clock is an hour behind finishes the task after seeing it run
+    monkeypatch.setattr(status_store.time, 'time', lambda: now)
+    assert slow.get_status('m:t') == 'running'
+    slow.set_status('m:t', 'done')
+
+    assert JournalStatusStore(storage_manager).get_status('m:t') == 'done'
+    assert fast.get_status('m:t') == 'done'
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import os
+import sys
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_TIMEOUT = 60
+
+STORAGE_CONFIG = """storage:
+  server:
+    path: "{path}"
+  client:
+    mount_point: "{path}"
+  directories: [results, temp, logs, tasks, cache, state]
+  status:
+    backend: journal
+    export_files: false
+"""
+
+# `c` tails `b`, which Luigi never runs when `a` fails
+BUILD = """
+import sys
+import luigi
+from loader import WorkflowLoader
+config = {'workflow': {'modules': [{'name': 'm', 'tasks': [
+    {'a': {'command': sys.argv[1]}},
+    {'b': {'command': 'echo hi', 'requires': ['a']}},
+    {'c': {'command': 'cat', 'requires': ['b'], 'stream': True}},
+]}]}}
+loader = WorkflowLoader(config, 'scan')
+print(luigi.build(loader.get_modules(), local_scheduler=True, workers=4))
+"""
+
+def build(tmp_path, command):
+    config_dir = tmp_path / 'config'
+    config_dir.mkdir(exist_ok=True)
+    (config_dir / 'storage.yaml').write_text(STORAGE_CONFIG.format(path=tmp_path / 'shared'))
+    for directory in ['results', 'temp', 'logs', 'tasks', 'cache', 'state']:
+        (tmp_path / 'shared' / directory).mkdir(parents=True, exist_ok=True)
+    process = subprocess.run(
+        [sys.executable, '-c', BUILD, command],
+        cwd=tmp_path, capture_output=True, text=True, timeout=BUILD_TIMEOUT,
+        env=dict(os.environ, PYTHONPATH=REPO_ROOT)
+    )
+    assert process.returncode == 0, process.stderr
+    return process.stdout.split()[-1] == 'True'
+
+def test_streamed_child_fails_with_failed_ancestor(tmp_path):
+    assert not build(tmp_path, 'false')
+
+def test_failure_from_previous_scan_is_retried(tmp_path):
+    assert not build(tmp_path, 'false')
+    assert build(tmp_path, 'sleep 1; true')
+    assert (tmp_path / 'shared' / 'results' / 'm:c.stdout').read_text() == 'hi\n'
@@ -1,5 +1,5 @@
 # app.py
-from flask import Flask, render_template, jsonify, request, Response, redirect, make_response
+from flask import Flask, render_template, jsonify, request, Response, redirect, make_response, stream_with_context
 from flask_cors import CORS
 import yaml
 import os
@@ -12,6 +12,7 @@ import json
 import sys
 from datetime import datetime
 import time
+from itertools import islice
 
 app = Flask(__name__)
 CORS(app)
@@ -24,10 +25,57 @@ WORKFLOWS_DIR = PROJECT_ROOT / "workflows"
 WORKFLOWS_DIR.mkdir(exist_ok=True)
 EXECUTIONS_DIR = PROJECT_ROOT / "results"
 
+# Framework modules live in the project root
+sys.path.insert(0, str(PROJECT_ROOT))
+from execution_catalog import ExecutionCatalog
+from event_stream import StatusEventBroker
+from result_viewer import ResultViewer
+from result_download import file_download, archive_download, get_compressions
+from storage_manager import StorageManager
+from metrics_store import get_metrics_store
+from status_store import summarize_usage, read_scan_usage
+from workflow_registry import WorkflowRegistry
+from hostset import HostSet, HOSTSET_SUFFIX, difference, key_host
+from asset_store import get_asset_store, get_spool_dir, is_ingest_host, SpoolIngester
+
+registry = WorkflowRegistry(WORKFLOWS_DIR)
+catalog = ExecutionCatalog(str(EXECUTIONS_DIR), str(WORKFLOWS_DIR), registry=registry)
+# The broker refreshes from its own thread, so it gets its own catalog connection
+event_broker = StatusEventBroker(catalog=ExecutionCatalog(str(EXECUTIONS_DIR), str(WORKFLOWS_DIR), registry=registry))
+result_viewer = ResultViewer()
+TASK_STATUSES = ['done', 'failed', 'running', 'pending']
+metrics_store = None
+asset_store = None
+asset_ingester = None
+
 # Store task status
 task_status = {}
 task_output = {}
 
+def get_metrics_store():
+    """Open the node metrics time series the monitor writes on this host's disk"""
+    global metrics_store
+    if metrics_store is None:
+        metrics_store = get_metrics_store(StorageManager(str(PROJECT_ROOT / "config" / "storage.yaml")))
+    return metrics_store
+
+def get_assets():
+    """Open the cross-scan asset store on this host's disk, ingesting the spool if this is the ingest host"""
+    global asset_store
+    if asset_store is None:
+        storage_manager = StorageManager(str(PROJECT_ROOT / "config" / "storage.yaml"))
+        asset_store = get_asset_store(storage_manager)
+        start_asset_ingester(storage_manager)
+    return asset_store
+
+def start_asset_ingester(storage_manager):
+    """Keep draining what scans on any host queue for the store, with its own connection"""
+    global asset_ingester
+    if asset_ingester is None and is_ingest_host(storage_manager):
+        asset_ingester = SpoolIngester(get_asset_store(storage_manager), get_spool_dir(storage_manager))
+        asset_ingester.drain()
+        asset_ingester.start()
+
 logging.debug(f"Project root: {PROJECT_ROOT.absolute()}")
 logging.debug(f"Workflows directory: {WORKFLOWS_DIR.absolute()}")
 
@@ -86,7 +134,7 @@ def format_timestamp(timestamp):
 def index():
     """Serve the dashboard page"""
     stats = {
-        'total_workflows': len(list(WORKFLOWS_DIR.glob('*'))),
+        'total_workflows': len(registry.list_workflows()),
         'total_executions': 0,
         'running_executions': 0,
         'failed_executions': 0,
@@ -94,18 +142,26 @@ def index():
     
     # Get execution statistics
     try:
-        executions = get_executions()
-        stats['total_executions'] = len(executions)
-        stats['running_executions'] = len([e for e in executions if e['status'].lower() == 'running'])
-        stats['failed_executions'] = len([e for e in executions if e['status'].lower() == 'failed'])
+        catalog.refresh()
+        catalog_stats = catalog.get_stats()
+        stats['total_executions'] = catalog_stats['executions']
+        stats['running_executions'] = catalog_stats['running_executions']
+        stats['failed_executions'] = catalog_stats['failed_executions']
         
         # Get only the 5 most recent executions
-        recent_executions = executions[:5]
+        recent_executions = query_executions(limit=5)
     except Exception as e:
         logging.error(f"Error getting execution stats: {e}")
         recent_executions = []
     
-    return render_template('dashboard.html', stats=stats, recent_executions=recent_executions)
+    try:
+        node_metrics = get_metrics_store().latest()
+    except Exception as e:
+        logging.error(f"Error getting node metrics: {e}")
+        node_metrics = []
+    
+    return render_template('dashboard.html', stats=stats, recent_executions=recent_executions,
+                           node_metrics=node_metrics)
 
 @app.route('/editor')
 def editor():
@@ -113,27 +169,19 @@ def editor():
     workflow_name = request.args.get('workflow')
     return render_template('editor.html', workflow_name=workflow_name)
 
+def get_compiled_workflows():
+    """Get the name and config of every workflow that compiles"""
+    compiled, errors = registry.get_all()
+    for name, error in errors.items():
+        logging.error(f"Error loading workflow {name}: {error}")
+    return [{'name': name, 'config': workflow['config']} for name, workflow in compiled.items()]
+
 @app.route('/workflows')
 def workflows():
     """Serve the workflows listing page"""
     workflows = []
     try:
-        WORKFLOWS_DIR.mkdir(exist_ok=True)
-        # Scan through all subdirectories in WORKFLOWS_DIR
-        for workflow_dir in WORKFLOWS_DIR.iterdir():
-            if workflow_dir.is_dir():
-                # Look for workflow config files in each directory
-                for config_file in workflow_dir.glob("*.yaml"):
-                    try:
-                        with open(config_file) as f:
-                            config = yaml.safe_load(f)
-                            workflows.append({
-                                'name': workflow_dir.name,
-                                'config': config
-                            })
-                    except Exception as e:
-                        logging.error(f"Error loading {config_file}: {e}")
-                        continue
+        workflows = get_compiled_workflows()
     except Exception as e:
         logging.error(f"Error listing workflows: {e}")
 
@@ -142,31 +190,8 @@ def workflows():
 @app.route('/api/workflows', methods=['GET'])
 def list_workflows():
     """List all available workflows"""
-    workflows = []
     try:
-        WORKFLOWS_DIR.mkdir(exist_ok=True)
-        logging.debug(f"Scanning directory: {WORKFLOWS_DIR.absolute()}")
-        
-        # Scan through all subdirectories in WORKFLOWS_DIR
-        for workflow_dir in WORKFLOWS_DIR.iterdir():
-            if workflow_dir.is_dir():
-                logging.debug(f"Found workflow directory: {workflow_dir}")
-                # Look for workflow config files in each directory
-                for config_file in workflow_dir.glob("*.yaml"):
-                    try:
-                        logging.debug(f"Found config file: {config_file}")
-                        with open(config_file) as f:
-                            config = yaml.safe_load(f)
-                            workflows.append({
-                                'name': workflow_dir.name,
-                                'config': config
-                            })
-                            logging.debug(f"Successfully loaded workflow: {workflow_dir.name}")
-                    except Exception as e:
-                        logging.error(f"Error loading {config_file}: {e}")
-                        continue
-        
-        return jsonify(workflows)
+        return jsonify(get_compiled_workflows())
     except Exception as e:
         logging.error(f"Error listing workflows: {e}")
         return jsonify({'error': str(e)}), 500
@@ -174,91 +199,43 @@ def list_workflows():
 @app.route('/api/workflow/<name>', methods=['GET'])
 def get_workflow(name):
     """Get a specific workflow configuration"""
-    workflow_dir = WORKFLOWS_DIR / name
-    logging.debug(f"Looking for workflow in directory: {workflow_dir}")
-    
-    if workflow_dir.exists() and workflow_dir.is_dir():
-        try:
-            config_files = list(workflow_dir.glob("*.yaml"))
-            if not config_files:
-                logging.error(f"No config files found in {workflow_dir}")
-                return jsonify({'error': 'No configuration file found'}), 404
-                
-            config_file = config_files[0]
-            logging.debug(f"Using config file: {config_file}")
-            
-            with open(config_file) as f:
-                # Store the original YAML string
-                yaml_str = f.read()
-                # Parse the YAML for the config
-                config = yaml.safe_load(yaml_str)
-                
-                # Ensure requires is an array in all tasks
-                if 'config' in config and 'workflow' in config['config'] and 'modules' in config['config']['workflow']:
-                    for module in config['config']['workflow']['modules']:
-                        if 'tasks' in module:
-                            for task_obj in module['tasks']:
-                                for task_name, task_config in task_obj.items():
-                                    if 'requires' in task_config:
-                                        task_config['requires'] = (
-                                            task_config['requires'] 
-                                            if isinstance(task_config['requires'], list) 
-                                            else [task_config['requires']]
-                                        )
-                
-                return jsonify({
-                    'name': name, 
-                    'config': config,
-                    'yaml': yaml_str
-                })
-        except Exception as e:
-            logging.error(f"Error loading workflow {name}: {e}")
-            return jsonify({'error': str(e)}), 400
-    
-    return jsonify({'error': 'Workflow not found'}), 404
+    if not registry.exists(name):
+        return jsonify({'error': 'Workflow not found'}), 404
+    try:
+        workflow = registry.get(name)
+        return jsonify({
+            'name': name,
+            'config': workflow['config'],
+            'yaml': workflow['yaml']
+        })
+    except Exception as e:
+        logging.error(f"Error loading workflow {name}: {e}")
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/workflow/diagram/<name>', methods=['GET'])
 def get_workflow_diagram(name):
     """Get workflow as Mermaid diagram"""
-    workflow_dir = WORKFLOWS_DIR / name
-    if workflow_dir.exists() and workflow_dir.is_dir():
-        try:
-            config_files = list(workflow_dir.glob("*.yaml"))
-            if not config_files:
-                return jsonify({'error': 'No configuration file found'}), 404
-                
-            config_file = config_files[0]
-            with open(config_file) as f:
-                config = yaml.safe_load(f)
-                
-                # Generate Mermaid diagram
-                mermaid_code = "flowchart TD\n"
-                
-                # Handle the tasks
-                tasks = config.get('tasks', [])
-                for task in tasks:
-                    if isinstance(task, dict):
-                        for task_name, task_config in task.items():
-                            # Add node
-                            safe_name = task_name.replace(' ', '_').replace('-', '_')
-                            mermaid_code += f'    {safe_name}["{task_name}"]\n'
-                            
-                            # Add edges from requirements
-                            if 'requires' in task_config:
-                                for req in task_config['requires']:
-                                    safe_req = req.replace(' ', '_').replace('-', '_')
-                                    mermaid_code += f'    {safe_req} --> {safe_name}\n'
-                
-                # Add styling
-                mermaid_code += '\n    classDef default fill:#f9f9f9,stroke:#333,stroke-width:1px;\n'
-                
-                return jsonify({'diagram': mermaid_code})
-                
-        except Exception as e:
-            logging.error(f"Error generating diagram for {name}: {e}")
-            return jsonify({'error': str(e)}), 400
-            
-    return jsonify({'error': 'Workflow not found'}), 404
+    if not registry.exists(name):
+        return jsonify({'error': 'Workflow not found'}), 404
+    try:
+        workflow = registry.get(name)
+        safe_name = lambda task_id: task_id.replace(' ', '_').replace('-', '_').replace(':', '__')
+        
+        # Generate Mermaid diagram
+        mermaid_code = "flowchart TD\n"
+        for task_id in workflow['order']:
+            mermaid_code += f'    {safe_name(task_id)}["{task_id}"]\n'
+            # Add edges from the resolved requirements
+            for dep_id in workflow['tasks'][task_id]['requires']:
+                mermaid_code += f'    {safe_name(dep_id)} --> {safe_name(task_id)}\n'
+        
+        # Add styling
+        mermaid_code += '\n    classDef default fill:#f9f9f9,stroke:#333,stroke-width:1px;\n'
+        
+        return jsonify({'diagram': mermaid_code})
+    except Exception as e:
+        logging.error(f"Error generating diagram for {name}: {e}")
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/workflow/<name>', methods=['POST'])
 def save_workflow(name):
@@ -421,20 +398,12 @@ def edit_workflow(name):
 def view_workflow(name):
     """Serve the workflow view/run page for a specific workflow"""
     try:
-        workflow_dir = WORKFLOWS_DIR / name.lower()
-        if not workflow_dir.exists():
-            return redirect('/')
-            
-        # Get workflow configuration
-        config_files = list(workflow_dir.glob("*.yaml"))
-        if not config_files:
+        if not registry.exists(name.lower()):
             return redirect('/')
             
-        config_file = config_files[0]
-        with open(config_file) as f:
-            # Parse and re-dump the YAML to ensure proper formatting
-            config = yaml.safe_load(f)
-            yaml_str = yaml.dump(config, default_flow_style=False, sort_keys=False)
+        # Re-dump the parsed YAML to ensure proper formatting
+        config = registry.get(name.lower())['config']
+        yaml_str = yaml.dump(config, default_flow_style=False, sort_keys=False)
             
         return render_template('workflow_view.html',
                              workflow_name=name,
@@ -448,88 +417,106 @@ def view_workflow(name):
 def executions():
     """Serve the executions page"""
     try:
-        executions_list = get_executions()
-        # Get unique workflow names for the filter
-        workflows = list(set(e['workflow_name'] for e in executions_list if e.get('workflow_name')))
+        catalog.refresh()
+        executions_list = query_executions(limit=4)
+        # Get workflow names for the filter
+        workflows = catalog.list_workflows()
     except Exception as e:
         logging.error(f"Error getting executions: {e}")
         executions_list = []
         workflows = []
     
     return render_template('executions.html', executions=executions_list, workflows=workflows)
+def format_execution(execution):
+    """Shape a catalog row the way the templates expect"""
+    return {
+        'id': execution['scan_id'],
+        'status': 'completed' if execution['status'] == 'done' else execution['status'],
+        'timestamp': execution['scan_id'].replace('scan_', ''),
+        'workflow': execution['workflow'],
+        'task_count': execution['total_tasks'] or 0
+    }
+
+def query_executions(limit=-1, offset=0, **filters):
+    """Get formatted executions from the catalog, newest first"""
+    rows = catalog.list_executions(limit=limit, offset=offset, **filters)
+    return [format_execution(row) for row in rows]
+
 @app.route('/api/executions')
 def get_executions():
-    """Helper function to get executions with proper formatting"""
-    executions = []
+    """List executions from the catalog, filtered and paged by the query string"""
     try:
-        EXECUTIONS_DIR.mkdir(exist_ok=True)
-        for workflow_dir in EXECUTIONS_DIR.iterdir():
-            if workflow_dir.is_dir():
-                # Get workflow configuration to count tasks
-                workflow_name = workflow_dir.name
-                workflow_config_file = WORKFLOWS_DIR / workflow_name / "workflow_config.yaml"
-                task_count = 0
-                
-                if workflow_config_file.exists():
-                    try:
-                        with open(workflow_config_file) as f:
-                            config = yaml.safe_load(f)
-                            # Count tasks from all modules
-                            if 'workflow' in config and 'modules' in config['workflow']:
-                                for module in config['workflow']['modules']:
-                                    if 'tasks' in module:
-                                        task_count += len(module['tasks'])
-                    except Exception as e:
-                        logging.error(f"Error reading workflow config {workflow_config_file}: {e}")
-                
-                for scan_dir in workflow_dir.iterdir():
-                    if scan_dir.is_dir():
-                        try:
-                            # Parse the timestamp from directory name
-                            scan_id = scan_dir.name
-                            timestamp = scan_id.replace('scan_', '')
-                            
-                            # Determine status from task files
-                            task_files = [f for f in os.listdir(scan_dir) if ':' in f]
-                            status = 'pending'
-                            if any(f.endswith('.running') for f in task_files):
-                                status = 'running'
-                            elif any(f.endswith('.failed') for f in task_files):
-                                status = 'failed'
-                            elif task_files and all(f.endswith('.done') for f in task_files):
-                                status = 'completed'
-                            
-                            executions.append({
-                                'id': scan_id,
-                                'status': status,
-                                'timestamp': timestamp,
-                                'workflow': workflow_name,
-                                'task_count': task_count
-                            })
-                        except Exception as e:
-                            logging.error(f"Error processing execution {scan_dir}: {e}")
-                            continue
-        
-        # Sort executions by timestamp (newest first)
-        executions.sort(key=lambda x: x['timestamp'], reverse=True)
+        catalog.refresh()
+        status = request.args.get('status') or None
+        filters = {
+            'workflow': request.args.get('workflow') or None,
+            'status': 'done' if status == 'completed' else status,
+            'search': request.args.get('search') or None,
+            'since': request.args.get('since') or None,
+            'until': request.args.get('until') or None
+        }
+        executions = query_executions(
+            request.args.get('limit', -1, type=int),
+            request.args.get('offset', 0, type=int),
+            **filters
+        )
+        total = catalog.count_executions(**filters)
     except Exception as e:
         logging.error(f"Error listing executions: {e}")
+        executions, total = [], 0
     
-    return executions
+    response = jsonify(executions)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+@app.route('/api/events')
+def execution_events():
+    """Push task and execution status changes to the browser as Server-Sent Events"""
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    stream = event_broker.stream(cursor, request.args.get('workflow'), request.args.get('scan_id'))
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/nodes/metrics')
+def get_latest_node_metrics():
+    """Get the most recent metrics sample of every node"""
+    try:
+        return jsonify(get_metrics_store().latest())
+    except Exception as e:
+        logging.error(f"Error getting node metrics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/nodes/<node>/metrics')
+def get_node_metrics(node):
+    """Get one metric of a node over a time range, e.g. ?metric=cpu_usage&hours=6"""
+    try:
+        end = request.args.get('end', time.time(), type=float)
+        start = request.args.get('start', end - request.args.get('hours', 6, type=float) * 3600, type=float)
+        return jsonify(get_metrics_store().query(
+            node,
+            request.args.get('metric', 'cpu_usage'),
+            start,
+            end,
+            request.args.get('resolution', type=int)
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error getting metrics of node {node}: {e}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/workflow/<workflow_name>/execution/<scan_id>')
 def view_execution(workflow_name, scan_id):
     try:
         # Get workflow configuration
-        workflow_file = os.path.join(WORKFLOWS_DIR, f"{workflow_name}/workflow_config.yaml")
-        print(workflow_file)
-        if not os.path.exists(workflow_file):
+        if not registry.exists(workflow_name):
             return "Workflow not found", 404
-
-        # Read raw YAML content
-        with open(workflow_file, 'r') as f:
-            yaml_content = f.read()
-            workflow_config = yaml.safe_load(yaml_content)
+        workflow = registry.get(workflow_name)
+        yaml_content = workflow['yaml']
+        workflow_config = workflow['config']
 
         # Get execution directory
         execution_dir = os.path.join(EXECUTIONS_DIR, workflow_name, scan_id)
@@ -569,33 +556,22 @@ def view_execution(workflow_name, scan_id):
         node_id = 1
         node_map = {}  # Map task names to node IDs
 
-        # Create nodes for each task in the workflow
-        if 'workflow' in workflow_config and 'modules' in workflow_config['workflow']:
-            for module in workflow_config['workflow']['modules']:
-                if 'tasks' in module:
-                    for task_dict in module['tasks']:
-                        task_name = list(task_dict.keys())[0]
-                        task_id = f"{module['name']}:{task_name}"
-                        
-                        # Create node
-                        node_map[task_id] = node_id
-                        nodes.append({
-                            "id": node_id,
-                            "label": task_id,
-                            "status": task_map.get(task_id, "pending")
-                        })
-                        node_id += 1
-
-                        # Create edges based on dependencies
-                        task_config = task_dict[task_name]
-                        if 'requires' in task_config:
-                            for req in task_config['requires']:
-                                req_id = f"{module['name']}:{req}"
-                                if req_id in node_map:
-                                    edges.append({
-                                        "from": node_map[req_id],
-                                        "to": node_map[task_id]
-                                    })
+        # Create nodes for each task in the workflow, dependencies first
+        for task_id in workflow['order']:
+            node_map[task_id] = node_id
+            nodes.append({
+                "id": node_id,
+                "label": task_id,
+                "status": task_map.get(task_id, "pending")
+            })
+            node_id += 1
+
+            # Create edges based on the resolved dependencies
+            for req_id in workflow['tasks'][task_id]['requires']:
+                edges.append({
+                    "from": node_map[req_id],
+                    "to": node_map[task_id]
+                })
 
         workflow_data = {
             "nodes": nodes,
@@ -615,6 +591,36 @@ def view_execution(workflow_name, scan_id):
         app.logger.error(f"Error viewing execution: {str(e)}")
         return str(e), 500
 
+@app.route('/api/assets/<name>')
+def get_asset(name):
+    """Get the ports, addresses, URLs, TLS names and scans of a hostname or IP"""
+    try:
+        asset = get_assets().lookup(name, limit=min(request.args.get('limit', 100, type=int), 10000))
+        if asset is None:
+            return jsonify({"error": "Asset not found"}), 404
+        return jsonify(asset)
+    except Exception as e:
+        app.logger.error(f"Error looking up asset: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/assets')
+def search_assets():
+    """Page through known hosts within `domain` and/or first seen since `since` (epoch seconds)"""
+    try:
+        start = max(request.args.get('start', 0, type=int), 0)
+        count = min(max(request.args.get('count', 100, type=int), 0), 10000)
+        hosts = get_assets().search(
+            domain=request.args.get('domain'),
+            since=request.args.get('since', type=float),
+            kind=request.args.get('kind'),
+            start=start,
+            count=count
+        )
+        return jsonify({'hosts': hosts, 'start': start})
+    except Exception as e:
+        app.logger.error(f"Error searching assets: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/workflow/<workflow_name>/execution/<scan_id>/details')
 def get_execution_details(workflow_name, scan_id):
     try:
@@ -624,16 +630,10 @@ def get_execution_details(workflow_name, scan_id):
 
         tasks = []
         for task_file in os.listdir(execution_dir):
-            task_name = task_file.rsplit('.', 1)[0]
-            # Determine task status
-            status = "pending"
-            if task_file.endswith('.running'):
-                status = "running"
-            elif task_file.endswith('.failed'):
-                status = "failed"
-            elif task_file.endswith('.done'):
-                status = "done"
-
+            task_name, _, status = task_file.rpartition('.')
+            # Skip host sets and other artifacts kept next to the status files
+            if status not in TASK_STATUSES:
+                continue
 
             if ":" in task_name:
                 tasks.append({
@@ -641,6 +641,17 @@ def get_execution_details(workflow_name, scan_id):
                 "status": status,
             })
 
+        # Resource usage of each task's run in this scan, and totals per node
+        records = []
+        try:
+            usage = read_scan_usage(execution_dir)
+            for task in tasks:
+                task["usage"] = usage.get(task["name"])
+                if task["usage"]:
+                    records.append({"usage": task["usage"]})
+        except Exception as e:
+            app.logger.error(f"Error getting task usage: {str(e)}")
+
         # Get overall status
         status = "pending"
         if any(t["status"] == "running" for t in tasks):
@@ -652,7 +663,8 @@ def get_execution_details(workflow_name, scan_id):
 
         return jsonify({
             "status": status,
-            "tasks": tasks
+            "tasks": tasks,
+            "nodes": summarize_usage(records)
         })
 
     except Exception as e:
@@ -723,28 +735,21 @@ def view_execution_results(workflow_name, scan_id):
         if not os.path.exists(execution_dir):
             return jsonify({"error": "Execution not found"}), 404
 
-        task_results = []
+        statuses = {}
         for task_file in os.listdir(execution_dir):
-            if not any(task_file.endswith(ext) for ext in ['.done', '.failed', '.running', '.pending']):
-                continue
-                
-            task_name = task_file.rsplit('.', 1)[0]
-            status = task_file.rsplit('.', 1)[1]
-            
-            # Read file content if it's done or failed
-            content = ""
-            if status in ['done', 'failed']:
-                try:
-                    with open(os.path.join(execution_dir, task_file), 'r') as f:
-                        content = f.read()
-                except Exception as e:
-                    content = f"Error reading file: {str(e)}"
-            
+            task_name, _, status = task_file.rpartition('.')
+            if status in TASK_STATUSES:
+                statuses[os.path.join(execution_dir, task_file)] = (task_name, status)
+        
+        # Only sizes and line counts; the page fetches contents one range at a time
+        task_results = []
+        for summary in result_viewer.summarize(sorted(statuses)):
+            task_name, status = statuses[summary['path']]
             task_results.append({
                 "name": task_name,
                 "status": status,
-                "content": content,
-                "size": os.path.getsize(os.path.join(execution_dir, task_file))
+                "size": summary['size'],
+                "lines": summary['lines']
             })
         
         return render_template('execution_results.html',
@@ -758,106 +763,139 @@ def view_execution_results(workflow_name, scan_id):
 
 @app.route('/workflow/<workflow_name>/execution/<scan_id>/<task_name>')
 def view_task_result(workflow_name, scan_id, task_name):
-    """View result for a specific task"""
+    """View result for a specific task on the paged results page"""
+    task_file, _ = get_task_file(workflow_name, scan_id, task_name)
+    if not task_file:
+        return jsonify({"error": "Task not found"}), 404
+    return redirect(f"/workflow/{workflow_name}/execution/{scan_id}/results?task={task_name}")
+
+def get_task_file(workflow_name, scan_id, task_name):
+    """Find a task's result file in an execution directory, with its status"""
+    if any(os.sep in name or name.startswith('.') for name in [workflow_name, scan_id, task_name]):
+        return None, None
+    execution_dir = os.path.join(EXECUTIONS_DIR, workflow_name, scan_id)
+    for status in TASK_STATUSES:
+        task_file = os.path.join(execution_dir, f"{task_name}.{status}")
+        if os.path.exists(task_file):
+            return task_file, status
+    return None, None
+
+@app.route('/api/workflow/<workflow_name>/execution/<scan_id>/<task_name>/<any(lines, bytes, head, tail, count):view>')
+def read_task_result(workflow_name, scan_id, task_name, view):
+    """Read one range of a task result by lines or bytes, its head or tail, or its line count"""
     try:
-        execution_dir = os.path.join(EXECUTIONS_DIR, workflow_name, scan_id)
-        if not os.path.exists(execution_dir):
-            return jsonify({"error": "Execution not found"}), 404
-            
-        # Find the task file with any status extension
-        task_file = None
-        task_status = None
-        for ext in ['.done', '.failed', '.running', '.pending']:
-            potential_file = f"{task_name}{ext}"
-            if os.path.exists(os.path.join(execution_dir, potential_file)):
-                task_file = potential_file
-                task_status = ext[1:]  # Remove the dot
-                break
-                
+        task_file, status = get_task_file(workflow_name, scan_id, task_name)
         if not task_file:
             return jsonify({"error": "Task not found"}), 404
-            
-        # Read file content if it's done or failed
-        content = ""
-        if task_status in ['done', 'failed']:
-            try:
-                with open(os.path.join(execution_dir, task_file), 'r') as f:
-                    content = f.read()
-            except Exception as e:
-                content = f"Error reading file: {str(e)}"
-                
-        file_size = os.path.getsize(os.path.join(execution_dir, task_file))
-        
-        return render_template('task_result.html',
-                             workflow_name=workflow_name,
-                             scan_id=scan_id,
-                             task_name=task_name,
-                             status=task_status,
-                             content=content,
-                             file_size=file_size)
-                             
-    except Exception as e:
-        app.logger.error(f"Error viewing task result: {str(e)}")
-        return str(e), 500
 
-def get_task_result(workflow_name, scan_id, task_name):
-    """Get the result of a specific task from a workflow execution."""
-    try:
-        # Get the workflow execution directory
-        execution_dir = os.path.join(EXECUTIONS_DIR, workflow_name, scan_id)
-        if not os.path.exists(execution_dir):
-            return None
+        if view == 'lines':
+            result = result_viewer.read_lines(
+                task_file, request.args.get('start', 0, type=int), request.args.get('count', 100, type=int)
+            )
+        elif view == 'bytes':
+            result = result_viewer.read_bytes(
+                task_file, request.args.get('offset', 0, type=int), request.args.get('length', 65536, type=int)
+            )
+        elif view in ['head', 'tail']:
+            read = result_viewer.head if view == 'head' else result_viewer.tail
+            result = {'lines': read(task_file, request.args.get('count', 100, type=int))}
+        else:
+            result = {'lines': result_viewer.count_lines(task_file), 'size': os.path.getsize(task_file)}
+        result['status'] = status
+        return jsonify(result)
 
-        # Find the task file with any status extension
-        task_file = None
-        for ext in ['.done', '.failed', '.running', '.pending']:
-            potential_file = f"{task_name}{ext}"
-            if os.path.exists(os.path.join(execution_dir, potential_file)):
-                task_file = potential_file
-                break
+    except Exception as e:
+        app.logger.error(f"Error reading task result: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-        if not task_file:
-            return None
+def get_hostset_file(workflow_name, scan_id, task_name):
+    """Find the host set a task built in an execution directory"""
+    if any(os.sep in name or name.startswith('.') for name in [workflow_name, scan_id, task_name]):
+        return None
+    hostset_file = os.path.join(EXECUTIONS_DIR, workflow_name, scan_id, f"{task_name}{HOSTSET_SUFFIX}")
+    return hostset_file if os.path.exists(hostset_file) else None
+
+@app.route('/api/workflow/<workflow_name>/execution/<scan_id>/<task_name>/hosts')
+def query_task_hosts(workflow_name, scan_id, task_name):
+    """Get the size of a task's host set and whether the `host` arguments are in it"""
+    try:
+        hostset_file = get_hostset_file(workflow_name, scan_id, task_name)
+        if not hostset_file:
+            return jsonify({"error": "Host set not found"}), 404
 
-        # Get file path
-        file_path = os.path.join(execution_dir, task_file)
+        with HostSet(hostset_file) as hosts:
+            result = {'count': len(hosts)}
+            queried = request.args.getlist('host')
+            if queried:
+                result['known'] = {host: host in hosts for host in queried}
+        return jsonify(result)
 
-        # Read the task content if it's done or failed
-        content = ""
-        if task_file.endswith(('.done', '.failed')):
-            with open(file_path, 'r') as f:
-                content = f.read()
+    except Exception as e:
+        app.logger.error(f"Error querying host set: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-        # Get file size
-        size = os.path.getsize(file_path)
+@app.route('/api/workflow/<workflow_name>/execution/<scan_id>/<task_name>/hosts/new')
+def new_task_hosts(workflow_name, scan_id, task_name):
+    """Page through the hosts a task found that it hadn't found in the scan given by `since`"""
+    try:
+        hostset_file = get_hostset_file(workflow_name, scan_id, task_name)
+        previous_file = get_hostset_file(workflow_name, request.args.get('since', ''), task_name)
+        if not hostset_file or not previous_file:
+            return jsonify({"error": "Host set not found"}), 404
+
+        start = max(request.args.get('start', 0, type=int), 0)
+        count = min(max(request.args.get('count', 100, type=int), 0), 10000)
+        with HostSet(hostset_file) as hosts, HostSet(previous_file) as previous:
+            new_hosts = (key_host(key).decode(errors='replace') for key in difference(hosts, previous))
+            page = list(islice(new_hosts, start, start + count + 1))
+        return jsonify({'hosts': page[:count], 'start': start, 'more': len(page) > count})
 
-        return {
-            'content': content,
-            'size': size
-        }
     except Exception as e:
-        print(f"Error getting task result: {str(e)}")
-        return None
+        app.logger.error(f"Error diffing host sets: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/workflow/<workflow_name>/execution/<scan_id>/<path:task_name>/download')
 def download_task_result(workflow_name, scan_id, task_name):
+    """Stream a task result file, honouring Range and Accept-Encoding"""
     try:
-        # Get task result
-        task_result = get_task_result(workflow_name, scan_id, task_name)
-        if not task_result:
+        task_file, _ = get_task_file(workflow_name, scan_id, task_name)
+        if not task_file:
             return "Task result not found", 404
 
-        # Create a response with the content
-        response = make_response(task_result['content'])
-        
-        # Set headers for file download
-        response.headers['Content-Type'] = 'text/plain'
-        response.headers['Content-Disposition'] = f'attachment; filename={task_name.replace(":", "_")}_result.txt'
-        
-        return response
+        status, headers, body = file_download(
+            task_file,
+            range_header=request.headers.get('Range'),
+            accept_encoding=request.headers.get('Accept-Encoding')
+        )
+        headers['Content-Type'] = 'text/plain'
+        headers['Content-Disposition'] = f'attachment; filename={task_name.replace(":", "_")}_result.txt'
+        return Response(body, status=status, headers=headers, direct_passthrough=True)
     except Exception as e:
-        print(f"Error in download_task_result: {str(e)}")
+        app.logger.error(f"Error downloading task result: {str(e)}")
         return f"Error downloading task result: {str(e)}", 500
 
+@app.route('/workflow/<workflow_name>/execution/<scan_id>/download')
+def download_execution(workflow_name, scan_id):
+    """Stream a whole execution directory as a compressed tar archive"""
+    try:
+        if any(os.sep in name or name.startswith('.') for name in [workflow_name, scan_id]):
+            return "Execution not found", 404
+        execution_dir = os.path.join(EXECUTIONS_DIR, workflow_name, scan_id)
+        if not os.path.isdir(execution_dir):
+            return "Execution not found", 404
+
+        compression = request.args.get('compression', 'gzip')
+        if compression not in ['gzip', 'zstd', 'none']:
+            return f"Unsupported compression: {compression}", 400
+        if compression != 'none' and compression not in get_compressions():
+            # Known, but this host lacks the codec; found out before any of the archive is sent
+            return f"Compression {compression} is not available on this server", 406
+        status, headers, body = archive_download(execution_dir, None if compression == 'none' else compression)
+        return Response(body, status=status, headers=headers, direct_passthrough=True)
+    except Exception as e:
+        app.logger.error(f"Error downloading execution: {str(e)}")
+        return f"Error downloading execution: {str(e)}", 500
+
 if __name__ == '__main__':
+    get_assets()  # Start ingesting queued assets before the first asset query
     app.run(debug=True,host='0.0.0.0',port=5001)
\ No newline at end of file
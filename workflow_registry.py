@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import os
+import re
+import pickle
+from collections import deque
+import hashlib
+import threading
+from builtin_tasks import BUILTINS
+
+CONFIG_FILE = "workflow_config.yaml"
+CACHE_DIR = ".compiled"  # Inside the workflows directory
+COMPILER_VERSION = 3  # Bump when the compiled form changes
+PLACEHOLDER = re.compile(r'{([^}]+)}')
+
+def resolve_dependency(module_name, dep):
+    """Resolve a `requires` entry to a full task ID"""
+    if ':' in dep:  # Cross-module reference
+        dep_module, dep_task = dep.split(':')
+        return f"{dep_module}:{dep_task}"
+    return f"{module_name}:{dep}"  # Same module reference
+
+def topological_order(tasks):
+    """Order task IDs so every task comes after its dependencies, keeping declaration order otherwise"""
+    remaining = {task_id: len(task['requires']) for task_id, task in tasks.items()}
+    children = {task_id: [] for task_id in tasks}
+    for task_id, task in tasks.items():
+        for dep_id in task['requires']:
+            children[dep_id].append(task_id)
+
+    ready = deque(task_id for task_id, count in remaining.items() if count == 0)
+    order = []
+    while ready:
+        task_id = ready.popleft()
+        order.append(task_id)
+        for child in children[task_id]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+
+    if len(order) != len(tasks):
+        cycle = [task_id for task_id in tasks if remaining[task_id] > 0]
+        raise ValueError(f"Dependency cycle between tasks: {', '.join(cycle)}")
+    return order
+
+def validate_task(task_id, task_config, requires):
+    """Check the options of a task that constrain its dependencies"""
+    if task_config.get('assets', False) not in (False, True, 'tls'):
+        raise ValueError(f"Task '{task_id}' has invalid assets option '{task_config['assets']}', expected true or tls")
+    if 'builtin' in task_config:
+        name = task_config['builtin']
+        if name not in BUILTINS:
+            raise ValueError(f"Task '{task_id}' uses unknown builtin '{name}', expected one of: {', '.join(BUILTINS)}")
+        if 'command' in task_config:
+            raise ValueError(f"Task '{task_id}' can't have both a command and a builtin")
+        if any(task_config.get(option) for option in ('stream', 'incremental', 'shard')):
+            raise ValueError(f"Builtin task '{task_id}' can't be streamed, incremental or sharded")
+        if len(requires) + len(task_config.get('inputs', [])) < BUILTINS[name][1]:
+            raise ValueError(f"Builtin task '{task_id}' needs at least {BUILTINS[name][1]} inputs")
+        return
+    if 'command' not in task_config:
+        raise ValueError(f"Task '{task_id}' has no command")
+    if task_config.get('stream', False) and len(requires) != 1:
+        raise ValueError(f"Streamed task '{task_id}' must require exactly one task")
+    if task_config.get('incremental', False):
+        if task_config.get('stream', False):
+            raise ValueError(f"Task '{task_id}' can't be both streamed and incremental")
+        if len(requires) != 1:
+            raise ValueError(f"Incremental task '{task_id}' must require exactly one task")
+    if 'shard' in task_config:
+        if task_config.get('stream', False) or task_config.get('incremental', False):
+            raise ValueError(f"Sharded task '{task_id}' can't be streamed or incremental")
+        if not task_config['shard'].get('input') and len(requires) != 1:
+            raise ValueError(f"Task '{task_id}' shards its parent's output and must require exactly one task")
+
+def get_placeholders(task_config):
+    """Get the placeholder names in a task's command and `inputs`, and in the scope of a builtin"""
+    templates = [task_config.get('command', '')] + [str(value) for value in task_config.get('inputs', [])]
+    if 'builtin' in task_config:
+        templates += [str(value) for option in ('scope', 'exclude') for value in task_config.get(option, [])]
+    return list(dict.fromkeys(name for template in templates for name in PLACEHOLDER.findall(template)))
+
+def compile_workflow(config):
+    """Validate a workflow config and resolve it into a DAG with a topological order"""
+    if not config or 'workflow' not in config:
+        raise ValueError("No 'workflow' section found in configuration")
+    workflow = config['workflow']
+    if 'modules' not in workflow:
+        raise ValueError("No 'modules' section found in workflow configuration")
+
+    modules = []
+    tasks = {}
+    for module_config in workflow['modules']:
+        module_name = module_config['name']
+        module = {'name': module_name, 'config': module_config, 'tasks': []}
+        for task_dict in module_config.get('tasks') or []:
+            task_name = list(task_dict.keys())[0]
+            task_config = task_dict[task_name] or {}
+            task_id = f"{module_name}:{task_name}"
+            if task_id in tasks:
+                raise ValueError(f"Duplicate task '{task_id}'")
+            requires = task_config.get('requires', [])
+            if isinstance(requires, str):
+                requires = [requires]
+            tasks[task_id] = {
+                'module': module_name,
+                'name': task_name,
+                'config': task_config,
+                'requires': [resolve_dependency(module_name, dep) for dep in requires],
+                'placeholders': get_placeholders(task_config)
+            }
+            module['tasks'].append(task_id)
+        modules.append(module)
+
+    for task_id, task in tasks.items():
+        for dep_id in task['requires']:
+            if dep_id not in tasks:
+                raise ValueError(f"Dependency '{dep_id}' not found for task '{task_id}'")
+        validate_task(task_id, task['config'], task['requires'])
+
+    # Placeholders naming a task stand for its output, the rest are arguments. Those a task
+    # doesn't set itself have to come from the scan's arguments.
+    arguments = set()
+    for task in tasks.values():
+        task['outputs'] = [name for name in task['placeholders'] if name in tasks]
+        task['arguments'] = [name for name in task['placeholders'] if name not in tasks]
+        arguments.update(name for name in task['arguments'] if name not in task['config'].get('arguments', {}))
+
+    return {
+        'name': workflow.get('name'),
+        'description': workflow.get('description'),
+        'config': config,
+        'modules': modules,
+        'tasks': tasks,
+        'order': topological_order(tasks),
+        'arguments': sorted(arguments)
+    }
+
+class WorkflowRegistry:
+    """Compiled workflows, cached on disk by config hash and mtime and shared by the CLI and the UI"""
+    def __init__(self, workflows_dir="workflows", cache_dir=None):
+        self.workflows_dir = str(workflows_dir)
+        self.cache_dir = str(cache_dir or os.path.join(self.workflows_dir, CACHE_DIR))
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get_config_path(self, name):
+        return os.path.join(self.workflows_dir, name, CONFIG_FILE)
+
+    def list_workflows(self):
+        """Get the names of all workflows with a config file"""
+        if not os.path.isdir(self.workflows_dir):
+            return []
+        return sorted(
+            entry.name for entry in os.scandir(self.workflows_dir)
+            if entry.is_dir() and not entry.name.startswith('.') and os.path.exists(self.get_config_path(entry.name))
+        )
+
+    def exists(self, name):
+        return os.path.exists(self.get_config_path(name))
+
+    def get(self, name):
+        """Get a compiled workflow, recompiling only when its config changed"""
+        path = self.get_config_path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ValueError(f"Workflow '{name}' not found")
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._compiled.get(name)
+            if entry is not None and entry['key'] == key:
+                return entry['compiled']
+
+            entry = self._load_cached(name)
+            if entry is None or entry['key'] != key:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                # A touched but unchanged file only needs its mtime refreshed
+                if entry is None or entry['hash'] != digest:
+                    import yaml  # Only needed on a cache miss, which keeps listing commands fast
+                    text = data.decode()
+                    compiled = dict(compile_workflow(yaml.safe_load(text)), yaml=text)
+                    entry = {'hash': digest, 'compiled': compiled}
+                entry = dict(entry, key=key, version=COMPILER_VERSION)
+                self._save_cached(name, entry)
+            self._compiled[name] = entry
+            return entry['compiled']
+
+    def get_all(self):
+        """Get every workflow that compiles, and the errors of those that don't"""
+        workflows, errors = {}, {}
+        for name in self.list_workflows():
+            try:
+                workflows[name] = self.get(name)
+            except Exception as e:
+                errors[name] = str(e)
+        return workflows, errors
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.pickle")
+
+    def _load_cached(self, name):
+        try:
+            with open(self._cache_path(name), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return entry if entry.get('version') == COMPILER_VERSION else None
+
+    def _save_cached(self, name, entry):
+        # The cache is only an accelerator, a read-only checkout still works without it
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(name)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass